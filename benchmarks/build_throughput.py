@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+'''
+Measures build throughput and peak memory on synthetic fixtures (see
+`benchmarks/fixtures.py`), so performance work can be measured without any of
+the real data: once per task, then end-to-end with all of them at once.
+
+Every build is a fresh `build_data.py` process, so peak memory is that of the
+build alone. Results are compared against a stored baseline: anything which
+takes more CPU time or memory than it by more than `--tolerance` counts as a
+regression, and makes this exit with a non-zero status. CPU time is compared
+rather than throughput since it barely depends on whatever else the machine is
+doing, but it still only means something on the machine it was recorded on, so
+record a baseline of your own with `--update-baseline` before starting on a
+change.
+
+Usage: python -m benchmarks.build_throughput -t DollyGuessTheInstructionTask,SodaSummarizationTask
+'''
+import argparse
+import json
+import os
+import re
+import shlex
+import subprocess
+import sys
+import tempfile
+
+from toolbox.tasks import NAME_TO_TASK_MAPPING
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines",
+                                     "build_throughput.json")
+
+# Name the end-to-end build gets reported under.
+END_TO_END = "(all tasks)"
+
+# Run inside the child interpreter. Builds like `build_data.py` would, and
+# reports how long that took and the process' peak memory. Task modules get
+# imported up-front, since startup time is measured separately (see
+# `startup_time.py`).
+_CHILD_SCRIPT = '''
+import json, resource, sys, time
+
+def cpu_time():
+    # Includes worker processes, once they've exited.
+    return sum(x.ru_utime + x.ru_stime for x in [
+        resource.getrusage(resource.RUSAGE_SELF),
+        resource.getrusage(resource.RUSAGE_CHILDREN),
+    ])
+
+import build_data
+from benchmarks.fixtures import register_rp_forums_fixtures
+from toolbox.tasks import NAME_TO_TASK_MAPPING
+
+register_rp_forums_fixtures()
+for name in sys.argv[1].split(","):
+    NAME_TO_TASK_MAPPING[name]
+sys.argv = ["build_data.py", "--tasks", *sys.argv[1:]]
+start, cpu_start = time.perf_counter(), cpu_time()
+build_data.main()
+seconds, cpu_seconds = time.perf_counter() - start, cpu_time() - cpu_start
+
+# In KiB on Linux, but in bytes on macOS.
+max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == "darwin":
+    max_rss //= 1024
+print(json.dumps({
+    "seconds": seconds,
+    "cpu_seconds": cpu_seconds,
+    "max_rss_kib": max_rss,
+}))
+'''
+
+_METRIC_REGEX = re.compile(
+    r'^toolbox_build_(episodes_total|examples_written_total)\{task="(.+?)"\} (\S+)$',
+    flags=re.MULTILINE)
+
+
+def main() -> None:
+    args = _parse_args_from_argv()
+    task_names = args.tasks.split(",") if args.tasks \
+        else list(NAME_TO_TASK_MAPPING)
+    build_args = shlex.split(args.build_args)
+    if args.update_baseline and args.fixtures is not None:
+        sys.exit("Refusing to record a baseline from custom `--fixtures`.")
+
+    with tempfile.TemporaryDirectory() as temp_folder:
+        fixtures_folder = args.fixtures
+        if fixtures_folder is None:
+            fixtures_folder = os.path.join(temp_folder, "fixtures")
+            # Generated in a separate process: Linux carries a process' peak
+            # memory over into the programs it runs, so ours should stay small.
+            subprocess.run([
+                sys.executable, "-m", "benchmarks.fixtures", fixtures_folder,
+                "--count", str(args.count), "--seed", str(args.seed)
+            ],
+                           check=True,
+                           stdout=subprocess.DEVNULL)
+
+        builds = [([name], name) for name in task_names]
+        if len(task_names) > 1:
+            builds.append((task_names, END_TO_END))
+
+        results: dict[str, dict[str, float]] = {}
+        for build_task_names, name in builds:
+            results[name] = _best_result_for(build_task_names,
+                                             build_args,
+                                             fixtures_folder=fixtures_folder,
+                                             temp_folder=temp_folder,
+                                             repeats=args.repeats)
+
+    current = {
+        "fixtures": {
+            "count": args.count,
+            "seed": args.seed,
+        },
+        "build_args": build_args,
+        "results": results,
+    }
+
+    baseline = None
+    if not args.update_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        if args.fixtures is not None or any(
+                baseline[key] != current[key]
+                for key in ["fixtures", "build_args"]):
+            print("NOTE: Baseline was recorded with different fixtures or "
+                  "build arguments, not comparing against it.\n")
+            baseline = None
+
+    regressions = _print_results(results,
+                                 baseline["results"] if baseline else None,
+                                 tolerance=args.tolerance)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        # Merged, so a baseline can be updated for a few tasks at a time.
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as file:
+                previous = json.load(file)
+            if all(previous[key] == current[key]
+                   for key in ["fixtures", "build_args"]):
+                current["results"] = {**previous["results"], **results}
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(current, file, indent=2)
+            file.write("\n")
+        print(f"\nSaved baseline to {args.baseline}")
+    elif regressions:
+        print(f"\n{regressions} regression(s) beyond {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+#
+# Helpers and CLI entrypoint.
+#
+
+
+def _best_result_for(task_names: list[str], build_args: list[str],
+                     fixtures_folder: str, temp_folder: str,
+                     repeats: int) -> dict[str, float]:
+    '''
+    Builds the given tasks `repeats` times and returns the lowest wall time,
+    CPU time and peak memory of any run.
+    '''
+    output_path = os.path.join(temp_folder, "output.jsonl")
+    metrics_path = os.path.join(temp_folder, "metrics.prom")
+
+    best: dict[str, float] | None = None
+    for _ in range(repeats):
+        result = subprocess.run(
+            [
+                sys.executable, "-c", _CHILD_SCRIPT, ",".join(task_names),
+                "--output-file", output_path, "--progress-interval", "0",
+                "--metrics-textfile", metrics_path, *build_args
+            ],
+            env={
+                **os.environ, "TOOLBOX_DATA_FOLDER": fixtures_folder
+            },
+            check=False,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            sys.exit(f"Build of {', '.join(task_names)} failed:\n"
+                     f"{result.stderr}")
+        timings = json.loads(result.stdout.splitlines()[-1])
+
+        with open(metrics_path, "r", encoding="utf-8") as file:
+            counts: dict[str, float] = {}
+            for metric, _, value in _METRIC_REGEX.findall(file.read()):
+                counts[metric] = counts.get(metric, 0) + float(value)
+
+        run = {
+            "episodes": counts["episodes_total"],
+            "examples": counts["examples_written_total"],
+            "seconds": timings["seconds"],
+            "cpu_seconds": timings["cpu_seconds"],
+            "peak_memory_mib": timings["max_rss_kib"] / 1024,
+        }
+        if best is None:
+            best = run
+        else:
+            for key in ["seconds", "cpu_seconds", "peak_memory_mib"]:
+                best[key] = min(best[key], run[key])
+
+    assert best is not None
+    best["episodes_per_second"] = best["episodes"] / best["seconds"]
+    best["examples_per_second"] = best["examples"] / best["seconds"]
+    return best
+
+
+def _print_results(results: dict[str, dict[str, float]],
+                   baseline: dict[str, dict[str, float]] | None,
+                   tolerance: float) -> int:
+    '''
+    Prints a table of results, compared against `baseline` if given. Returns
+    how many regressions there were.
+    '''
+    header = f"{'task':<36} {'episodes':>9} {'examples':>9} {'episodes/s':>11} {'examples/s':>11} {'CPU (s)':>8} {'peak MiB':>9}"
+    if baseline is not None:
+        header += f" {'CPU vs. baseline':>17} {'peak MiB vs. baseline':>22}"
+    print(header)
+    print("-" * len(header))
+
+    regressions = 0
+    for name, result in results.items():
+        line = (f"{name:<36} {result['episodes']:>9.0f} "
+                f"{result['examples']:>9.0f} "
+                f"{result['episodes_per_second']:>11.1f} "
+                f"{result['examples_per_second']:>11.1f} "
+                f"{result['cpu_seconds']:>8.2f} "
+                f"{result['peak_memory_mib']:>9.1f}")
+
+        previous = baseline.get(name) if baseline is not None else None
+        if previous is not None:
+            cpu = _relative_change(result["cpu_seconds"],
+                                   previous["cpu_seconds"])
+            memory = _relative_change(result["peak_memory_mib"],
+                                      previous["peak_memory_mib"])
+            slower = cpu > tolerance
+            heavier = memory > tolerance
+            regressions += slower + heavier
+            line += (f" {_format_change(cpu, slower):>17}"
+                     f" {_format_change(memory, heavier):>22}")
+            if (result["episodes"], result["examples"]) != (
+                    previous["episodes"], previous["examples"]):
+                # Not a regression as such, but it does mean the build's output
+                # changed, so the comparison might not be a fair one.
+                line += " (output changed)"
+        print(line)
+
+    return regressions
+
+
+def _relative_change(current: float, previous: float) -> float:
+    return (current - previous) / previous if previous else 0.0
+
+
+def _format_change(change: float, is_regression: bool) -> str:
+    return f"{'!! ' if is_regression else ''}{change:+.1%}"
+
+
+def _parse_args_from_argv() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "-t",
+        "--tasks",
+        type=str,
+        default=None,
+        help="The tasks to benchmark, comma-separated. Defaults to all of them."
+    )
+
+    parser.add_argument(
+        "--count",
+        type=int,
+        default=500,
+        help="Roughly how many items to generate fixtures with, per dataset."
+    )
+
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="The seed to generate fixtures with."
+    )
+
+    parser.add_argument(
+        "--fixtures",
+        type=str,
+        default=None,
+        help="Use already generated fixtures (or real data) from this folder instead. Not compared against the baseline."
+    )
+
+    parser.add_argument(
+        "--build-args",
+        type=str,
+        default="",
+        help="Extra arguments to pass to `build_data.py`, e.g. `--build-args='-w 4 -f DuplicateFilter'`."
+    )
+
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="How many times to build each task. Only the fastest run is reported."
+    )
+
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=DEFAULT_BASELINE_PATH,
+        help="The baseline to compare against."
+    )
+
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="How much more CPU time or memory (as a fraction of the baseline) a build can take before it counts as a regression."
+    )
+
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Save the results as the new baseline instead of comparing against it. Results for tasks which weren't benchmarked are kept."
+    )
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,587 @@
+#!/usr/bin/env python3
+'''
+Generates deterministic synthetic fixtures for every on-disk format our
+datasets read, laid out like the real data folder. Builds can then be
+benchmarked offline by pointing `TOOLBOX_DATA_FOLDER` at the output.
+
+The contents are nonsense, but they're shaped like the real data (message
+counts, lengths, HTML, names to anonymize, links to remove...) so every task
+does roughly the same work per item it would on the real thing. The same
+`--seed` and `--count` always produce the same files.
+
+Usage: python -m benchmarks.fixtures /tmp/toolbox-fixtures --count 200
+'''
+import argparse
+import csv
+import hashlib
+import json
+import os
+import random
+import typing as t
+
+# Content type of each rp_forums fixture. See `register_rp_forums_fixtures`.
+RP_FORUMS_FIXTURE_TYPES = {
+    "fixture-rp.csv": "rp",
+    "fixture-erp.csv": "erp",
+    "fixture-mixed.csv": "mixed",
+}
+
+_WORDS = [
+    "the", "a", "she", "he", "they", "walked", "into", "room", "quietly",
+    "and", "then", "looked", "at", "them", "before", "turning", "away",
+    "sword", "castle", "forest", "river", "night", "light", "slowly",
+    "carefully", "answer", "question", "because", "however", "function",
+    "value", "return", "list", "number", "water", "city", "people", "time",
+    "over", "under", "smiled", "laughed", "whispered", "ran", "stopped",
+]
+
+_NAMES = [
+    "Alice", "Bob", "Carol", "Dave", "Erin", "Frank", "Grace", "Heidi",
+    "Ivan", "Judy", "Mallory", "Niaj", "Olivia", "Peggy", "Rupert", "Sybil",
+    "Trent", "Victor", "Walter", "Zoe",
+]
+
+# Bits of markup and noise the roleplay cleaning code has to deal with.
+_HTML_NOISE = [
+    "<b>bold</b>", "<i>italic</i>", "<br/>", "<br/><br/>", " .. ", " ... ",
+    "*smiles*", '"Hello,"', "(OOC: brb)", "https://example.com/page ",
+    "<blockquote>Someone said this</blockquote>",
+]
+
+
+def main() -> None:
+    args = _parse_args_from_argv()
+    generate_fixtures(
+        args.output_folder,
+        count=args.count,
+        seed=args.seed,
+        datasets=args.datasets.split(",") if args.datasets else None)
+    print(f"Wrote fixtures to {args.output_folder}")
+
+
+def generate_fixtures(data_folder: str,
+                      count: int = 100,
+                      seed: int = 0,
+                      datasets: t.Iterable[str] | None = None) -> None:
+    '''
+    Writes fixtures for the given datasets (all of them by default) into
+    `data_folder`. `count` is roughly how many items (conversations, stories,
+    instructions...) each dataset gets.
+    '''
+    for name in datasets if datasets is not None else FIXTURE_GENERATORS:
+        dataset_folder = os.path.join(data_folder, name)
+        os.makedirs(dataset_folder, exist_ok=True)
+        # Each dataset gets its own RNG, so generating a subset of them
+        # doesn't change the contents of any.
+        FIXTURE_GENERATORS[name](dataset_folder, count,
+                                 random.Random(f"{seed}-{name}"))
+
+
+def register_rp_forums_fixtures() -> None:
+    '''
+    rp_forums figures out the content type of each file from a hash of its
+    name, and only knows about the real dumps. Makes it recognize ours too.
+    Must be called in any process that reads the rp_forums fixtures.
+    '''
+    from toolbox.datasets.rp_forums import SHA256_DIGEST_TO_RP_TYPE_MAP, RpType
+
+    for filename, rp_type in RP_FORUMS_FIXTURE_TYPES.items():
+        digest = hashlib.sha256(filename.encode()).hexdigest()
+        SHA256_DIGEST_TO_RP_TYPE_MAP[digest] = RpType(rp_type)
+
+
+#
+# Fixture generators, one per dataset folder.
+#
+
+
+def _ai_dungeon(folder: str, count: int, rng: random.Random) -> None:
+    # The task only yields a story once it sees the start of the next one, so
+    # there's one extra at the end.
+    with open(os.path.join(folder, "text_adventures.txt"), "w") as file:
+        for _ in range(count + 1):
+            file.write("<|startoftext|>\n")
+            for _ in range(rng.randint(4, 16)):
+                file.write(_paragraph(rng) + "\n\n")
+                file.write(f"> {_words(rng, 2, 8)}\n\n")
+            file.write("<|endoftext|>\n")
+
+
+def _airoboros(folder: str, count: int, rng: random.Random) -> None:
+    _write_jsonl(os.path.join(folder, "instructions.jsonl"), [{
+        "instruction": _question(rng),
+        "response": _paragraphs(rng, 1, 4),
+    } for _ in range(count)])
+
+
+def _airoboros2(folder: str, count: int, rng: random.Random) -> None:
+    # Only categories without any special parsing, plus `orca` which gets
+    # excluded by default.
+    categories = ["general", "coding", "writing", "joke", "riddle", "orca"]
+    _write_jsonl(os.path.join(folder, "instructions.jsonl"), [{
+        "instruction": _question(rng),
+        "response": _paragraphs(rng, 1, 4),
+        "system": "A chat.",
+        "category": rng.choice(categories),
+    } for _ in range(count)])
+
+
+def _characterai(folder: str, count: int, rng: random.Random) -> None:
+    bots = [{
+        "name": name,
+        "title": _words(rng, 3, 8),
+        # Empty for private bots, which the task skips over.
+        "description": _words(rng, 10, 40) if rng.random() < 0.9 else "",
+        "greeting": f"*waves* Hi, I'm {name}.",
+        "external_id": f"bot-{idx}",
+    } for idx, name in enumerate(_NAMES)]
+
+    # Character Editor dumps, which have the definitions for some of the bots.
+    private_folder = os.path.join(folder, "private")
+    os.makedirs(private_folder, exist_ok=True)
+    for idx, bot in enumerate(bots[::3]):
+        _write_json(
+            os.path.join(private_folder, f"{1680000000000 + idx}_editor.json"),
+            {
+                "character": {
+                    **bot, "definition": _chat_lines(rng, bot["name"])
+                },
+                "user__username": "someone",
+            })
+
+    public_folder = os.path.join(folder, "public")
+    os.makedirs(public_folder, exist_ok=True)
+    for idx in range(0, count, 2):
+        bot = rng.choice(bots)
+        histories = [{
+            "msgs": [{
+                "text": bot["greeting"],
+                "src": {
+                    "is_human": False
+                },
+            }] + [{
+                "text": _chat_message(rng, mention=bot["name"]),
+                "src": {
+                    "is_human": msg_idx % 2 == 0
+                },
+            } for msg_idx in range(rng.randint(4, 24))]
+        } for _ in range(2)]
+        _write_json(
+            os.path.join(public_folder,
+                         f"{1690000000000 + idx}_{bot['external_id']}.json"),
+            {
+                "info": {
+                    "character": bot
+                },
+                "histories": {
+                    "histories": histories
+                },
+            })
+
+
+def _claude_evol(folder: str, count: int, rng: random.Random) -> None:
+    _write_json(os.path.join(folder, "claude_evol_instruct_210k.json"), [{
+        "instruction": _question(rng),
+        "output": _paragraphs(rng, 1, 4),
+    } for _ in range(count)])
+
+
+def _claude_multiround(folder: str, count: int, rng: random.Random) -> None:
+    _write_json(os.path.join(folder, "claude_multiround_chat_30k.json"), [{
+        "id": f"fixture-{idx}",
+        "conversations": [{
+            "from": "human" if msg_idx % 2 == 0 else "gpt",
+            "value": _question(rng) if msg_idx % 2 == 0 else _paragraphs(
+                rng, 1, 3),
+        } for msg_idx in range(2 * rng.randint(1, 5))],
+    } for idx in range(count)])
+
+
+def _claude_rp(folder: str, count: int, rng: random.Random) -> None:
+    for subfolder in ["public", "private"]:
+        os.makedirs(os.path.join(folder, subfolder), exist_ok=True)
+    for idx in range(count):
+        subfolder = "private" if idx % 4 == 0 else "public"
+        user_name, bot_name = rng.sample(_NAMES, k=2)
+        lines: list[dict[str, t.Any]] = []
+        if rng.random() < 0.5:
+            lines.append({"chat_metadata": {"note_prompt": _words(rng, 10, 30)}})
+        lines += [{
+            "name": user_name if msg_idx % 2 == 0 else bot_name,
+            "is_user": msg_idx % 2 == 0,
+            "mes": _chat_message(rng),
+        } for msg_idx in range(rng.randint(2, 20))]
+        _write_jsonl(os.path.join(folder, subfolder, f"{idx:05d}.jsonl"),
+                     lines)
+
+
+def _club_floyd(folder: str, count: int, rng: random.Random) -> None:
+    stories = {}
+    for idx in range(count):
+        actions = [{"action": "%", "response": _paragraph(rng), "endoftext": False}]
+        actions += [{
+            "action": _words(rng, 1, 5),
+            "response": _paragraph(rng, 10, 80),
+            "endoftext": False,
+        } for _ in range(rng.randint(5, 40))]
+        actions[-1]["endoftext"] = True
+        stories[f"fixture-{idx}"] = {
+            "name": _words(rng, 1, 4).title(),
+            "author": rng.choice(_NAMES),
+            "genres": ["Fantasy"],
+            "tags": rng.sample(["puzzle", "humor", "horror", "mystery"], k=2),
+            "year": str(rng.randint(1980, 2020)),
+            "ratings": [],
+            "total_ratings": rng.randint(0, 100),
+            "average_rating": round(rng.uniform(1, 5), 2),
+            "transcript_id": str(idx),
+            "discretion_advised": rng.random() < 0.2,
+            "description": _paragraph(rng, 20, 60),
+            "data": actions,
+        }
+    _write_json(os.path.join(folder, "floyd.json"), stories)
+
+
+def _dolly(folder: str, count: int, rng: random.Random) -> None:
+    _write_jsonl(os.path.join(folder, "databricks-dolly-15k.jsonl"), [{
+        "instruction": _question(rng),
+        "context": _paragraph(rng) if rng.random() < 0.3 else "",
+        "response": _paragraphs(rng, 1, 3),
+        "category": "open_qa",
+    } for _ in range(count)])
+
+
+def _evol_instruct(folder: str, count: int, rng: random.Random) -> None:
+    _write_json(os.path.join(folder, "alpaca_evol_instruct_70k.json"), [{
+        "instruction": _question(rng),
+        "output": _paragraphs(rng, 1, 4),
+    } for _ in range(count)])
+
+
+def _gpt4all(folder: str, count: int, rng: random.Random) -> None:
+    _write_parquet(os.path.join(folder, "train.parquet"), {
+        "prompt": [_question(rng) for _ in range(count)],
+        "response": [_paragraphs(rng, 1, 3) for _ in range(count)],
+        "source": ["fixture" for _ in range(count)],
+    })
+
+
+def _gpt4llm(folder: str, count: int, rng: random.Random) -> None:
+    _write_json(os.path.join(folder, "alpaca_gpt4_data.json"),
+                _alpaca_like(rng, count, output_key="output"))
+
+
+def _gpteacher(folder: str, count: int, rng: random.Random) -> None:
+    for path in [
+            "Instruct/gpt4-instruct-similarity-0.9-dataset.json",
+            "Roleplay/roleplay-similarity_0.9-instruct-dataset.json",
+            "Toolformer/toolformer-similarity-0.9-dataset.json",
+    ]:
+        os.makedirs(os.path.join(folder, os.path.dirname(path)), exist_ok=True)
+        _write_json(os.path.join(folder, path),
+                    _alpaca_like(rng, count // 3, output_key="response"))
+
+
+def _lima_erp(folder: str, count: int, rng: random.Random) -> None:
+    import yaml
+
+    for idx in range(count):
+        forum_folder = os.path.join(folder, "data", f"forum{idx % 3}")
+        os.makedirs(forum_folder, exist_ok=True)
+        first, second = rng.sample(_NAMES, k=2)
+        entry = {
+            "persona": {
+                "<FIRST>": f"<FIRST> is {_words(rng, 10, 40)}.",
+                "<SECOND>": f"<SECOND> is {_words(rng, 10, 40)}.",
+            },
+            "names": {
+                "<FIRST>": first,
+                "<SECOND>": second,
+            },
+            "scenario": f"<FIRST> meets <SECOND>. {_paragraph(rng, 10, 40)}",
+            "conversation": [{
+                "name": "<FIRST>" if msg_idx % 2 == 0 else "<SECOND>",
+                "text": f"<SECOND> {_paragraphs(rng, 1, 3)}",
+            } for msg_idx in range(rng.randint(4, 30))],
+        }
+        with open(os.path.join(forum_folder, f"{idx}.yaml"), "w") as file:
+            yaml.safe_dump(entry, file)
+
+
+def _mcstories(folder: str, count: int, rng: random.Random) -> None:
+    rows = []
+    for idx in range(count):
+        paragraphs = [_paragraph(rng) for _ in range(rng.randint(5, 40))]
+        rows.append({
+            "story_title": _words(rng, 1, 4).title(),
+            "story_author": rng.choice(_NAMES),
+            "story_date": "2020-01-01",
+            "story_tags": repr(rng.sample(["fd", "hu", "ds", "ff"], k=2)),
+            "story_summary": _words(rng, 10, 30),
+            "story_href": f"https://example.com/story/{idx}",
+            "story_header": "",
+            "story": "<h3>Chapter 1</h3>" + "".join(
+                f"<p>{x}</p>" for x in paragraphs),
+            "story_footer": "",
+        })
+    _write_csv(os.path.join(folder, "mcstories--all.csv"), rows)
+
+
+def _openorca(folder: str, count: int, rng: random.Random) -> None:
+    _write_parquet(os.path.join(folder, "1M-GPT4-Augmented.parquet"), {
+        "id": [f"{rng.choice(['flan', 'niv', 't0', 'cot'])}.{idx}"
+               for idx in range(count)],
+        "system_prompt": [
+            "You are a helpful assistant." if rng.random() < 0.5 else ""
+            for _ in range(count)
+        ],
+        "question": [_question(rng) for _ in range(count)],
+        "response": [_paragraphs(rng, 1, 3) for _ in range(count)],
+    })
+
+
+def _rp_forums(folder: str, count: int, rng: random.Random) -> None:
+    for filename in RP_FORUMS_FIXTURE_TYPES:
+        rows = []
+        for thread_idx in range(count // len(RP_FORUMS_FIXTURE_TYPES)):
+            # Big threads happen and are the expensive ones to anonymize.
+            users = rng.sample(_NAMES, k=rng.choice([2, 2, 3, 8]))
+            title = f"Thread {thread_idx}: {_words(rng, 1, 4)}"
+            for msg_idx in range(rng.randint(2, 30)):
+                rows.append({
+                    "thread_title": title,
+                    "message_username": users[msg_idx % len(users)],
+                    "message": _html_message(rng, mention=rng.choice(users)),
+                })
+        _write_csv(os.path.join(folder, filename), rows)
+
+
+def _rp_guild(folder: str, count: int, rng: random.Random) -> None:
+    rows = []
+    for thread_idx in range(count):
+        users = rng.sample(_NAMES, k=rng.choice([2, 2, 3]))
+        title = f"Thread {thread_idx}: {_words(rng, 1, 4)}"
+        tags = ["1x1"] + rng.sample(
+            ["Fantasy", "Modern", "Advanced", "Casual", "18+"], k=2)
+        for msg_idx in range(rng.randint(2, 30)):
+            rows.append({
+                "thread_title": title,
+                "thread_type": "IC" if rng.random() < 0.9 else "OOC",
+                "thread_tags": repr(tags),
+                "message_username": users[msg_idx % len(users)],
+                "message": _html_message(rng, mention=rng.choice(users)),
+            })
+    _write_csv(os.path.join(folder, "guild.csv"), rows)
+
+
+def _sharegpt(folder: str, count: int, rng: random.Random) -> None:
+    for idx in range(count):
+        messages = [[
+            f"<p>{_question(rng)}</p>"
+            if msg_idx % 2 == 0 else "".join(
+                f"<p>{_paragraph(rng)}</p>" for _ in range(rng.randint(1, 4)))
+        ] for msg_idx in range(2 * rng.randint(1, 5))]
+        _write_json(os.path.join(folder, f"fixture-{idx:05d}.json"), messages)
+
+
+def _soda(folder: str, count: int, rng: random.Random) -> None:
+    speakers, dialogues = [], []
+    for _ in range(count):
+        names = rng.sample(_NAMES, k=2)
+        turn_count = rng.randint(4, 12)
+        speakers.append([names[idx % 2] for idx in range(turn_count)])
+        dialogues.append([_words(rng, 5, 30) for _ in range(turn_count)])
+
+    _write_parquet(os.path.join(folder, "train.parquet"), {
+        "narrative": [_paragraph(rng, 20, 60) for _ in range(count)],
+        "dialogue": dialogues,
+        "speakers": speakers,
+        "relation": ["xWant" for _ in range(count)],
+        "literal": [_words(rng, 5, 15) for _ in range(count)],
+        "original_index": list(range(count)),
+    })
+
+
+def _supercot(folder: str, count: int, rng: random.Random) -> None:
+    _write_json(os.path.join(folder, "filtered.json"), [{
+        "instruction": _question(rng),
+        # Some entries have a `rewritten_intent` instead of an `input`.
+        ("input" if rng.random() < 0.5 else "rewritten_intent"):
+            _words(rng, 0, 20),
+        "output": _paragraphs(rng, 1, 3),
+    } for _ in range(count)])
+
+
+def _whocars(folder: str, count: int, rng: random.Random) -> None:
+    rows = []
+    for _ in range(count):
+        bot_name = rng.choice(_NAMES)
+        prompt = [{
+            "role": "system",
+            "content": f"You are {bot_name}. {{{{char}}}} is {_words(rng, 10, 40)}.",
+        }] + [{
+            "role": "user" if msg_idx % 2 == 0 else "assistant",
+            "content": _chat_message(rng),
+        } for msg_idx in range(rng.randint(1, 15))]
+        rows.append({
+            "model": rng.choice(["gpt-4", "gpt-4-0314", "gpt-3.5-turbo"]),
+            "endpoint": "openai",
+            "prompt json": json.dumps(prompt),
+            "response": _chat_message(rng),
+        })
+    _write_csv(os.path.join(folder, "logs.csv"), rows)
+
+
+def _wizard_vicuna(folder: str, count: int, rng: random.Random) -> None:
+    _write_json(os.path.join(folder, "wizard_vicuna_dataset.json"), [{
+        "id": str(idx),
+        "conversations": [{
+            "from": "human" if msg_idx % 2 == 0 else "gpt",
+            "value": _question(rng) if msg_idx % 2 == 0 else _paragraphs(
+                rng, 1, 3),
+        } for msg_idx in range(2 * rng.randint(1, 4))],
+    } for idx in range(count)])
+
+
+# Keyed by the name of the folder each dataset reads from.
+FIXTURE_GENERATORS: dict[str, t.Callable[[str, int, random.Random], None]] = {
+    "ai-dungeon": _ai_dungeon,
+    "airoboros": _airoboros,
+    "airoboros2": _airoboros2,
+    "characterai": _characterai,
+    "claude-evol": _claude_evol,
+    "claude-multiround": _claude_multiround,
+    "claude-rp": _claude_rp,
+    "club-floyd": _club_floyd,
+    "dolly": _dolly,
+    "evol-instruct": _evol_instruct,
+    "gpt-4-llm": _gpt4llm,
+    "gpt4all_prompt_generations": _gpt4all,
+    "gpteacher": _gpteacher,
+    "lima-erp": _lima_erp,
+    "mcstories": _mcstories,
+    "openorca": _openorca,
+    "rp-guild": _rp_guild,
+    "rp_forums": _rp_forums,
+    "sharegpt": _sharegpt,
+    "soda": _soda,
+    "supercot": _supercot,
+    "whocars": _whocars,
+    "wizard_vicuna_70k": _wizard_vicuna,
+}
+
+#
+# Helpers and CLI entrypoint.
+#
+
+
+def _words(rng: random.Random, min_count: int, max_count: int) -> str:
+    return " ".join(rng.choices(_WORDS, k=rng.randint(min_count, max_count)))
+
+
+def _paragraph(rng: random.Random, min_words: int = 30,
+               max_words: int = 150) -> str:
+    return _words(rng, min_words, max_words).capitalize() + "."
+
+
+def _paragraphs(rng: random.Random, min_count: int, max_count: int) -> str:
+    return "\n\n".join(
+        _paragraph(rng) for _ in range(rng.randint(min_count, max_count)))
+
+
+def _question(rng: random.Random) -> str:
+    return _words(rng, 5, 40).capitalize() + "?"
+
+
+def _chat_message(rng: random.Random, mention: str | None = None) -> str:
+    words = rng.choices(_WORDS, k=rng.randint(10, 150))
+    if mention is not None and rng.random() < 0.3:
+        words.insert(rng.randrange(len(words)), mention)
+    return "*" + " ".join(words[:3]) + "* " + " ".join(words[3:]) + "."
+
+
+def _chat_lines(rng: random.Random, bot_name: str) -> str:
+    return "\n".join(f"{{{{user}}}}: {_question(rng)}\n{bot_name}: "
+                     f"{_chat_message(rng)}" for _ in range(rng.randint(1, 4)))
+
+
+def _html_message(rng: random.Random, mention: str) -> str:
+    '''A forum post, with some markup and noise thrown in.'''
+    words = rng.choices(_WORDS, k=rng.randint(20, 600))
+    for _ in range(len(words) // 25):
+        words.insert(rng.randrange(len(words)), rng.choice(_HTML_NOISE))
+    if rng.random() < 0.3:
+        words.insert(rng.randrange(len(words)), f"@{mention}")
+    return " ".join(words)
+
+
+def _alpaca_like(rng: random.Random, count: int,
+                 output_key: str) -> list[dict[str, str]]:
+    return [{
+        "instruction": _question(rng),
+        "input": _words(rng, 5, 30) if rng.random() < 0.4 else "",
+        output_key: _paragraphs(rng, 1, 3),
+    } for _ in range(count)]
+
+
+def _write_json(path: str, data: t.Any) -> None:
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+
+
+def _write_jsonl(path: str, entries: list[t.Any]) -> None:
+    with open(path, "w", encoding="utf-8") as file:
+        for entry in entries:
+            file.write(json.dumps(entry) + "\n")
+
+
+def _write_csv(path: str, rows: list[dict[str, t.Any]]) -> None:
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _write_parquet(path: str, columns: dict[str, list[t.Any]]) -> None:
+    # Imported here since it's slow to import.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    pq.write_table(pa.table(columns), path)
+
+
+def _parse_args_from_argv() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "output_folder",
+        type=str,
+        help="Where to write the fixtures to. Use it as `TOOLBOX_DATA_FOLDER`."
+    )
+
+    parser.add_argument(
+        "--count",
+        type=int,
+        default=100,
+        help="Roughly how many items (conversations, stories, instructions...) to generate per dataset."
+    )
+
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="The seed to generate fixtures with."
+    )
+
+    parser.add_argument(
+        "--datasets",
+        type=str,
+        default=None,
+        help=f"Only generate fixtures for these datasets, comma-separated (accepted inputs: {', '.join(FIXTURE_GENERATORS)})."
+    )
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
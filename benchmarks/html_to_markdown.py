@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+'''
+Compares the available HTML to Markdown backends: how fast each of them is,
+and how often its output matches the reference backend's exactly.
+
+Uses a synthetic corpus by default. Real data can be passed in with `--corpus`,
+either as a .jsonl file with an "html" field on each line or as a folder of
+.html files.
+
+Usage: python -m benchmarks.html_to_markdown --corpus data/some-dump.jsonl
+'''
+import argparse
+import difflib
+import json
+import os
+import random
+import time
+
+from toolbox.utils.markdown import (
+    HTML_BACKENDS,
+    REFERENCE_BACKEND,
+    html_to_markdown
+)
+
+# Snippets the synthetic corpus gets built out of. Meant to cover what shows up
+# in our scraped data: formatting, line breaks, code, lists, links, tables and
+# entities (plus some of the sloppier markup real forum posts have).
+_SYNTHETIC_SNIPPETS = [
+    "<p>Just a plain paragraph, nothing to see here.</p>",
+    "<p>Some <b>bold</b>, <i>italic</i> and <em>emphasized</em> text.</p>",
+    "First line<br>Second line<br/>Third line",
+    "<pre><code>def main():\n    print('hello')\n</code></pre>",
+    "<p>Inline <code>code</code> within a sentence.</p>",
+    "<ul><li>One</li><li>Two<ul><li>Nested</li></ul></li><li>Three</li></ul>",
+    "<ol><li>First</li><li>Second</li></ol>",
+    '<p>A <a href="https://example.com/page?a=1&amp;b=2">link</a> here.</p>',
+    "<table><tr><th>Name</th><th>Value</th></tr><tr><td>a</td><td>1</td></tr></table>",
+    "<p>Entities: &amp; &lt; &gt; &quot; &nbsp; &eacute; &#8230;</p>",
+    "<blockquote>Someone said this before.</blockquote>",
+    "<h2>A heading</h2><p>And its section.</p>",
+    "<p>Unclosed paragraph<p>And another one",
+    "<div><span>Stray <b>nesting</i> errors</span></div>",
+]
+
+
+def main() -> None:
+    args = _parse_args_from_argv()
+
+    documents = _load_corpus(args.corpus) if args.corpus \
+        else _synthetic_corpus(args.documents)
+    total_bytes = sum(len(html.encode("utf-8")) for html in documents)
+    print(
+        f"corpus: {len(documents)} documents, {total_bytes / 1e6:.2f} MB")
+
+    reference_outputs: list[str] | None = None
+    for backend in [REFERENCE_BACKEND] + \
+            [x for x in HTML_BACKENDS if x != REFERENCE_BACKEND]:
+        try:
+            html_to_markdown("", default_backend=backend)
+        except ImportError as ex:
+            print(f"{backend:>12}: skipped ({ex})")
+            continue
+
+        timings: list[float] = []
+        outputs: list[str] = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            outputs = [
+                html_to_markdown(html, default_backend=backend)
+                for html in documents
+            ]
+            timings.append(time.perf_counter() - start)
+
+        best = min(timings)
+        line = f"{backend:>12}: {len(documents) / best:10.1f} docs/s, " \
+            f"{total_bytes / 1e6 / best:7.2f} MB/s"
+
+        if reference_outputs is None:
+            reference_outputs = outputs
+            line += "  (reference)"
+        else:
+            mismatches = [
+                idx for idx, (a, b) in enumerate(zip(reference_outputs, outputs))
+                if a != b
+            ]
+            identical = 100 * (1 - len(mismatches) / max(len(documents), 1))
+            line += f"  {identical:6.2f}% identical to {REFERENCE_BACKEND}"
+            for idx in mismatches[:args.show_diffs]:
+                line += "\n" + "\n".join(
+                    difflib.unified_diff(reference_outputs[idx].splitlines(),
+                                         outputs[idx].splitlines(),
+                                         fromfile=f"{REFERENCE_BACKEND}[{idx}]",
+                                         tofile=f"{backend}[{idx}]",
+                                         lineterm=""))
+        print(line)
+
+
+#
+# Helpers and CLI entrypoint.
+#
+
+
+def _load_corpus(path: str) -> list[str]:
+    if os.path.isdir(path):
+        documents: list[str] = []
+        for name in sorted(os.listdir(path)):
+            if name.endswith(".html"):
+                with open(os.path.join(path, name), "r",
+                          encoding="utf-8") as file:
+                    documents.append(file.read())
+        return documents
+
+    with open(path, "r", encoding="utf-8") as file:
+        return [json.loads(line)["html"] for line in file if line.strip()]
+
+
+def _synthetic_corpus(count: int) -> list[str]:
+    rng = random.Random(0)
+    return [
+        "\n".join(rng.choices(_SYNTHETIC_SNIPPETS, k=rng.randint(1, 12)))
+        for _ in range(count)
+    ]
+
+
+def _parse_args_from_argv() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        help="A .jsonl file with an `html` field on each line, or a folder of .html files. Uses a synthetic corpus if not given."
+    )
+
+    parser.add_argument(
+        "--documents",
+        type=int,
+        default=2000,
+        help="How many documents to generate for the synthetic corpus."
+    )
+
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="How many times to convert the corpus with each backend. Only the best run is reported."
+    )
+
+    parser.add_argument(
+        "--show-diffs",
+        type=int,
+        default=0,
+        help="Print diffs against the reference backend for up to this many mismatching documents per backend."
+    )
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
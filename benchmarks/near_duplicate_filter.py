@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+'''
+Checks that `NearDuplicateFilter` keeps every example out of long episodes made
+up of unique turns (whose prompts overlap almost entirely with each other) and
+drops copies of those episodes, then reports how many examples it gets through
+per second.
+
+Usage: python -m benchmarks.near_duplicate_filter
+'''
+import argparse
+import random
+import sys
+import time
+
+from toolbox.core.models import Episode, TrainingExample, Turn, TurnKind
+from toolbox.core.training_example import TrainingExampleGenerator
+from toolbox.filters.training_example.near_duplicate_filter import \
+    NearDuplicateFilter
+
+
+def main() -> None:
+    args = _parse_args_from_argv()
+    rng = random.Random(args.seed)
+
+    episodes = [
+        _synthetic_episode(args.turns, f"benchmark-{idx}", rng)
+        for idx in range(args.episodes)
+    ]
+    # The same conversations again under different identifiers, which should
+    # all get dropped.
+    copies = [
+        Episode(turns=episode.turns, identifier=f"copy-of-{episode.identifier}")
+        for episode in episodes
+    ]
+
+    examples = [_examples_for(episode, args) for episode in episodes]
+    copied_examples = [_examples_for(episode, args) for episode in copies]
+
+    near_duplicate_filter = NearDuplicateFilter()
+    start = time.perf_counter()
+    kept = sum(
+        near_duplicate_filter.should_keep(example)
+        for episode_examples in examples for example in episode_examples)
+    copies_kept = sum(
+        near_duplicate_filter.should_keep(example)
+        for episode_examples in copied_examples
+        for example in episode_examples)
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(x) for x in examples)
+    copies_total = sum(len(x) for x in copied_examples)
+    print(f"unique episodes: kept {kept} of {total} examples")
+    print(f"copied episodes: kept {copies_kept} of {copies_total} examples")
+    print(f"{(total + copies_total) / elapsed:.0f} examples/s")
+
+    if kept != total or copies_kept != 0:
+        sys.exit(1)
+
+
+#
+# Helpers and CLI entrypoint.
+#
+
+
+def _synthetic_episode(turn_count: int, identifier: str,
+                       rng: random.Random) -> Episode:
+    '''Builds an episode of alternating turns, none of which look alike.'''
+    turns = [Turn(utterance="Enter roleplay mode.", kind=TurnKind.SYSTEM)]
+    for idx in range(turn_count):
+        utterance = " ".join(f"w{rng.randrange(10**6)}"
+                             for _ in range(rng.randint(20, 120)))
+        kind = TurnKind.USER if idx % 2 == 0 else TurnKind.MODEL
+        turns.append(Turn(utterance=utterance, kind=kind))
+
+    return Episode(turns=turns, identifier=identifier)
+
+
+def _examples_for(episode: Episode,
+                  args: argparse.Namespace) -> list[TrainingExample]:
+    return list(
+        TrainingExampleGenerator(episode,
+                                 target_token_count=args.max_length,
+                                 rng=random.Random(args.seed)))
+
+
+def _parse_args_from_argv() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--episodes", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--max-length", type=int, default=4096)
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
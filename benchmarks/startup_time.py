@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+'''
+Measures how long `build_data.py` takes to start up: spawning a fresh
+interpreter, importing the CLI and resolving the requested tasks and filters.
+Also reports which of our heavier dependencies ended up being imported along
+the way, since that's usually what startup time goes into.
+
+Usage: python -m benchmarks.startup_time -t DollyGuessTheInstructionTask
+'''
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+# Dependencies which are known to be slow to import. Only used for reporting.
+HEAVY_MODULES = [
+    "bs4",
+    "html5lib",
+    "markdownify",
+    "numpy",
+    "pandas",
+    "pyarrow",
+    "sklearn",
+    "yaml",
+]
+
+# Run inside the child interpreter. Resolves everything `build_data.main` would
+# before it starts pulling in data.
+_CHILD_SCRIPT = '''
+import json, sys
+import build_data
+from toolbox.filters import NAME_TO_TRAINING_EXAMPLE_FILTER_MAPPING
+from toolbox.tasks import NAME_TO_TASK_MAPPING
+
+for name in sys.argv[1].split(","):
+    NAME_TO_TASK_MAPPING[name]
+for name in filter(None, sys.argv[2].split(",")):
+    NAME_TO_TRAINING_EXAMPLE_FILTER_MAPPING[name]
+
+print(json.dumps([name for name in json.loads(sys.argv[3]) if name in sys.modules]))
+'''
+
+
+def main() -> None:
+    args = _parse_args_from_argv()
+
+    timings: list[float] = []
+    heavy_modules: list[str] = []
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [
+                sys.executable, "-c", _CHILD_SCRIPT, args.tasks, args.filters,
+                json.dumps(HEAVY_MODULES)
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        timings.append(time.perf_counter() - start)
+        heavy_modules = json.loads(result.stdout)
+
+    print(f"tasks:   {args.tasks}")
+    print(f"filters: {args.filters or '(none)'}")
+    print(f"best:    {min(timings):.3f}s")
+    print(f"median:  {statistics.median(timings):.3f}s")
+    print(f"heavy imports: {', '.join(heavy_modules) or '(none)'}")
+
+
+#
+# Helpers and CLI entrypoint.
+#
+
+
+def _parse_args_from_argv() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "-t",
+        "--tasks",
+        type=str,
+        default="DollyGuessTheInstructionTask",
+        help="The tasks to resolve, comma-separated."
+    )
+
+    parser.add_argument(
+        "-f",
+        "--filters",
+        type=str,
+        default="",
+        help="The filters to resolve, comma-separated."
+    )
+
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=5,
+        help="How many times to start up. Both the best and median runs are reported."
+    )
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+'''
+Checks the roleplay text cleaning pipelines against golden outputs from the
+original per-message regex chains (kept below as reference implementations),
+then reports how long each rule takes.
+
+Uses a synthetic corpus by default. Real data can be passed in with `--corpus`,
+as a CSV file with a "message" column (like the rp_forums dumps).
+
+Usage: python -m benchmarks.text_cleaning --corpus data/rp_forums/some-forum.csv
+'''
+import argparse
+import csv
+import random
+import re
+import sys
+import time
+import typing as t
+
+from toolbox.tasks.rp_forums_writing import (
+    HTML_CLEANING_PIPELINE,
+    MARKDOWN_CLEANING_PIPELINE,
+    _not_usable_as_training_label,
+    _remove_bad_html_tags,
+    _remove_links,
+)
+from toolbox.utils.markdown import html_to_markdown
+from toolbox.utils.text_cleaning import CleaningPipeline
+
+# Snippets the synthetic corpus gets built out of. Meant to trigger every rule
+# in the pipelines at least every now and then.
+_SYNTHETIC_SNIPPETS = [
+    "She walked into the tavern", "and looked around", "The bard sang",
+    " .. ", " ... ", "wait...what", "so..", " . ", " , ", " ? ", " ! ",
+    "well…maybe", "â??", "â?\x9d", "\x9d", "<b>bold</b>", "<i>italic</i>",
+    "text<b>mushed</b>together", "<br/>", "<br/><br/>", "\nRE: Some thread\n",
+    "<blockquote>Someone said</blockquote>", "<script>alert(1)</script>",
+    "check https://example.com/page out", '"quoted"', 'said"mushed"too',
+    "(OOC: brb)", "i'm here", "[a link](https://example.com)", "trailing   \n",
+]
+
+
+def main() -> None:
+    args = _parse_args_from_argv()
+
+    messages = _load_corpus(args.corpus) if args.corpus \
+        else _synthetic_corpus(args.messages)
+    print(f"corpus: {len(messages)} messages")
+
+    # Markdown versions of the messages, which is what the second pipeline
+    # runs on.
+    markdown_messages = [
+        html_to_markdown(HTML_CLEANING_PIPELINE(x),
+                         default_backend="html.parser") for x in messages
+    ]
+
+    mismatches = 0
+    for name, reference, current, inputs in [
+        ("HTML cleaning", _reference_clean_html, HTML_CLEANING_PIPELINE,
+         messages),
+        ("Markdown cleaning", _reference_clean_markdown,
+         MARKDOWN_CLEANING_PIPELINE, markdown_messages),
+        ("unusable as training label", _reference_not_usable_as_training_label,
+         _not_usable_as_training_label, markdown_messages),
+    ]:
+        stage_mismatches = [
+            idx for idx, x in enumerate(inputs) if reference(x) != current(x)
+        ]
+        mismatches += len(stage_mismatches)
+
+        reference_time = _best_time_for(reference, inputs, args.repeats)
+        current_time = _best_time_for(current, inputs, args.repeats)
+        print(
+            f"{name:>26}: {len(stage_mismatches)} mismatches, "
+            f"{reference_time:.4f}s -> {current_time:.4f}s "
+            f"({reference_time / current_time:.1f}x)")
+        for idx in stage_mismatches[:args.show_mismatches]:
+            print(f"  input:    {inputs[idx]!r}")
+            print(f"  expected: {reference(inputs[idx])!r}")
+            print(f"  got:      {current(inputs[idx])!r}")
+
+    for name, pipeline, inputs in [
+        ("HTML cleaning", HTML_CLEANING_PIPELINE, messages),
+        ("Markdown cleaning", MARKDOWN_CLEANING_PIPELINE, markdown_messages),
+    ]:
+        _print_rule_timings(name, pipeline, inputs)
+
+    if mismatches:
+        sys.exit(1)
+
+
+#
+# Reference implementations, as they were before being turned into pipelines.
+#
+
+
+def _reference_clean_html(original_message: str) -> str:
+    message = original_message
+    message = message.replace(" .. ", "... ")
+    message = message.replace(" ... ", "... ")
+    message = re.sub(r'\b(\.\.\.?)\b', '... ', message)
+
+    message = message.replace(" . ", ". ")
+    message = message.replace(" , ", ", ")
+    message = message.replace(" ? ", "? ")
+    message = message.replace(" ! ", "! ")
+
+    message = re.sub(r"(\S)(…)(\S)", "\\1\\2 \\3", message)
+
+    message = message.replace("â??", "'")
+    message = message.replace("â?\x9d", "'")
+
+    message = message.replace("\x9d", " ")
+
+    message = _remove_bad_html_tags(message)
+    return _remove_links(message)
+
+
+def _reference_clean_markdown(original_message: str) -> str:
+    lines: list[str] = []
+    for line in original_message.splitlines():
+        line = line.rstrip()
+        if line.startswith("RE: ") or line.startswith("**RE: "):
+            continue
+        lines.append(line)
+    s = "\n".join(lines)
+
+    is_opening_asterisk = True
+    while (match := re.search(r"([\w\d])(\*{1,2})([\w\d])", s)) is not None:
+        if is_opening_asterisk:
+            s = s[:match.start() + 1] + " " + s[match.start() + 1:]
+        else:
+            s = s[:match.end() - 1] + " " + s[match.end() - 1:]
+        is_opening_asterisk = not is_opening_asterisk
+
+    return re.sub("\n{2,}", "\n\n", s)
+
+
+def _reference_not_usable_as_training_label(message: str) -> bool:
+    if re.search(r'\b " \b', message) is not None:
+        return True
+    if re.search(r'\S"\S', message) is not None:
+        return True
+    if re.search(r'\S\(', message) is not None \
+        or re.search(r'\)\S', message) is not None:
+        return True
+    if re.search(r"\bi('m|'ll)?\b", message) is not None:
+        return True
+    if re.search(r"\[.+\]\(\S+\)", message) is not None:
+        return True
+    return False
+
+
+#
+# Helpers and CLI entrypoint.
+#
+
+
+def _best_time_for(function: t.Callable[[str], t.Any], inputs: list[str],
+                   repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for x in inputs:
+            function(x)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _print_rule_timings(name: str, pipeline: CleaningPipeline,
+                        inputs: list[str]) -> None:
+    with pipeline.profile() as timings:
+        for x in inputs:
+            pipeline(x)
+
+    total = sum(timings.values())
+    print(f"\n{name} rules:")
+    for rule_name, seconds in timings.most_common():
+        print(
+            f"  {rule_name:>34}: {seconds:.4f}s ({100 * seconds / total:5.1f}%)"
+        )
+
+
+def _load_corpus(path: str) -> list[str]:
+    csv.field_size_limit(sys.maxsize)
+    with open(path, "r", encoding="utf-8") as file:
+        return [row["message"] for row in csv.DictReader(file)]
+
+
+def _synthetic_corpus(count: int) -> list[str]:
+    rng = random.Random(0)
+    return [
+        " ".join(rng.choices(_SYNTHETIC_SNIPPETS, k=rng.randint(5, 400)))
+        for _ in range(count)
+    ]
+
+
+def _parse_args_from_argv() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        help="A CSV file with a `message` column. Uses a synthetic corpus if not given."
+    )
+
+    parser.add_argument(
+        "--messages",
+        type=int,
+        default=2000,
+        help="How many messages to generate for the synthetic corpus."
+    )
+
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="How many times to clean the corpus with each implementation. Only the best run is reported."
+    )
+
+    parser.add_argument(
+        "--show-mismatches",
+        type=int,
+        default=3,
+        help="Print up to this many mismatching messages per stage."
+    )
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+'''
+Measures how `TrainingExampleGenerator` scales with episode length. Time per
+turn should stay flat as episodes get longer, since the context window only
+ever slides forwards.
+
+Usage: python -m benchmarks.training_example_scaling
+'''
+import argparse
+import random
+import time
+
+from toolbox.core.models import Episode, Turn, TurnKind
+from toolbox.core.token_counter import build_token_counter
+from toolbox.core.training_example import TrainingExampleGenerator
+
+
+def main() -> None:
+    args = _parse_args_from_argv()
+    token_counter = build_token_counter(args.tokenizer)
+
+    print(f"{'turns':>8} {'examples':>9} {'seconds':>9} {'us/turn':>9}")
+    for turn_count in args.lengths:
+        episode = _synthetic_episode(turn_count, seed=args.seed)
+
+        best = float("inf")
+        examples = 0
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            examples = sum(1 for _ in TrainingExampleGenerator(
+                episode,
+                target_token_count=args.max_length,
+                rng=random.Random(args.seed),
+                token_counter=token_counter,
+            ))
+            best = min(best, time.perf_counter() - start)
+
+        print(
+            f"{turn_count:>8} {examples:>9} {best:>9.4f} {best / turn_count * 1e6:>9.1f}"
+        )
+
+
+#
+# Helpers and CLI entrypoint.
+#
+
+
+def _synthetic_episode(turn_count: int, seed: int) -> Episode:
+    '''Builds an RP-like episode with alternating turns of varying length.'''
+    rng = random.Random(seed)
+    vocabulary = ["the", "a", "she", "walked", "*smiles*", "\"Hello,\"", "into",
+                  "room", "quietly", "and", "then", "looked", "at", "him."]
+
+    turns = [Turn(utterance="Enter roleplay mode.", kind=TurnKind.SYSTEM)]
+    for idx in range(turn_count):
+        utterance = " ".join(rng.choices(vocabulary, k=rng.randint(20, 200)))
+        kind = TurnKind.USER if idx % 2 == 0 else TurnKind.MODEL
+        turns.append(Turn(utterance=utterance, kind=kind))
+
+    return Episode(turns=turns, identifier=f"benchmark-{turn_count}")
+
+
+def _parse_args_from_argv() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--lengths",
+        type=int,
+        nargs="+",
+        default=[250, 500, 1000, 2000, 4000, 8000],
+        help="Episode lengths (in turns) to benchmark."
+    )
+
+    parser.add_argument(
+        "-l",
+        "--max-length",
+        type=int,
+        default=2048,
+        help="Token budget for the context window."
+    )
+
+    parser.add_argument(
+        "--tokenizer",
+        type=str,
+        default="estimate",
+        help="Token counter to use (see `build_token_counter`)."
+    )
+
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="How many times to time each length. The best run is reported."
+    )
+
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=42,
+        help="Seed for the synthetic episodes."
+    )
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
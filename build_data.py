@@ -1,18 +1,49 @@
 #!/usr/bin/env python3
 import argparse
+import collections
 import logging
+import os
 import random
-import json
+import typing as t
+from dataclasses import replace
 
 from colors import color
 
+from toolbox.core.checkpoint import Checkpoint, Checkpointer
+from toolbox.core.dataset import set_default_shard
+from toolbox.core.metrics import BuildMetrics
+from toolbox.core.mixer import TaskMixer
+from toolbox.core.parallel import (
+    GenerationSettings,
+    generate_examples_for,
+    generate_examples_for_seeded
+)
+from toolbox.core.profiling import (
+    EXAMPLE_GENERATION,
+    FILTER_PREFIX,
+    NO_TASK,
+    TASK_TRANSFORM,
+    WRITE,
+    Profiler,
+    set_profiler
+)
+from toolbox.core.models import Episode, EpisodeRecord, TrainingExample
 from toolbox.core.task import BaseTask
-from toolbox.core.training_example import TrainingExampleGenerator, TurnTooLargeError
+from toolbox.core.token_counter import build_token_counter
 from toolbox.filters.training_example_filter import TrainingExampleFilter
 from toolbox.tasks import NAME_TO_TASK_MAPPING
 from toolbox.filters import NAME_TO_TRAINING_EXAMPLE_FILTER_MAPPING
+from toolbox.writers import OUTPUT_FORMATS, build_writer_for
 
 LOG = logging.getLogger(__name__)
+T = t.TypeVar("T")
+
+# Arguments which don't affect a build's output, so they're free to change when
+# resuming it.
+_NON_OUTPUT_ARGS = [
+    "workers", "verbose", "profile", "progress_interval", "metrics_textfile",
+    "checkpoint_interval", "resume"
+]
 
 
 def main() -> None:
@@ -23,25 +54,173 @@ def main() -> None:
     )
 
     random.seed(args.seed)
+    set_default_shard(*args.shard)
+    if args.html_backend is not None:
+        # Imported here since it pulls in bs4 and markdownify.
+        from toolbox.utils.markdown import set_html_backend
+        set_html_backend(args.html_backend)
 
     if not args.print and args.output_file.strip() == "":
         raise ValueError("Invalid directory specified! Did you mean to enable the `print` flag?")
+    if args.print and (args.shuffle or args.pack):
+        raise ValueError("`--shuffle` and `--pack` can't be used along with the `print` flag.")
+    checkpoint_path = f"{args.output_file}.checkpoint.json"
+    if args.checkpoint_interval is not None or args.resume:
+        if args.print:
+            raise ValueError("Checkpoints can't be used along with the `print` flag.")
+        if args.resume and not os.path.exists(checkpoint_path):
+            raise ValueError(f"Can't resume, no checkpoint found at {checkpoint_path}")
+
+    profiler = None
+    if args.profile is not None:
+        profiler = Profiler()
+        set_profiler(profiler)
 
     idx = 0
     print_new_episode_header = True
 
     # Generate tasks and example filters
-    tasks: list[BaseTask] = [NAME_TO_TASK_MAPPING[task]() for task in args.tasks.split(",")]
+    task_names = args.tasks.split(",")
+    tasks: list[BaseTask] = [NAME_TO_TASK_MAPPING[task]() for task in task_names]
+    if args.episode_cache is not None:
+        # Imported here since it pulls in pyarrow.
+        from toolbox.core.episode_cache import CachedTask
+        tasks = [
+            CachedTask(task, cache_dir=args.episode_cache, seed=args.seed)
+            for task in tasks
+        ]
+    if args.task_weights is not None or args.task_quotas is not None:
+        for task_name in {**(args.task_weights or {}), **(args.task_quotas or {})}:
+            if task_name not in task_names:
+                raise ValueError(f"Got a weight or quota for {task_name}, which isn't one of the given `--tasks`")
     example_filters: list[TrainingExampleFilter] = [
-        NAME_TO_TRAINING_EXAMPLE_FILTER_MAPPING[filter_name]()
-        for filter_name in args.example_filters.split(",")
+        _build_filter(filter_name, args)
+        for filter_name in args.filters.split(",")
     ] if args.filters else []
 
-    if not args.print:
-        f = open(args.output_file, "w", encoding="utf-8")
+    writer = None if args.print else build_writer_for(
+        args.output_format,
+        args.output_file,
+        serializer=args.serializer,
+        max_shard_bytes=args.max_shard_size,
+        shuffle_seed=args.seed if args.shuffle else None,
+        shuffle_memory_bytes=args.shuffle_memory,
+        # Next to the output by default, since that's likely to have room for
+        # another copy of it.
+        shuffle_tmp_dir=args.shuffle_tmp_dir
+        or os.path.dirname(os.path.abspath(args.output_file)),
+        pack_max_tokens=args.max_length if args.pack else None,
+        pack_tokenizer=args.tokenizer,
+        pack_window=args.pack_window,
+        episode_records=args.episode_records,
+    )
+
+    checkpointer = None
+    checkpoint = None
+    if args.checkpoint_interval is not None or args.resume:
+        assert writer is not None
+        if args.shuffle:
+            raise ValueError("Checkpoints can't be used along with `--shuffle`.")
+        if args.pack:
+            raise ValueError("Checkpoints can't be used along with `--pack`.")
+        if not writer.supports_checkpoints:
+            raise ValueError(f"Checkpoints aren't supported with `--output-format {args.output_format}`.")
+        settings_for_checkpoint = {
+            key: value for key, value in vars(args).items()
+            if key not in _NON_OUTPUT_ARGS
+        }
+        checkpointer = Checkpointer(checkpoint_path,
+                                    settings_for_checkpoint,
+                                    filters=example_filters,
+                                    interval=args.checkpoint_interval)
+        if args.resume:
+            checkpoint = checkpointer.load()
+            writer.restore(checkpoint.writer_position)
+            idx = checkpoint.examples_kept
+            LOG.info("Resuming from %s: %s episodes and %s examples in, at episode %s of %s",
+                     checkpoint_path, checkpoint.episodes_done, idx,
+                     checkpoint.task_episodes_done, task_names[checkpoint.task_index])
+
+    settings = GenerationSettings(target_token_count=args.max_length,
+                                  format=args.format,
+                                  seed=args.seed,
+                                  tokenizer=args.tokenizer,
+                                  profile=profiler is not None,
+                                  episode_records=args.episode_records)
+
+    metrics = BuildMetrics(task_names,
+                           textfile_path=args.metrics_textfile,
+                           report_interval=args.progress_interval,
+                           show_progress=not args.print,
+                           target_examples=args.max_count)
+    for task_name, task in zip(task_names, tasks):
+        # Only cached tasks know how many episodes to expect up-front.
+        expected_episode_count = getattr(task, "expected_episode_count", None)
+        if expected_episode_count is not None:
+            metrics.tasks[task_name].expected_episodes = \
+                expected_episode_count()
+
+    # All tasks get fed through as a single stream of episodes, that way every
+    # episode gets a unique position (and therefore RNG seed) in the build.
+    # Keeps track of which task (and which of its episodes) each episode that's
+    # still being worked on is, too. Results come back in the same order.
+    pending_episodes: collections.deque[tuple[int, int]] = collections.deque()
+    task_rng_states: dict[int, t.Any] = {}
+    episodes_done = checkpoint.episodes_done if checkpoint is not None else 0
+    mixer = None
+    quota_token_counter = None
+    if args.task_weights is not None or args.task_quotas is not None:
+        # Mixed tasks get seeded per task instead, see `TaskMixer`.
+        mixer = TaskMixer(
+            tasks,
+            task_names,
+            seed=args.seed,
+            weights=[
+                args.task_weights.get(name, 1.0) for name in task_names
+            ] if args.task_weights is not None else None,
+            quotas=[(args.task_quotas or {}).get(name) for name in task_names],
+            profiler=profiler,
+            resume_from=checkpoint.mixer_state
+            if checkpoint is not None else None)
+        if args.quota_unit == "tokens":
+            quota_token_counter = build_token_counter(args.tokenizer)
+        results = generate_examples_for_seeded(
+            _seeded_episodes_for(mixer, task_names, pending_episodes),
+            settings=settings,
+            workers=args.workers)
+    else:
+        episodes = _episodes_for(tasks,
+                                 task_names,
+                                 profiler,
+                                 pending_episodes,
+                                 task_rng_states,
+                                 resume_from=checkpoint)
+        results = generate_examples_for(episodes,
+                                        settings=settings,
+                                        workers=args.workers,
+                                        start=episodes_done)
+    task_episodes_done = list(checkpoint.mixer_state["task_episodes_done"]) \
+        if checkpoint is not None and checkpoint.mixer_state is not None \
+        else [0] * len(tasks)
+
+    completed = False
+    reached_max_count = False
+    try:
+        for result in results:
+            task_idx, task_episode_idx = pending_episodes.popleft()
+            task_name = task_names[task_idx]
+            episodes_done += 1
+            task_episodes_done[task_idx] = task_episode_idx + 1
+            metrics.record_episode(task_name,
+                                   examples_generated=len(result.examples),
+                                   turn_too_large=result.turn_too_large)
+            if profiler is not None:
+                assert result.generation_time is not None
+                profiler.add(task_name,
+                             EXAMPLE_GENERATION,
+                             *result.generation_time,
+                             items=len(result.examples))
 
-    for task in tasks:
-        for episode in task:
             if args.print and print_new_episode_header:
                 print(
                     color("     new episode      ",
@@ -50,56 +229,256 @@ def main() -> None:
                         style="bold")
                 )
                 print_new_episode_header = False
-            
-            try:
-                for example in TrainingExampleGenerator(episode, target_token_count=args.max_length, format=args.format):
-                    # Right off the bat, if this training example gets caught by one
-                    # of the filters, skip over and don't even count it.
-                    should_keep = True
-                    for filter in example_filters:
-                        if not filter.should_keep(example):
-                            should_keep = False
-                            break
-                    if not should_keep:
-                        continue
 
-                    idx += 1
-                    if idx < args.starting_index:
+            for example in result.examples:
+                # Quotas and --max-count get checked before any filter sees the
+                # example, since filters remember what they've kept (e.g. the
+                # dedup index) and this one wouldn't get written anyway.
+                if mixer is not None and mixer.is_full(task_idx):
+                    metrics.record_filtered(task_name, "quota")
+                    continue
+                if args.max_count and (idx + 1 >
+                                       args.starting_index + args.max_count):
+                    reached_max_count = True
+                    break
+
+                # Right off the bat, if this training example gets caught by one
+                # of the filters, skip over and don't even count it.
+                if isinstance(example, EpisodeRecord):
+                    # Every generation in an episode record gets filtered on
+                    # its own, so one bad generation doesn't take the others
+                    # down with it. Rejected ones stay in the text as context,
+                    # same as in the examples for later turns, but are no
+                    # longer trained on.
+                    kept_spans = [
+                        span for span, span_example in zip(
+                            example.spans, example.training_examples())
+                        if _passes_filters(span_example, example_filters,
+                                           task_name, metrics, profiler)
+                    ]
+                    if not kept_spans:
                         continue
-                    if args.max_count and (idx >
-                                        args.starting_index + args.max_count):
-                        quit()
-
-                    print_new_episode_header = True
-
-                    if args.print:
-                        print(
-                            color("   training example   ",
-                                fg="black",
-                                bg="orange",
-                                style="bold")
-                        )
-                        print(color(example.prompt, fg="gray"), end="")
-                        print(color(example.generation, fg="green"))
-                    else:
-                        dict_to_write = {
-                            "prompt": example.prompt,
-                            "generation": example.generation,
-                            "identifier": example.identifier,
-                        }
-                        f.write(json.dumps(dict_to_write) + "\n")
-            except TurnTooLargeError:
+                    if len(kept_spans) != len(example.spans):
+                        example = replace(example, spans=kept_spans)
+                    training_example = example.as_training_example()
+                else:
+                    if not _passes_filters(example, example_filters, task_name,
+                                           metrics, profiler):
+                        continue
+                    training_example = example
+
+                idx += 1
+                if idx < args.starting_index:
+                    continue
+
+                print_new_episode_header = True
+
+                if writer is None:
+                    print(
+                        color("   training example   ",
+                            fg="black",
+                            bg="orange",
+                            style="bold")
+                    )
+                    _print_example(example)
+                else:
+                    if profiler is not None:
+                        profiler.start(WRITE, task_name)
+                    writer.write(_record_for(example))
+                    if profiler is not None:
+                        profiler.stop(items=1)
+
+                    metrics.record_written(task_name)
+                    metrics.bytes_written = writer.bytes_written
+
+                if mixer is not None:
+                    mixer.record_written(
+                        task_idx,
+                        sum(quota_token_counter.count_batch(
+                            [training_example.prompt,
+                             training_example.generation]))
+                        if quota_token_counter is not None else 1)
+
+            if reached_max_count:
+                break
+
+            if result.turn_too_large:
                 LOG.info("Skipping over episode (%s) due to a TurnTooLargeError",
-                        episode.identifier)
-                
-    if not args.print:
-        f.close()
+                        result.episode_identifier)
+
+            if checkpointer is not None:
+                checkpointer.record_examples(len(result.examples))
+                if checkpointer.is_due():
+                    assert writer is not None
+                    checkpointer.save(
+                        Checkpoint(
+                            episodes_done=episodes_done,
+                            task_index=task_idx,
+                            task_episodes_done=task_episode_idx + 1,
+                            task_rng_state=task_rng_states.get(task_idx),
+                            examples_kept=idx,
+                            writer_position=writer.checkpoint(),
+                            mixer_state=mixer.state_for(task_episodes_done)
+                            if mixer is not None else None,
+                        ))
+
+            metrics.maybe_report()
+        completed = True
+    finally:
+        results.close()
+        # Also reached when bailing out early due to `--max-count`, so any
+        # buffered examples still make it to disk.
+        if writer is not None:
+            if profiler is not None:
+                profiler.start(WRITE, NO_TASK)
+            writer.close()
+            if profiler is not None:
+                profiler.stop()
+            metrics.bytes_written = writer.bytes_written
+        metrics.report(final=True)
+        if completed:
+            # Not if the build crashed, or e.g. `--dedup-index` would end up
+            # with examples that never made it into the output. Resuming
+            # restores filters' state from the checkpoint instead.
+            for filter in example_filters:
+                filter.close()
+            # Kept around if the build crashed, so it can be resumed.
+            if checkpointer is not None:
+                checkpointer.remove()
+
+        if profiler is not None:
+            for line in profiler.report_lines():
+                LOG.info(line)
+            profiler.save(args.profile)
+            LOG.info("Saved profile to %s", args.profile)
 
 #
 # Helpers and CLI entrypoint.
 #
 
 
+def _episodes_for(
+    tasks: list[BaseTask],
+    task_names: list[str],
+    profiler: Profiler | None,
+    pending_episodes: collections.deque[tuple[int, int]],
+    task_rng_states: dict[int, t.Any],
+    resume_from: Checkpoint | None = None,
+) -> t.Generator[Episode, None, None]:
+    '''
+    Chains the episodes from all tasks together, appending the index of the
+    task each episode came from and the episode's index within that task to
+    `pending_episodes`. The global RNG's state right before each task starts
+    goes into `task_rng_states`, since checkpoints need it.
+
+    When resuming, tasks before the checkpoint's are skipped over entirely,
+    and the checkpoint's task picks up where it was at.
+    '''
+    first_task_idx, first_episode_idx = 0, 0
+    if resume_from is not None:
+        first_task_idx = resume_from.task_index
+        first_episode_idx = resume_from.task_episodes_done
+        resume_from.restore_task_rng_state()
+
+    for task_idx in range(first_task_idx, len(tasks)):
+        task, task_name = tasks[task_idx], task_names[task_idx]
+        start = first_episode_idx if task_idx == first_task_idx else 0
+        task_rng_states[task_idx] = random.getstate()
+
+        episodes: t.Iterable[Episode] = task.episodes_from(start)
+        if profiler is not None:
+            episodes = profiler.profile_iterable(episodes, TASK_TRANSFORM,
+                                                 task_name)
+        for task_episode_idx, episode in enumerate(episodes, start=start):
+            pending_episodes.append((task_idx, task_episode_idx))
+            yield episode
+
+
+def _seeded_episodes_for(
+    mixer: TaskMixer,
+    task_names: list[str],
+    pending_episodes: collections.deque[tuple[int, int]],
+) -> t.Generator[tuple[str, Episode], None, None]:
+    '''
+    Same as `_episodes_for`, but for mixed tasks, which get seeded by their
+    name and their position within the task.
+    '''
+    for (task_idx, task_episode_idx), episode in mixer:
+        pending_episodes.append((task_idx, task_episode_idx))
+        yield f"{task_names[task_idx]}-{task_episode_idx}", episode
+
+
+def _build_filter(name: str,
+                  args: argparse.Namespace) -> TrainingExampleFilter:
+    # Filters which can be configured from the command line. Matched by name
+    # so we don't have to import every filter module up-front.
+    kwargs_for_filter: dict[str, dict[str, t.Any]] = {
+        "DuplicateFilter": {
+            "index_path": args.dedup_index,
+            "use_bloom_filter": args.dedup_bloom_filter,
+        },
+        "NearDuplicateFilter": {
+            "threshold": args.near_dup_threshold,
+            "shingle_size": args.shingle_size,
+            "capacity": args.near_dup_capacity or None,
+        },
+    }
+
+    filter_cls = NAME_TO_TRAINING_EXAMPLE_FILTER_MAPPING[name]
+    return filter_cls(**kwargs_for_filter.get(name, {}))
+
+
+def _passes_filters(example: TrainingExample,
+                    example_filters: list[TrainingExampleFilter],
+                    task_name: str,
+                    metrics: BuildMetrics,
+                    profiler: Profiler | None) -> bool:
+    '''
+    Runs `example` through the filters, stopping at the first one which
+    rejects it.
+    '''
+    for filter in example_filters:
+        if profiler is not None:
+            profiler.start(FILTER_PREFIX + type(filter).__name__, task_name)
+        should_keep = filter.should_keep(example)
+        if profiler is not None:
+            profiler.stop(items=1)
+
+        if not should_keep:
+            metrics.record_filtered(task_name, type(filter).__name__)
+            return False
+    return True
+
+
+def _record_for(example: TrainingExample | EpisodeRecord) -> dict[str, t.Any]:
+    if isinstance(example, EpisodeRecord):
+        return {
+            "text": example.text,
+            "spans": [list(span) for span in example.spans],
+            "identifier": example.identifier,
+        }
+    return {
+        "prompt": example.prompt,
+        "generation": example.generation,
+        "identifier": example.identifier,
+    }
+
+
+def _print_example(example: TrainingExample | EpisodeRecord) -> None:
+    '''Prints the example, with whatever gets trained on in green.'''
+    if not isinstance(example, EpisodeRecord):
+        print(color(example.prompt, fg="gray"), end="")
+        print(color(example.generation, fg="green"))
+        return
+
+    offset = 0
+    for start, end in example.spans:
+        print(color(example.text[offset:start], fg="gray"), end="")
+        print(color(example.text[start:end], fg="green"), end="")
+        offset = end
+    print(color(example.text[offset:], fg="gray"))
+
+
 def _parse_args_from_argv() -> argparse.Namespace:
     parser = argparse.ArgumentParser()
 
@@ -116,7 +495,82 @@ def _parse_args_from_argv() -> argparse.Namespace:
         "--output-file",
         type=str,
         default="", # Not required if examples just need to be printed
-        help="The tasks to build data for, comma-separated."
+        help="The file to write the training examples to. Compressed if it ends in `.gz` or `.zst`."
+    )
+
+    parser.add_argument(
+        "--output-format",
+        type=str,
+        choices=OUTPUT_FORMATS,
+        default="jsonl",
+        help="The format to write training examples in. 'parquet' and 'arrow' store each field as a column, and 'arrow' files can be memory-mapped."
+    )
+
+    parser.add_argument(
+        "--max-shard-size",
+        type=_parse_size,
+        default=None,
+        help="Split the output into several files of at most this many (uncompressed) bytes each, e.g. `512M` or `2G`. Shards are named like `out-00000.jsonl.zst`."
+    )
+
+    parser.add_argument(
+        "--shuffle",
+        action="store_true",
+        help="Shuffle the output (seeded by `--seed`). Examples get scattered across temporary files as they're generated, then each one gets shuffled in memory and written out once the build is done, so this works for output much larger than memory."
+    )
+
+    parser.add_argument(
+        "--shuffle-memory",
+        type=_parse_size,
+        default="1G",
+        help="Roughly how much memory `--shuffle` can use to hold examples at once, e.g. `512M` or `4G`. Output larger than 256 times this takes an extra pass over the temporary files."
+    )
+
+    parser.add_argument(
+        "--shuffle-tmp-dir",
+        type=str,
+        default=None,
+        help="Where `--shuffle` keeps its temporary files. Defaults to the output file's folder. Needs about as much free space as the (uncompressed) output."
+    )
+
+    parser.add_argument(
+        "--episode-records",
+        action="store_true",
+        help="Write one record per context window instead of one training example per model turn, so the context isn't copied over for every turn. Windows are also split up wherever a generation calls for different response style/length instructions than the ones in the record. Records then hold the rendered `text` and the `spans` (character offsets) of every generation within it to train on. Filters see each generation on its own, with everything before it as the prompt, and rejected ones are just no longer marked as spans. Quotas count each record as a single training example."
+    )
+
+    parser.add_argument(
+        "--pack",
+        action="store_true",
+        help="Pack examples together into records of up to `--max-length` tokens (counted with `--tokenizer`), to cut down on padding. Records then hold the examples' `text` back to back, the `boundaries` of each example within it and the `spans` to train on, all as character offsets, along with the examples' `identifiers`. Tokens are only counted to decide what fits, so use a real tokenizer for records that fit the budget exactly."
+    )
+
+    parser.add_argument(
+        "--pack-window",
+        type=int,
+        default=1000,
+        help="How many examples `--pack` packs at once. Larger windows pack tighter but hold more examples in memory."
+    )
+
+    parser.add_argument(
+        "--serializer",
+        type=str,
+        default="json",
+        help="How to serialize examples into JSON (accepted inputs: 'json', 'orjson'). orjson (which needs the `orjson` package) is faster, but escapes characters and spaces out separators differently, so its output isn't byte-identical."
+    )
+
+    parser.add_argument(
+        "--episode-cache",
+        type=str,
+        default=None,
+        help="Folder to cache each task's episodes in, so later builds (e.g. with a different `--format` or `--max-length`) can skip re-processing the datasets. Tasks' prompts are then seeded per task, so output differs from builds without a cache."
+    )
+
+    parser.add_argument(
+        "--html-backend",
+        type=str,
+        default=None,
+        help="The HTML parser to use when converting HTML to Markdown (accepted inputs: 'html5lib', 'html.parser', 'lxml'). Defaults to whichever one each task was written against."
     )
 
     parser.add_argument(
@@ -126,13 +580,54 @@ def _parse_args_from_argv() -> argparse.Namespace:
         help="List of comma-separated filters to apply to training examples."
     )
 
+    parser.add_argument(
+        "--dedup-index",
+        type=str,
+        default=None,
+        help="Where DuplicateFilter keeps its index of already seen examples. Examples seen by previous builds using the same index are dropped too. Indexes from separate shards can be combined with `scripts/merge_dedup_indexes.py`."
+    )
+
+    parser.add_argument(
+        "--dedup-bloom-filter",
+        action="store_true",
+        help="Put a bloom filter in front of DuplicateFilter's index. Speeds things up when the index is too large to stay in memory."
+    )
+
+    parser.add_argument(
+        "--near-dup-threshold",
+        type=float,
+        default=0.8,
+        help="How similar (estimated Jaccard similarity, between 0 and 1) two examples need to be for NearDuplicateFilter to drop the latter."
+    )
+
+    parser.add_argument(
+        "--shingle-size",
+        type=int,
+        default=5,
+        help="How many consecutive words NearDuplicateFilter compares examples by."
+    )
+
+    parser.add_argument(
+        "--near-dup-capacity",
+        type=int,
+        default=1_000_000,
+        help="How many of the most recently kept examples NearDuplicateFilter compares against, which bounds its memory use (around 72 bytes per example). At least half of these are always remembered. 0 remembers every kept example, so memory grows with the size of the build."
+    )
+
     parser.add_argument(
         "-l",
         "--max-length",
         type=int,
         default=2048,
         # TODO(TG): Explain this more clearly
-        help="The (approximate) amount of tokens to limit episodes to."
+        help="The amount of tokens to limit episodes to. Only approximate unless a real tokenizer is given with `--tokenizer`."
+    )
+
+    parser.add_argument(
+        "--tokenizer",
+        type=str,
+        default="estimate",
+        help="How to count tokens: 'estimate' (word count based, default), 'regex' (local stand-in tokenizer) or a HuggingFace tokenizer name/path."
     )
 
     parser.add_argument(
@@ -150,6 +645,29 @@ def _parse_args_from_argv() -> argparse.Namespace:
         help="Print training examples instead of writing to STDOUT."
     )
 
+    parser.add_argument(
+        "--profile",
+        type=str,
+        nargs="?",
+        const="build-profile.json",
+        default=None,
+        help="Report how much wall and CPU time each task spent on every stage of the build (reading datasets, transforming episodes, generating examples, each filter and writing), and save it as JSON to the given path (`build-profile.json` if not given)."
+    )
+
+    parser.add_argument(
+        "--progress-interval",
+        type=float,
+        default=10.0,
+        help="How often (in seconds) to report progress: episodes/s, examples/s, bytes written, filtered and skipped examples and ETAs where known. 0 only reports once the build is done."
+    )
+
+    parser.add_argument(
+        "--metrics-textfile",
+        type=str,
+        default=None,
+        help="Also export progress metrics to this file in Prometheus text format every `--progress-interval` seconds, e.g. for node-exporter's textfile collector. Should end in `.prom`."
+    )
+
     parser.add_argument(
         "-v",
         "--verbose",
@@ -164,6 +682,21 @@ def _parse_args_from_argv() -> argparse.Namespace:
         help="The seed for the random number generator."
     )
 
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="How many processes to spread training example generation across. Output is identical regardless of this value."
+    )
+
+    parser.add_argument(
+        "--shard",
+        type=_parse_shard,
+        default=(0, 1),
+        help="Only build from the input files in shard `i` out of `n`, given as `i/n` (zero-indexed). Outputs of all shards can be concatenated."
+    )
+
     parser.add_argument(
         "--starting-index",
         type=int,
@@ -178,8 +711,92 @@ def _parse_args_from_argv() -> argparse.Namespace:
         help="Limit how many training examples to generate."
     )
 
+    parser.add_argument(
+        "--task-weights",
+        type=_parse_per_task(float),
+        default=None,
+        help="Interleave the given tasks' episodes according to these weights instead of building them one after another, given as comma-separated `Task=weight` pairs (e.g. `RpForumsRoleplayTask=3,OpenOrcaTask=5`). Weights are in episodes, and tasks not listed get a weight of 1. Tasks' prompts are then seeded per task, so output differs from builds without weights or quotas."
+    )
+
+    parser.add_argument(
+        "--task-quotas",
+        type=_parse_per_task(int),
+        default=None,
+        help="Stop pulling from a task once this many of its training examples (or tokens, see `--quota-unit`) have been written, given as comma-separated `Task=quota` pairs. Tasks not listed are unlimited. Tasks' prompts are then seeded per task, so output differs from builds without weights or quotas."
+    )
+
+    parser.add_argument(
+        "--quota-unit",
+        type=str,
+        choices=["examples", "tokens"],
+        default="examples",
+        help="What `--task-quotas` are counted in. Tokens are counted over each example's prompt and generation with `--tokenizer`."
+    )
+
+    parser.add_argument(
+        "--checkpoint-interval",
+        type=int,
+        default=None,
+        help="Save a checkpoint (to the output file's path plus `.checkpoint.json`) every time at least this many more training examples have been generated, so the build can be picked back up with `--resume` if it crashes. Only supported with the 'jsonl' output format."
+    )
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Resume the build from its last checkpoint, truncating the output back to where it was at. Must be given the same arguments the build was started with (other than e.g. `--workers`)."
+    )
+
     return parser.parse_args()
 
 
+def _parse_shard(value: str) -> tuple[int, int]:
+    '''Parses a shard given as `i/n` into a `(shard_index, num_shards)` tuple.'''
+    try:
+        shard_index, num_shards = (int(x) for x in value.split("/"))
+    except ValueError as ex:
+        raise argparse.ArgumentTypeError(
+            f"Expected a shard in the form `i/n`, got `{value}`") from ex
+
+    if num_shards < 1 or not 0 <= shard_index < num_shards:
+        raise argparse.ArgumentTypeError(
+            f"Shard index must be between 0 and {num_shards - 1}, got `{value}`")
+
+    return shard_index, num_shards
+
+
+def _parse_per_task(
+        value_type: t.Callable[[str], T]) -> t.Callable[[str], dict[str, T]]:
+    '''
+    Returns a parser for comma-separated `Task=value` pairs, e.g.
+    `RpForumsRoleplayTask=3,OpenOrcaTask=5`.
+    '''
+
+    def _parse(value: str) -> dict[str, T]:
+        values: dict[str, T] = {}
+        for pair in value.split(","):
+            task_name, _, task_value = pair.partition("=")
+            try:
+                values[task_name.strip()] = value_type(task_value)
+            except ValueError as ex:
+                raise argparse.ArgumentTypeError(
+                    f"Expected `Task=value` pairs, got `{pair}`") from ex
+        return values
+
+    return _parse
+
+
+def _parse_size(value: str) -> int:
+    '''Parses a size such as `4096`, `512K`, `256M` or `2G` into bytes.'''
+    multipliers = {"K": 1024, "M": 1024**2, "G": 1024**3}
+    value = value.strip().upper().removesuffix("B")
+
+    try:
+        if value and value[-1] in multipliers:
+            return int(float(value[:-1]) * multipliers[value[-1]])
+        return int(value)
+    except ValueError as ex:
+        raise argparse.ArgumentTypeError(f"Invalid size: `{value}`") from ex
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+import argparse
+import logging
+
+from toolbox.filters.dedup_index import DedupIndex
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Merges the dedup indexes written by separate builds (e.g. one per shard) into a single one.")
+    parser.add_argument("output", type=str, help="Where to write the merged index to.")
+    parser.add_argument("inputs", type=str, nargs="+", help="The indexes to merge.")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format='[%(asctime)s] [%(levelname)s] %(message)s',
+        level=logging.INFO,
+    )
+
+    DedupIndex.merged_from(args.inputs).save(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import glob
+import json
+import logging
+import os
+import random
+import typing as t
+from dataclasses import asdict, dataclass, field
+
+from toolbox.filters.training_example_filter import TrainingExampleFilter
+
+LOG = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Checkpoint:
+    '''Everything needed to resume a build from where it was at.'''
+    # How many episodes (across all tasks) have been fully handled.
+    episodes_done: int
+    # Which task the next episode comes from (by its position in the list of
+    # tasks), and how many of its episodes have been handled already.
+    task_index: int
+    task_episodes_done: int
+    # The state of the global RNG (which tasks pick their prompts with) right
+    # before that task started, as returned by `random.getstate()`.
+    task_rng_state: t.Any
+    # How many examples made it past the filters so far.
+    examples_kept: int
+    # Where the writer was at. See `ExampleWriter.checkpoint`.
+    writer_position: dict[str, t.Any]
+    # Where each task was at when they're being mixed (see
+    # `TaskMixer.state_for`), in which case the three fields about the task
+    # above are only informational.
+    mixer_state: dict[str, t.Any] | None = None
+    # These two get filled in by `Checkpointer.save`. Arguments the build was
+    # started with which affect its output (a build can only be resumed with
+    # the exact same ones), and where each filter's state was saved to, if it
+    # has any.
+    settings: dict[str, t.Any] = field(default_factory=dict)
+    filter_state_paths: list[str | None] = field(default_factory=list)
+
+    def restore_task_rng_state(self) -> None:
+        '''Puts the global RNG back into `task_rng_state`.'''
+        version, internal_state, gauss_next = self.task_rng_state
+        random.setstate((version, tuple(internal_state), gauss_next))
+
+
+class Checkpointer:
+    '''
+    Saves a build's progress into `path` every `interval` training examples
+    (or never, if not given), so it can be resumed from there if it crashes.
+
+    The checkpoint itself is a small JSON file, replaced atomically. Filters
+    save their state next to it (see `TrainingExampleFilter.save_state`) under
+    names unique to each checkpoint, and the previous checkpoint's files only
+    get removed once the new checkpoint has replaced it, so there's always a
+    complete checkpoint on disk.
+    '''
+
+    def __init__(self, path: str, settings: dict[str, t.Any],
+                 filters: list[TrainingExampleFilter],
+                 interval: int | None) -> None:
+        self.path = path
+        # Round-tripped through JSON so it compares equal to a loaded one.
+        self.settings = json.loads(json.dumps(settings))
+        self.filters = filters
+        self.interval = interval
+
+        self._examples_since_save = 0
+
+    def load(self) -> Checkpoint:
+        '''
+        Loads the checkpoint and restores every filter's state from it. Raises
+        a `ValueError` if it was made by a build with different settings.
+        '''
+        with open(self.path, "r", encoding="utf-8") as file:
+            checkpoint = Checkpoint(**json.load(file))
+
+        mismatches = [
+            key for key in self.settings.keys() | checkpoint.settings.keys()
+            if self.settings.get(key) != checkpoint.settings.get(key)
+        ]
+        if mismatches:
+            raise ValueError(
+                f"Can't resume from {self.path}, it was made by a build with different arguments: {', '.join(sorted(mismatches))}"
+            )
+        if len(checkpoint.filter_state_paths) != len(self.filters):
+            raise ValueError(
+                f"Can't resume from {self.path}, it has state for {len(checkpoint.filter_state_paths)} filter(s) but the build has {len(self.filters)}"
+            )
+
+        for example_filter, state_path in zip(self.filters,
+                                              checkpoint.filter_state_paths):
+            if state_path is not None:
+                example_filter.load_state(state_path)
+
+        return checkpoint
+
+    def record_examples(self, count: int) -> None:
+        self._examples_since_save += count
+
+    def is_due(self) -> bool:
+        return self.interval is not None \
+            and self._examples_since_save >= self.interval
+
+    def save(self, checkpoint: Checkpoint) -> None:
+        '''
+        Saves `checkpoint`, along with the state of every filter.
+        '''
+        filter_state_paths: list[str | None] = []
+        for idx, example_filter in enumerate(self.filters):
+            state_path = f"{self.path}.{checkpoint.episodes_done}.{idx}.state"
+            example_filter.save_state(state_path)
+            filter_state_paths.append(
+                state_path if os.path.exists(state_path) else None)
+
+        data = {
+            **asdict(checkpoint),
+            "settings": self.settings,
+            "filter_state_paths": filter_state_paths,
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+
+        self._remove_filter_states(exclude=filter_state_paths)
+        self._examples_since_save = 0
+        LOG.debug("Saved checkpoint at %s episodes to %s",
+                  checkpoint.episodes_done, self.path)
+
+    def remove(self) -> None:
+        '''Removes the checkpoint, once the build it was for is done.'''
+        self._remove_filter_states(exclude=[])
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _remove_filter_states(self, exclude: list[str | None]) -> None:
+        # Also catches leftovers from a crash in the middle of saving.
+        for path in glob.glob(f"{glob.escape(self.path)}.*.state"):
+            if path not in exclude:
+                os.remove(path)
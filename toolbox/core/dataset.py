@@ -1,20 +1,54 @@
+import contextlib
+import functools
 import os
 import typing as t
 
+from toolbox.core.profiling import DATASET_READ, get_profiler
+
 HERE = os.path.realpath(os.path.dirname(__file__))
 T = t.TypeVar("T")
 
+# The shard datasets read from when not explicitly given one. Overridden by the
+# CLI so builds can be split up across several processes or machines.
+_default_shard_index = 0
+_default_num_shards = 1
+
+# Sets of dataset names being recorded by `record_dataset_accesses`.
+_dataset_access_recorders: list[dict[str, None]] = []
+
 
 class BaseDataset(t.Generic[T]):
     '''Base dataset class.'''
 
+    def __init__(self,
+                 shard_index: int | None = None,
+                 num_shards: int | None = None) -> None:
+        self.shard_index = _default_shard_index if shard_index is None else shard_index
+        self.num_shards = _default_num_shards if num_shards is None else num_shards
+        validate_shard(self.shard_index, self.num_shards)
+
+    def __init_subclass__(cls, **kwargs: t.Any) -> None:
+        super().__init_subclass__(**kwargs)
+        # Time spent reading datasets gets reported separately from the time
+        # tasks spend transforming their items, when profiling.
+        if "__iter__" in cls.__dict__:
+            cls.__iter__ = _profiled_iter(cls.__dict__["__iter__"])
+
     def __iter__(self) -> t.Generator[T, None, None]:
         '''
         This method must be overidden when inheriting. It should yield
-        individual items from the dataset.
+        individual items from the dataset, only reading from the input files
+        which belong to `self.shard_index`.
         '''
         raise NotImplementedError
 
+    def files_in_shard(self, file_paths: t.Sequence[str]) -> list[str]:
+        '''
+        Returns the subset of `file_paths` this dataset should read from. Any
+        dataset backed by a single file will only yield items on shard 0.
+        '''
+        return shard_items(file_paths, self.shard_index, self.num_shards)
+
 
 def get_path_for(dataset_name: str | None) -> str:
     '''
@@ -33,5 +67,76 @@ def get_path_for(dataset_name: str | None) -> str:
 
     if dataset_name is not None:
         components.append(dataset_name)
+        for recorder in _dataset_access_recorders:
+            recorder[dataset_name] = None
 
     return os.path.join(*components)
+
+
+@contextlib.contextmanager
+def record_dataset_accesses() -> t.Generator[list[str], None, None]:
+    '''
+    Records the names of all datasets whose paths are looked up while inside
+    the context. The returned list is filled in once the context exits.
+    '''
+    recorder: dict[str, None] = {}
+    names: list[str] = []
+    _dataset_access_recorders.append(recorder)
+    try:
+        yield names
+    finally:
+        _dataset_access_recorders.remove(recorder)
+        names.extend(recorder)
+
+
+def get_default_shard() -> tuple[int, int]:
+    '''Returns the default `(shard_index, num_shards)` for datasets.'''
+    return _default_shard_index, _default_num_shards
+
+
+def set_default_shard(shard_index: int, num_shards: int) -> None:
+    '''Sets the shard that datasets will read from unless told otherwise.'''
+    validate_shard(shard_index, num_shards)
+
+    global _default_shard_index, _default_num_shards
+    _default_shard_index = shard_index
+    _default_num_shards = num_shards
+
+
+def validate_shard(shard_index: int, num_shards: int) -> None:
+    '''Raises a `ValueError` if the given shard doesn't make sense.'''
+    if num_shards < 1:
+        raise ValueError(f"Invalid number of shards: {num_shards}")
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(
+            f"Shard index {shard_index} out of range for {num_shards} shards")
+
+
+def shard_items(items: t.Sequence[T], shard_index: int,
+                num_shards: int) -> list[T]:
+    '''
+    Returns the subset of `items` belonging to the given shard. Items are
+    dealt out round-robin, so every item ends up in exactly one shard and the
+    shards differ in size by at most one item.
+    '''
+    validate_shard(shard_index, num_shards)
+    return list(items[shard_index::num_shards])
+
+
+#
+# Private helpers.
+#
+
+
+def _profiled_iter(
+    iter_fn: t.Callable[[t.Any], t.Iterator[T]]
+) -> t.Callable[[t.Any], t.Generator[T, None, None]]:
+    @functools.wraps(iter_fn)
+    def wrapper(self: t.Any) -> t.Generator[T, None, None]:
+        profiler = get_profiler()
+        if profiler is None:
+            yield from iter_fn(self)
+        else:
+            yield from profiler.profile_iterable(iter_fn(self), DATASET_READ)
+
+    return wrapper
@@ -0,0 +1,279 @@
+import functools
+import hashlib
+import itertools
+import json
+import logging
+import os
+import random
+import typing as t
+
+import pyarrow as pa
+
+from toolbox.core.dataset import (
+    get_default_shard,
+    get_path_for,
+    record_dataset_accesses
+)
+from toolbox.core.models import Episode, Turn, TurnKind
+from toolbox.core.task import BaseTask
+from toolbox.utils.markdown import get_html_backend
+
+LOG = logging.getLogger(__name__)
+
+# Bump whenever the on-disk format changes, or anything that affects episodes
+# without touching the source files hashed below.
+CACHE_FORMAT_VERSION = 1
+
+# How many episodes go into each Arrow record batch.
+EPISODES_PER_BATCH = 1024
+
+HERE = os.path.realpath(os.path.dirname(__file__))
+
+# Source files and folders (relative to the `toolbox` package) which can affect
+# which episodes a task generates. Used to invalidate the cache on code changes.
+_EPISODE_SOURCES = ["core/models.py", "core/dataset.py", "datasets", "tasks", "utils"]
+
+_EPISODE_SCHEMA = pa.schema([
+    ("identifier", pa.string()),
+    ("turns",
+     pa.list_(
+         pa.struct([
+             ("utterance", pa.string()),
+             ("kind", pa.string()),
+             ("name", pa.string()),
+         ]))),
+])
+
+
+class CachedTask(BaseTask):
+    '''
+    Wraps a task, saving the episodes it generates into an Arrow file within
+    `cache_dir` so later builds can just stream them back instead of having to
+    redo all of the task's work (HTML to Markdown conversion, YAML parsing...).
+
+    Cached episodes are keyed by the task's name and attributes (which covers
+    its constructor arguments), the current shard, the seed, the HTML backend,
+    and a hash of the code that goes into generating episodes. They're only used if none of the
+    input files of the datasets the task read from changed since, going by
+    their paths, sizes and modification times.
+
+    Since tasks pick prompts through the global RNG, it gets re-seeded from
+    `seed` and the task name before the task runs. That way, a task's episodes
+    don't depend on which tasks ran before it, and are the same whether they
+    come from the cache or not.
+    '''
+
+    def __init__(self, task: BaseTask, cache_dir: str, seed: int) -> None:
+        super().__init__()
+
+        self.task = task
+        self.cache_dir = cache_dir
+        self.seed = seed
+
+        self.task_name = type(task).__name__
+        key = _cache_key_for(task, seed)
+        self.episodes_path = os.path.join(cache_dir,
+                                          f"{self.task_name}-{key}.arrow")
+        self.metadata_path = os.path.join(cache_dir,
+                                          f"{self.task_name}-{key}.json")
+
+    def expected_episode_count(self) -> int | None:
+        '''
+        How many episodes the task generated the last time it was cached, if
+        it ever was. Still returned if the cache is out of date, since it's
+        usually a decent estimate anyways.
+        '''
+        if not os.path.exists(self.metadata_path):
+            return None
+        with open(self.metadata_path, "r", encoding="utf-8") as file:
+            return json.load(file).get("episode_count")
+
+    def __iter__(self) -> t.Generator[Episode, None, None]:
+        yield from self.episodes_from(0)
+
+    def episodes_from(self, start: int) -> t.Iterator[Episode]:
+        '''
+        Cached episodes get read starting from the `start`-th one, skipping
+        over whole record batches without deserializing them.
+        '''
+        random.seed(f"{self.seed}-{self.task_name}")
+
+        if self._is_cache_valid():
+            LOG.info("Reading %s episodes from cache at %s", self.task_name,
+                     self.episodes_path)
+            return _read_episodes_from(self.episodes_path, start=start)
+        return itertools.islice(self._generate_and_cache(), start, None)
+
+    def _is_cache_valid(self) -> bool:
+        if not os.path.exists(self.metadata_path) or not os.path.exists(
+                self.episodes_path):
+            return False
+
+        with open(self.metadata_path, "r", encoding="utf-8") as file:
+            metadata = json.load(file)
+
+        fingerprint = _fingerprint_for_datasets(metadata["datasets"])
+        if fingerprint != metadata["fingerprint"]:
+            LOG.info("Input files for %s changed, ignoring its cached episodes",
+                     self.task_name)
+            return False
+        return True
+
+    def _generate_and_cache(self) -> t.Generator[Episode, None, None]:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self.episodes_path}.tmp"
+        completed = False
+
+        try:
+            with record_dataset_accesses() as dataset_names, \
+                    pa.OSFile(tmp_path, "wb") as sink, \
+                    pa.ipc.new_stream(
+                        sink,
+                        _EPISODE_SCHEMA,
+                        options=pa.ipc.IpcWriteOptions(compression="zstd"),
+                    ) as writer:
+                pending: list[dict[str, t.Any]] = []
+                episode_count = 0
+                for episode in self.task:
+                    yield episode
+                    episode_count += 1
+
+                    pending.append(_serialize_episode(episode))
+                    if len(pending) >= EPISODES_PER_BATCH:
+                        writer.write_batch(
+                            pa.RecordBatch.from_pylist(pending,
+                                                       schema=_EPISODE_SCHEMA))
+                        pending = []
+
+                if pending:
+                    writer.write_batch(
+                        pa.RecordBatch.from_pylist(pending,
+                                                   schema=_EPISODE_SCHEMA))
+            completed = True
+        finally:
+            # Only ever cache the task's entire output, not whatever part of it
+            # we got through before being stopped early.
+            if not completed and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        os.replace(tmp_path, self.episodes_path)
+        _write_json_atomically(
+            self.metadata_path, {
+                "task": self.task_name,
+                "datasets": dataset_names,
+                "fingerprint": _fingerprint_for_datasets(dataset_names),
+                "episode_count": episode_count,
+            })
+        LOG.info("Cached %s episodes at %s", self.task_name,
+                 self.episodes_path)
+
+
+#
+# Private helpers.
+#
+
+
+def _cache_key_for(task: BaseTask, seed: int) -> str:
+    key_data = json.dumps(
+        {
+            "version": CACHE_FORMAT_VERSION,
+            "task": type(task).__name__,
+            "attributes": vars(task),
+            "shard": get_default_shard(),
+            "seed": seed,
+            "html_backend": get_html_backend(),
+            "code": _code_hash(),
+        },
+        sort_keys=True,
+        default=repr,
+    )
+    return hashlib.sha256(key_data.encode("utf-8")).hexdigest()[:16]
+
+
+@functools.cache
+def _code_hash() -> str:
+    package_root = os.path.dirname(HERE)
+    digest = hashlib.sha256()
+    for relative_path in sorted(
+            _python_files_under(package_root, _EPISODE_SOURCES)):
+        digest.update(relative_path.encode("utf-8"))
+        with open(os.path.join(package_root, relative_path), "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def _python_files_under(root: str, sources: list[str]) -> list[str]:
+    paths: list[str] = []
+    for source in sources:
+        source_path = os.path.join(root, source)
+        if os.path.isfile(source_path):
+            paths.append(source)
+            continue
+
+        for dir_path, _, file_names in os.walk(source_path):
+            paths.extend(
+                os.path.relpath(os.path.join(dir_path, name), root)
+                for name in file_names
+                if name.endswith(".py"))
+    return paths
+
+
+def _fingerprint_for_datasets(dataset_names: list[str]) -> str:
+    '''
+    Hashes the path, size and modification time of every file within the given
+    datasets' folders. Hashing their contents would take about as long as
+    just regenerating the episodes.
+    '''
+    digest = hashlib.sha256()
+    for dataset_name in sorted(dataset_names):
+        root_path = get_path_for(dataset_name)
+        for dir_path, dir_names, file_names in os.walk(root_path):
+            dir_names.sort()
+            for name in sorted(file_names):
+                path = os.path.join(dir_path, name)
+                stat = os.stat(path)
+                relative_path = os.path.relpath(path, root_path)
+                digest.update(
+                    f"{dataset_name}/{relative_path}:{stat.st_size}:{stat.st_mtime_ns}\n"
+                    .encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _serialize_episode(episode: Episode) -> dict[str, t.Any]:
+    return {
+        "identifier": episode.identifier,
+        "turns": [{
+            "utterance": turn.utterance,
+            "kind": turn.kind.name,
+            "name": turn.name,
+        } for turn in episode.turns],
+    }
+
+
+def _read_episodes_from(path: str,
+                        start: int = 0) -> t.Generator[Episode, None, None]:
+    with pa.OSFile(path, "rb") as source:
+        for batch in pa.ipc.open_stream(source):
+            if start >= batch.num_rows:
+                start -= batch.num_rows
+                continue
+            if start > 0:
+                batch = batch.slice(start)
+                start = 0
+
+            for row in batch.to_pylist():
+                yield Episode(
+                    turns=[
+                        Turn(utterance=turn["utterance"],
+                             kind=TurnKind[turn["kind"]],
+                             name=turn["name"]) for turn in row["turns"]
+                    ],
+                    identifier=row["identifier"],
+                )
+
+
+def _write_json_atomically(path: str, data: t.Any) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+    os.replace(tmp_path, path)
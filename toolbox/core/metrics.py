@@ -0,0 +1,245 @@
+import collections
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+LOG = logging.getLogger(__name__)
+
+# Prefix for every metric we export.
+METRIC_PREFIX = "toolbox_build"
+
+
+@dataclass
+class TaskMetrics:
+    '''Counters for a single task.'''
+    episodes: int = 0
+    examples_generated: int = 0
+    examples_written: int = 0
+    turn_too_large_skips: int = 0
+    # When the task's first and latest episodes came in.
+    first_episode_time: float | None = None
+    last_episode_time: float | None = None
+    # How many episodes the task is expected to produce in total, if known.
+    expected_episodes: int | None = None
+
+    @property
+    def episodes_per_second(self) -> float:
+        if self.first_episode_time is None or self.last_episode_time is None:
+            return 0.0
+        elapsed = self.last_episode_time - self.first_episode_time
+        return self.episodes / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta_seconds(self) -> float | None:
+        '''Seconds until the task is done, if its total size is known.'''
+        if self.expected_episodes is None or self.episodes_per_second == 0:
+            return None
+        remaining = max(self.expected_episodes - self.episodes, 0)
+        return remaining / self.episodes_per_second
+
+
+class BuildMetrics:
+    '''
+    Keeps track of how a build is progressing, and periodically reports it
+    as a progress line and (optionally) as a Prometheus textfile, which
+    node-exporter's textfile collector can pick up.
+
+    Recording is just a few counter increments, so this is always on. Call
+    `maybe_report` regularly and `report(final=True)` once done.
+    '''
+
+    def __init__(self,
+                 task_names: list[str],
+                 textfile_path: str | None = None,
+                 report_interval: float = 10.0,
+                 show_progress: bool = True,
+                 target_examples: int | None = None) -> None:
+        self.tasks = {name: TaskMetrics() for name in task_names}
+        self.textfile_path = textfile_path
+        self.report_interval = report_interval
+        self.show_progress = show_progress
+        # How many examples the build will stop at, if limited.
+        self.target_examples = target_examples
+
+        self.bytes_written = 0
+        # Examples dropped, by (task, filter name).
+        self.examples_filtered: collections.Counter[tuple[str, str]] = \
+            collections.Counter()
+
+        self.start_time = time.time()
+        self._next_report_time = time.monotonic() + report_interval
+        self._progress_on_tty = sys.stderr.isatty()
+
+    def record_episode(self, task_name: str, examples_generated: int,
+                       turn_too_large: bool) -> None:
+        task = self.tasks[task_name]
+        now = time.monotonic()
+        if task.first_episode_time is None:
+            task.first_episode_time = now
+        task.last_episode_time = now
+
+        task.episodes += 1
+        task.examples_generated += examples_generated
+        task.turn_too_large_skips += turn_too_large
+
+    def record_filtered(self, task_name: str, filter_name: str) -> None:
+        self.examples_filtered[(task_name, filter_name)] += 1
+
+    def record_written(self, task_name: str) -> None:
+        self.tasks[task_name].examples_written += 1
+
+    def maybe_report(self) -> None:
+        '''
+        Reports, if it's been at least `report_interval` seconds since last
+        time. Never does if `report_interval` is zero.
+        '''
+        if self.report_interval > 0 \
+                and time.monotonic() >= self._next_report_time:
+            self.report()
+
+    def report(self, final: bool = False) -> None:
+        self._next_report_time = time.monotonic() + self.report_interval
+
+        if self.show_progress:
+            line = self.progress_line()
+            if self._progress_on_tty:
+                # Overwrite the previous progress line in place.
+                end = "\n" if final else ""
+                sys.stderr.write(f"\r\033[K{line}{end}")
+                sys.stderr.flush()
+            else:
+                LOG.info(line)
+
+        if self.textfile_path is not None:
+            self._write_textfile(done=final)
+
+    def progress_line(self) -> str:
+        elapsed = max(time.time() - self.start_time, 1e-9)
+        episodes = sum(x.episodes for x in self.tasks.values())
+        examples = sum(x.examples_written for x in self.tasks.values())
+        skips = sum(x.turn_too_large_skips for x in self.tasks.values())
+
+        parts = [
+            f"{episodes} episodes ({episodes / elapsed:.1f}/s)",
+            f"{examples} examples ({examples / elapsed:.1f}/s)",
+            f"{self.bytes_written / 1024**2:.1f} MiB written",
+            f"{sum(self.examples_filtered.values())} filtered",
+            f"{skips} skipped",
+        ]
+        if self.target_examples and examples:
+            remaining = max(self.target_examples - examples, 0)
+            parts.append(
+                f"ETA {_format_duration(remaining / (examples / elapsed))}")
+
+        current_task = self._current_task_name()
+        if current_task is not None:
+            eta = self.tasks[current_task].eta_seconds
+            eta_str = f", ETA {_format_duration(eta)}" if eta is not None else ""
+            parts.append(f"{current_task}{eta_str}")
+
+        return " | ".join(parts)
+
+    def _current_task_name(self) -> str | None:
+        '''Returns the task which most recently produced an episode.'''
+        latest: tuple[float, str] | None = None
+        for name, task in self.tasks.items():
+            if task.last_episode_time is not None and (
+                    latest is None or task.last_episode_time >= latest[0]):
+                latest = (task.last_episode_time, name)
+        return latest[1] if latest is not None else None
+
+    def _write_textfile(self, done: bool) -> None:
+        assert self.textfile_path is not None
+
+        lines: list[str] = []
+
+        def add_metric(name: str, kind: str, description: str,
+                       samples: list[tuple[dict[str, str], float]]) -> None:
+            full_name = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {description}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for labels, value in samples:
+                label_str = ",".join(
+                    f'{k}="{_escape_label_value(v)}"' for k, v in labels.items())
+                label_str = f"{{{label_str}}}" if label_str else ""
+                lines.append(
+                    f"{full_name}{label_str} {_format_value(value)}")
+
+        def per_task(attribute: str) -> list[tuple[dict[str, str], float]]:
+            return [({
+                "task": name
+            }, getattr(task, attribute)) for name, task in self.tasks.items()]
+
+        add_metric("episodes_total", "counter", "Episodes produced by tasks.",
+                   per_task("episodes"))
+        add_metric("examples_generated_total", "counter",
+                   "Training examples generated, before filtering.",
+                   per_task("examples_generated"))
+        add_metric("examples_written_total", "counter",
+                   "Training examples which made it into the output.",
+                   per_task("examples_written"))
+        add_metric("examples_filtered_total", "counter",
+                   "Training examples dropped, by the filter which dropped them.",
+                   [({
+                       "task": task,
+                       "filter": filter_name
+                   }, count) for (task, filter_name), count in
+                    self.examples_filtered.items()])
+        add_metric("turn_too_large_skips_total", "counter",
+                   "Episodes cut short because of a turn too large to fit.",
+                   per_task("turn_too_large_skips"))
+        add_metric("bytes_written_total", "counter",
+                   "Uncompressed bytes of training examples written.",
+                   [({}, self.bytes_written)])
+        add_metric("episodes_per_second", "gauge",
+                   "Episodes per second since the task started.",
+                   per_task("episodes_per_second"))
+        add_metric("eta_seconds", "gauge",
+                   "Estimated seconds until the task is done, if known.",
+                   [({
+                       "task": name
+                   }, task.eta_seconds)
+                    for name, task in self.tasks.items()
+                    if task.eta_seconds is not None])
+        add_metric("start_time_seconds", "gauge",
+                   "Unix time the build started at.", [({}, self.start_time)])
+        add_metric("last_update_time_seconds", "gauge",
+                   "Unix time these metrics were written at.",
+                   [({}, time.time())])
+        add_metric("done", "gauge", "Whether the build has finished.",
+                   [({}, float(done))])
+
+        # Written atomically, so the collector never reads a partial file.
+        tmp_path = f"{self.textfile_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.textfile_path)
+
+
+#
+# Private helpers.
+#
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    # `repr` so we don't lose precision on timestamps and byte counts.
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m"
+    if minutes:
+        return f"{minutes}m{seconds:02d}s"
+    return f"{seconds}s"
@@ -0,0 +1,147 @@
+import logging
+import random
+import typing as t
+
+from toolbox.core.models import Episode
+from toolbox.core.profiling import TASK_TRANSFORM, Profiler
+from toolbox.core.task import BaseTask
+
+LOG = logging.getLogger(__name__)
+
+
+class TaskMixer:
+    '''
+    Interleaves the episodes of several tasks according to their `weights`,
+    and stops pulling from a task once it's filled its quota (in whatever
+    unit `record_written` gets called with, e.g. examples or tokens).
+
+    Weights are in episodes, and the schedule is a seeded stride scheduler:
+    task `i` gets picked whenever its `offset + pulled * (1 / weight)` is the
+    lowest, with each offset drawn from `seed`. Without weights, tasks are
+    drained one after another instead.
+
+    Quotas get filled as examples come back from generation, by which point
+    more episodes might've been pulled from the task already (up to however
+    many are queued up for workers). For the
+    output to not depend on how many, each task gets its own copy of the global
+    RNG (which tasks pick prompts with) seeded from `seed` and its name, same
+    as with `CachedTask`, and episodes get seeded by their task's name and
+    their position within that task (see `generate_examples_for_seeded`).
+    Dropping a task's extra episodes then doesn't affect any other task's
+    episodes, and the order the remaining tasks get picked in doesn't change
+    once a task is done either.
+    '''
+
+    def __init__(self,
+                 tasks: list[BaseTask],
+                 task_names: list[str],
+                 seed: int,
+                 weights: list[float] | None = None,
+                 quotas: list[int | None] | None = None,
+                 profiler: Profiler | None = None,
+                 resume_from: dict[str, t.Any] | None = None) -> None:
+        self.tasks = tasks
+        self.task_names = task_names
+        self.quotas = quotas or [None] * len(tasks)
+        self.profiler = profiler
+
+        if weights is not None and any(weight <= 0 for weight in weights):
+            raise ValueError("Task weights must be positive")
+        self.strides = [1 / weight for weight in weights] if weights else None
+        scheduler_rng = random.Random(f"{seed}-mixer")
+        self.offsets = [
+            scheduler_rng.random() * stride for stride in self.strides
+        ] if self.strides else None
+
+        self._rng_states: list[t.Any] = []
+        for task_name in task_names:
+            random.seed(f"{seed}-{task_name}")
+            self._rng_states.append(random.getstate())
+
+        # Per task: episodes pulled so far, and how many it had once it ran
+        # out, if it has.
+        self.episodes_pulled = [0] * len(tasks)
+        self.episode_counts: list[int | None] = [None] * len(tasks)
+        self.quota_used = [0] * len(tasks)
+
+        if resume_from is not None:
+            self.episodes_pulled = list(resume_from["task_episodes_done"])
+            self.episode_counts = list(resume_from["episode_counts"])
+            self.quota_used = list(resume_from["quota_used"])
+
+    def __iter__(
+            self) -> t.Generator[tuple[tuple[int, int], Episode], None, None]:
+        '''
+        Yields each episode along with the index of the task it came from and
+        its position within that task.
+        '''
+        iterators: list[t.Iterator[Episode] | None] = [None] * len(self.tasks)
+
+        while (task_idx := self._next_task_idx()) is not None:
+            task_name = self.task_names[task_idx]
+
+            random.setstate(self._rng_states[task_idx])
+            iterator = iterators[task_idx]
+            if iterator is None:
+                iterator = iterators[task_idx] = self._iterator_for(task_idx)
+            episode = next(iterator, None)
+            self._rng_states[task_idx] = random.getstate()
+
+            if episode is None:
+                LOG.info("%s ran out of episodes after %s", task_name,
+                         self.episodes_pulled[task_idx])
+                self.episode_counts[task_idx] = self.episodes_pulled[task_idx]
+                iterators[task_idx] = None
+                continue
+
+            task_episode_idx = self.episodes_pulled[task_idx]
+            self.episodes_pulled[task_idx] += 1
+            yield (task_idx, task_episode_idx), episode
+
+    def is_full(self, task_idx: int) -> bool:
+        quota = self.quotas[task_idx]
+        return quota is not None and self.quota_used[task_idx] >= quota
+
+    def record_written(self, task_idx: int, amount: int) -> None:
+        '''Counts `amount` towards the task's quota.'''
+        was_full = self.is_full(task_idx)
+        self.quota_used[task_idx] += amount
+        if not was_full and self.is_full(task_idx):
+            LOG.info("%s filled its quota of %s", self.task_names[task_idx],
+                     self.quotas[task_idx])
+
+    def state_for(self, task_episodes_done: list[int]) -> dict[str, t.Any]:
+        '''
+        Returns what a new mixer needs (as `resume_from`) to pick back up right
+        after the given number of episodes from each task were handled.
+        '''
+        return {
+            "task_episodes_done": task_episodes_done,
+            # Only tasks which ran out before that point count as done.
+            "episode_counts": [
+                count if count == done else None for count, done in zip(
+                    self.episode_counts, task_episodes_done)
+            ],
+            "quota_used": list(self.quota_used),
+        }
+
+    def _next_task_idx(self) -> int | None:
+        active = [
+            idx for idx in range(len(self.tasks))
+            if self.episode_counts[idx] is None and not self.is_full(idx)
+        ]
+        if not active:
+            return None
+        if self.strides is None or self.offsets is None:
+            return active[0]
+        return min(active,
+                   key=lambda idx: (self.offsets[idx] + self.episodes_pulled[
+                       idx] * self.strides[idx], idx))
+
+    def _iterator_for(self, task_idx: int) -> t.Iterator[Episode]:
+        episodes: t.Iterator[Episode] = self.tasks[task_idx].episodes_from(
+            self.episodes_pulled[task_idx])
+        if self.profiler is not None:
+            episodes = self.profiler.profile_iterable(
+                episodes, TASK_TRANSFORM, self.task_names[task_idx])
+        return episodes
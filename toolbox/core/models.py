@@ -26,3 +26,47 @@ class TrainingExample:
     prompt: str
     generation: str
     identifier: str
+
+@dataclass(frozen=True)
+class EpisodeRecord:
+    '''
+    A whole context window's worth of an episode, rendered once, with every
+    model generation in it that should be trained on marked by its span.
+    '''
+    text: str
+    # Character offsets (start, end) of each generation within `text`.
+    spans: list[tuple[int, int]]
+    identifier: str
+
+    def training_examples(self) -> list[TrainingExample]:
+        '''
+        What filters get to see: one training example per span, with the span
+        as the generation and everything before it as the prompt. Identifiers
+        are the record's, plus the span's position after a dot.
+        '''
+        return [
+            TrainingExample(prompt=self.text[:start],
+                            generation=self.text[start:end],
+                            identifier=f"{self.identifier}.{idx}")
+            for idx, (start, end) in enumerate(self.spans)
+        ]
+
+    def as_training_example(self) -> TrainingExample:
+        '''
+        The whole record as a single training example, which is what token
+        quotas get counted over: everything that isn't trained on as the
+        prompt, and the generations (separated by blank lines) as the generation.
+        '''
+        context: list[str] = []
+        offset = 0
+        for start, end in self.spans:
+            context.append(self.text[offset:start])
+            offset = end
+        context.append(self.text[offset:])
+
+        return TrainingExample(
+            prompt="".join(context),
+            generation="\n\n".join(
+                self.text[start:end] for start, end in self.spans),
+            identifier=self.identifier,
+        )
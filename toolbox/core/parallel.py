@@ -0,0 +1,189 @@
+import collections
+import functools
+import itertools
+import logging
+import multiprocessing
+import random
+import time
+import typing as t
+from dataclasses import dataclass, replace
+from multiprocessing.pool import AsyncResult
+
+from toolbox.core.models import Episode, EpisodeRecord, TrainingExample
+from toolbox.core.token_counter import TokenCounter, build_token_counter
+from toolbox.core.training_example import (
+    TrainingExampleGenerator,
+    TurnTooLargeError
+)
+
+LOG = logging.getLogger(__name__)
+
+# How many chunks of episodes we allow to be queued up per worker before we
+# stop pulling from the task. Keeps memory bounded when the task produces
+# episodes faster than the workers can consume them.
+MAX_CHUNKS_IN_FLIGHT_PER_WORKER = 4
+
+
+@dataclass(frozen=True)
+class GenerationSettings:
+    '''Everything a worker needs to turn an `Episode` into examples.'''
+    target_token_count: int
+    format: str
+    seed: int
+    # See `build_token_counter` for accepted values.
+    tokenizer: str = "estimate"
+    # Whether to measure how long generating each episode's examples takes.
+    profile: bool = False
+    # Whether to generate an `EpisodeRecord` per context window instead of a
+    # `TrainingExample` per model turn. See `TrainingExampleGenerator.records`.
+    episode_records: bool = False
+
+
+@dataclass(frozen=True)
+class GenerationResult:
+    '''The training examples generated from a single episode.'''
+    episode_identifier: str
+    examples: list[TrainingExample | EpisodeRecord]
+    # Whether the episode got cut short by a `TurnTooLargeError`. Any examples
+    # generated before that point are kept, same as they would've been when
+    # iterating over the generator directly.
+    turn_too_large: bool = False
+    # Wall and CPU seconds spent generating the examples, if
+    # `settings.profile` was set. Measured within whichever process did it.
+    generation_time: tuple[float, float] | None = None
+
+
+def generate_examples_for(
+    episodes: t.Iterable[Episode],
+    settings: GenerationSettings,
+    workers: int = 1,
+    chunk_size: int = 32,
+    start: int = 0,
+) -> t.Generator[GenerationResult, None, None]:
+    '''
+    Runs `TrainingExampleGenerator` over the given episodes, yielding one
+    result per episode in the exact same order as the episodes came in.
+
+    With `workers > 1`, episodes are batched up into chunks and spread across a
+    process pool. Every episode gets its own RNG seeded from `settings.seed`
+    and its position in the stream, so the output is byte-for-byte identical
+    no matter how many workers are used.
+
+    When resuming a build, `start` is the position in the stream of the first
+    of the given episodes, so they still get the same seeds.
+    '''
+    yield from generate_examples_for_seeded(enumerate(episodes, start=start),
+                                            settings=settings,
+                                            workers=workers,
+                                            chunk_size=chunk_size)
+
+
+def generate_examples_for_seeded(
+    seeded_episodes: t.Iterable[tuple[int | str, Episode]],
+    settings: GenerationSettings,
+    workers: int = 1,
+    chunk_size: int = 32,
+) -> t.Generator[GenerationResult, None, None]:
+    '''
+    Same as `generate_examples_for`, but each episode comes with the key its
+    RNG gets seeded from (along with `settings.seed`) instead of using its
+    position in the stream.
+    '''
+    seeded_episodes = iter(seeded_episodes)
+
+    if workers <= 1:
+        for seed_key, episode in seeded_episodes:
+            yield _generate_for(seed_key, episode, settings)
+        return
+
+    max_chunks_in_flight = workers * MAX_CHUNKS_IN_FLIGHT_PER_WORKER
+    with multiprocessing.Pool(processes=workers) as pool:
+        # NOTE: `Pool.imap` would be the obvious choice here, but it
+        # eagerly drains the input iterable in a background thread, which for
+        # our bigger tasks means loading the entire dataset into memory. So we
+        # submit chunks ourselves and only pull more episodes once the oldest
+        # chunk is done, popping results in submission order.
+        in_flight: collections.deque[AsyncResult[list[GenerationResult]]] = \
+            collections.deque()
+
+        while chunk := list(itertools.islice(seeded_episodes, chunk_size)):
+            in_flight.append(
+                pool.apply_async(_generate_for_chunk, (chunk, settings)))
+
+            if len(in_flight) >= max_chunks_in_flight:
+                yield from in_flight.popleft().get()
+
+        while in_flight:
+            yield from in_flight.popleft().get()
+
+
+#
+# Private helpers.
+#
+
+
+def _generate_for_chunk(
+    chunk: list[tuple[int | str, Episode]],
+    settings: GenerationSettings,
+) -> list[GenerationResult]:
+    '''Worker entrypoint.'''
+    return [
+        _generate_for(seed_key, episode, settings)
+        for seed_key, episode in chunk
+    ]
+
+
+@functools.cache
+def _token_counter_for(tokenizer: str) -> TokenCounter:
+    '''
+    Loads the token counter once per process, so its cache is shared across
+    all of the episodes the process handles.
+    '''
+    return build_token_counter(tokenizer)
+
+
+def _generate_for(
+    seed_key: int | str,
+    episode: Episode,
+    settings: GenerationSettings,
+) -> GenerationResult:
+    if not settings.profile:
+        return _generate_unprofiled_for(seed_key, episode, settings)
+
+    wall_start, cpu_start = time.perf_counter(), time.thread_time()
+    result = _generate_unprofiled_for(seed_key, episode, settings)
+    return replace(
+        result,
+        generation_time=(time.perf_counter() - wall_start,
+                         time.thread_time() - cpu_start),
+    )
+
+
+def _generate_unprofiled_for(
+    seed_key: int | str,
+    episode: Episode,
+    settings: GenerationSettings,
+) -> GenerationResult:
+    # String seeds get hashed with SHA-512 by `random`, so this is stable across
+    # processes regardless of `PYTHONHASHSEED`.
+    rng = random.Random(f"{settings.seed}-{seed_key}")
+    generator = TrainingExampleGenerator(
+        episode,
+        target_token_count=settings.target_token_count,
+        format=settings.format,
+        rng=rng,
+        token_counter=_token_counter_for(settings.tokenizer),
+    )
+
+    examples: list[TrainingExample | EpisodeRecord] = []
+    try:
+        for example in (generator.records()
+                        if settings.episode_records else generator):
+            examples.append(example)
+    except TurnTooLargeError:
+        return GenerationResult(episode_identifier=episode.identifier,
+                                examples=examples,
+                                turn_too_large=True)
+
+    return GenerationResult(episode_identifier=episode.identifier,
+                            examples=examples)
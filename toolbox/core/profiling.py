@@ -0,0 +1,162 @@
+import json
+import time
+import typing as t
+from dataclasses import asdict, dataclass
+
+T = t.TypeVar("T")
+
+# Names for the stages of a build, in the order they happen in.
+DATASET_READ = "dataset read"
+TASK_TRANSFORM = "task transform"
+EXAMPLE_GENERATION = "training example generation"
+FILTER_PREFIX = "filter: "
+WRITE = "serialization and write"
+
+# Used for time spent outside of any task.
+NO_TASK = "(none)"
+
+# The profiler stages get reported to, if profiling is enabled.
+_active_profiler: "Profiler | None" = None
+
+
+@dataclass
+class StageStats:
+    '''How much time a build spent on one stage for one task.'''
+    task: str
+    stage: str
+    # Both of these exclude time spent on any stages nested within this one
+    # (e.g. a task's time doesn't include reading from its datasets).
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    # Items produced (or handled, for filters and writing) by the stage.
+    items: int = 0
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.wall_time if self.wall_time > 0 else 0.0
+
+
+class Profiler:
+    '''
+    Keeps track of the wall and CPU time spent on each stage of a build, per
+    task. Nested stages are accounted for separately: their time is subtracted
+    from whichever stage they happened within.
+
+    CPU time is measured for the current thread only, so time the main
+    process spends waiting on workers doesn't count.
+    '''
+
+    def __init__(self) -> None:
+        self.stats: dict[tuple[str, str], StageStats] = {}
+        self._start_time = time.perf_counter()
+
+        # One entry per stage currently being measured: its task, when it
+        # started (wall, CPU) and how much time went into nested stages.
+        self._stack: list[list[t.Any]] = []
+
+    def start(self, stage: str, task: str | None = None) -> None:
+        '''
+        Starts measuring a stage. If `task` is not given, the time is counted
+        towards whichever task the enclosing stage is for.
+        '''
+        if task is None:
+            task = self._stack[-1][0] if self._stack else NO_TASK
+        self._stack.append(
+            [task, stage, time.perf_counter(), time.thread_time(), 0.0, 0.0])
+
+    def stop(self, items: int = 0) -> None:
+        '''Stops measuring the last stage started.'''
+        wall_end, cpu_end = time.perf_counter(), time.thread_time()
+        task, stage, wall_start, cpu_start, child_wall, child_cpu = \
+            self._stack.pop()
+
+        wall_time = wall_end - wall_start
+        cpu_time = cpu_end - cpu_start
+        self.add(task,
+                 stage,
+                 wall_time=wall_time - child_wall,
+                 cpu_time=cpu_time - child_cpu,
+                 items=items)
+
+        if self._stack:
+            self._stack[-1][4] += wall_time
+            self._stack[-1][5] += cpu_time
+
+    def add(self,
+            task: str,
+            stage: str,
+            wall_time: float,
+            cpu_time: float,
+            items: int = 0) -> None:
+        '''Adds time measured elsewhere (e.g. within a worker process).'''
+        stats = self.stats.get((task, stage))
+        if stats is None:
+            stats = self.stats[(task, stage)] = StageStats(task=task,
+                                                           stage=stage)
+        stats.wall_time += wall_time
+        stats.cpu_time += cpu_time
+        stats.items += items
+
+    def profile_iterable(self,
+                         iterable: t.Iterable[T],
+                         stage: str,
+                         task: str | None = None) -> t.Generator[T, None, None]:
+        '''Yields from `iterable`, measuring the time spent on each item.'''
+        iterator = iter(iterable)
+        while True:
+            self.start(stage, task)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.stop()
+                return
+            except BaseException:
+                self.stop()
+                raise
+            self.stop(items=1)
+            yield item
+
+    def to_dict(self) -> dict[str, t.Any]:
+        return {
+            "wall_time": time.perf_counter() - self._start_time,
+            "stages": [{
+                **asdict(stats),
+                "items_per_second": stats.items_per_second,
+            } for stats in self.stats.values()],
+        }
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    def report_lines(self) -> list[str]:
+        '''Returns a human-readable table of every stage, grouped by task.'''
+        header = f"{'task':<32} {'stage':<32} {'wall (s)':>9} {'CPU (s)':>9} {'items':>9} {'items/s':>10}"
+        lines = [header, "-" * len(header)]
+        # Tasks in the order they ran in, with time spent outside of any of
+        # them at the end.
+        task_order = {
+            task: idx for idx, task in enumerate(
+                dict.fromkeys(x.task for x in self.stats.values()))
+        }
+        task_order[NO_TASK] = len(task_order)
+        for stats in sorted(self.stats.values(),
+                            key=lambda x: task_order[x.task]):
+            lines.append(
+                f"{stats.task:<32} {stats.stage:<32} {stats.wall_time:>9.3f} "
+                f"{stats.cpu_time:>9.3f} {stats.items:>9} {stats.items_per_second:>10.1f}"
+            )
+        lines.append(
+            f"total wall time: {time.perf_counter() - self._start_time:.2f}s")
+        return lines
+
+
+def get_profiler() -> Profiler | None:
+    '''Returns the profiler set with `set_profiler`, if any.'''
+    return _active_profiler
+
+
+def set_profiler(profiler: Profiler | None) -> None:
+    '''Makes all instrumented stages report to the given profiler.'''
+    global _active_profiler
+    _active_profiler = profiler
@@ -1,3 +1,4 @@
+import itertools
 import typing as t
 
 from toolbox.core.models import Episode
@@ -9,3 +10,11 @@ class BaseTask:
     def __iter__(self) -> t.Generator[Episode, None, None]:
         '''This method must be overidden when inheriting.'''
         raise NotImplementedError
+
+    def episodes_from(self, start: int) -> t.Iterator[Episode]:
+        '''
+        Yields episodes starting from the `start`-th one, e.g. when resuming a
+        build. Tasks can't generally seek within their datasets, so the default
+        still goes through (and throws away) every episode before it.
+        '''
+        return itertools.islice(self, start, None)
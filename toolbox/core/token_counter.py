@@ -0,0 +1,137 @@
+import collections
+import math
+import re
+import typing as t
+from abc import ABC, abstractmethod
+
+# NOTE: When processing episodes down into training examples, tokenizing text to
+# get an accurate token count used to be a massive bottleneck (~49.5% of CPU
+# time), since every turn got tokenized several times over. `WordEstimateCounter`
+# keeps the old estimation around as the default, while real tokenizers go
+# through `CachedTokenCounter` so each distinct turn only gets tokenized once,
+# and an episode's turns get tokenized in a single batched call.
+AVG_WORD_TO_TOKEN_RATIO = 1.7
+
+DEFAULT_CACHE_SIZE = 65536
+
+
+class TokenCounter(ABC):
+    '''Counts how many tokens a piece of text will take up.'''
+
+    @abstractmethod
+    def count_batch(self, texts: t.Sequence[str]) -> list[int]:
+        '''Returns the token count for each of the given `texts`.'''
+        raise NotImplementedError
+
+    def count(self, text: str) -> int:
+        '''Returns the token count for a single piece of text.'''
+        return self.count_batch([text])[0]
+
+
+class WordEstimateCounter(TokenCounter):
+    '''Estimates token counts from word counts. Fast, but inexact.'''
+
+    def count_batch(self, texts: t.Sequence[str]) -> list[int]:
+        return [
+            math.ceil(len(text.split()) * AVG_WORD_TO_TOKEN_RATIO)
+            for text in texts
+        ]
+
+
+class RegexTokenCounter(TokenCounter):
+    '''
+    Stand-in tokenizer which treats every run of word characters and every
+    other non-whitespace character as a single token. Exact and deterministic,
+    with no downloads or extra dependencies, so it's handy for tests and
+    benchmarks.
+    '''
+
+    TOKEN_REGEX = re.compile(r"\w+|[^\w\s]")
+
+    def count_batch(self, texts: t.Sequence[str]) -> list[int]:
+        return [
+            sum(1 for _ in self.TOKEN_REGEX.finditer(text)) for text in texts
+        ]
+
+
+class HuggingFaceTokenCounter(TokenCounter):
+    '''Exact token counts from a (fast) HuggingFace tokenizer.'''
+
+    def __init__(self, name_or_path: str) -> None:
+        try:
+            from transformers import AutoTokenizer
+        except ImportError as ex:
+            raise ImportError(
+                "Counting tokens with a real tokenizer requires the `transformers` package"
+            ) from ex
+
+        self.tokenizer = AutoTokenizer.from_pretrained(name_or_path,
+                                                       use_fast=True)
+
+    def count_batch(self, texts: t.Sequence[str]) -> list[int]:
+        if len(texts) == 0:
+            return []
+
+        encoded = self.tokenizer(list(texts),
+                                 add_special_tokens=False,
+                                 return_attention_mask=False)
+        return [len(input_ids) for input_ids in encoded["input_ids"]]
+
+
+class CachedTokenCounter(TokenCounter):
+    '''
+    Wraps another `TokenCounter` with an LRU cache keyed on the exact string,
+    only sending cache misses to the underlying counter (in a single batch).
+    '''
+
+    def __init__(self,
+                 counter: TokenCounter,
+                 max_size: int = DEFAULT_CACHE_SIZE) -> None:
+        self.counter = counter
+        self.max_size = max_size
+        self.cache: collections.OrderedDict[str, int] = collections.OrderedDict()
+
+    def count_batch(self, texts: t.Sequence[str]) -> list[int]:
+        counts: list[int | None] = []
+        misses: dict[str, list[int]] = {}
+
+        for idx, text in enumerate(texts):
+            if (count := self.cache.get(text)) is not None:
+                self.cache.move_to_end(text)
+                counts.append(count)
+            else:
+                counts.append(None)
+                misses.setdefault(text, []).append(idx)
+
+        if misses:
+            missed_texts = list(misses.keys())
+            for text, count in zip(missed_texts,
+                                   self.counter.count_batch(missed_texts)):
+                for idx in misses[text]:
+                    counts[idx] = count
+
+                self.cache[text] = count
+                if len(self.cache) > self.max_size:
+                    self.cache.popitem(last=False)
+
+        return t.cast(list[int], counts)
+
+
+def build_token_counter(name: str,
+                        cache_size: int = DEFAULT_CACHE_SIZE) -> TokenCounter:
+    '''
+    Builds a token counter from its name: `estimate` for the word-based
+    estimation, `regex` for the stand-in tokenizer, and anything else is
+    treated as a HuggingFace tokenizer name or path.
+    '''
+    if name == "estimate":
+        # Cheap enough that caching would only cost us memory.
+        return WordEstimateCounter()
+
+    counter: TokenCounter
+    if name == "regex":
+        counter = RegexTokenCounter()
+    else:
+        counter = HuggingFaceTokenCounter(name)
+
+    return CachedTokenCounter(counter, max_size=cache_size)
@@ -1,24 +1,20 @@
 import logging
-import math
 import random
 import re
 import typing as t
+from dataclasses import replace
 
 from toolbox.core.models import (
     Episode,
+    EpisodeRecord,
     TrainingExample,
     TurnKind
 )
-from toolbox.core.wrapper import VALID_FORMATS, WRAPPER_MAP
+from toolbox.core.token_counter import TokenCounter, WordEstimateCounter
+from toolbox.core.wrapper import VALID_FORMATS, WRAPPER_MAP, TurnWrapper
 
 LOG = logging.getLogger(__name__)
 
-# NOTE: When processing episodes down into training examples, tokenizing text to
-# get an accurate token count is a massive bottleneck (~49.5% of CPU time). We
-# can instead use an estimation instead if we're OK with dropping some examples
-# at training time.
-AVG_WORD_TO_TOKEN_RATIO = 1.7
-
 class TurnTooLargeError(RuntimeError):
     pass
 
@@ -29,7 +25,9 @@ class TrainingExampleGenerator:
         self,
         episode: Episode,
         target_token_count: int = 2048,
-        format: str = "metharme"
+        format: str = "metharme",
+        rng: random.Random | None = None,
+        token_counter: TokenCounter | None = None,
     ) -> None:
         self.episode = episode
         self.format = format.lower()
@@ -43,55 +41,37 @@ class TrainingExampleGenerator:
         # input prompt, which will likely cause the prompt to expand.
         self.target_token_count = target_token_count - 32
 
+        # Defaults to estimating token counts. Pass in a tokenizer-backed
+        # counter to have the context window respect the exact token budget.
+        self.token_counter = token_counter if token_counter is not None \
+            else WordEstimateCounter()
+
+        # Randomness used for the synthetic response style/length instructions.
+        # Passing in a dedicated RNG makes the generated examples independent of
+        # whatever else touched the global RNG in between (e.g.: when episodes
+        # are spread across worker processes). If none is given, we derive one
+        # from the global RNG so seeded serial runs stay reproducible.
+        self.rng = rng if rng is not None else random.Random(
+            random.getrandbits(64))
+
         super().__init__()
 
     def __iter__(self) -> t.Generator[TrainingExample, None, None]:
         examples_yielded = 0
+        wrapped_turns, turn_strs = self._wrap_turns()
+        system_str = turn_strs[0]
 
-        # Always start off with the system turn.
-        system_turn = self.episode.turns[0]
-        system_turn = self.wrapper(system_turn)
-        assert system_turn.kind == TurnKind.SYSTEM
-        base_turns = [system_turn]
-
-        cur_turns = base_turns.copy()
-        cur_len = _token_count_for(system_turn.as_str())
-
-        for turn in self.episode.turns[1:]:
-            # Wrap the turn inside a turn wrapper
-            turn = self.wrapper(turn)
-            turn_len = _token_count_for(turn.as_str())
-
-            if cur_len + turn_len > self.target_token_count:
-                # Can't add this turn into the context window. Start dropping
-                # older turns into we can fit it in here.
-                len_over_target = math.inf
-
-                while len_over_target > 0:
-                    try:
-                        removed_turn = cur_turns.pop(1)
-                        cur_len -= _token_count_for(removed_turn.as_str())
-
-                        len_over_target = self.target_token_count - (cur_len +
-                                                                     turn_len)
-                    except IndexError as ex:
-                        raise TurnTooLargeError from ex
-
-            # We have space for the next turn, so add it to the context window.
-            cur_turns.append(turn)
-            cur_len += _token_count_for(turn.as_str())
-
-            # Yield training example if this is a model turn.
-            if turn.kind != TurnKind.MODEL:
-                continue
+        for window_start, idx in self._context_windows_for(
+                wrapped_turns, turn_strs):
+            turn = wrapped_turns[idx]
 
             # The prompt is comprised of every single turn converted into its
             # string representation, _except_ for the last model turn. For the
             # last model turn, we append the TurnKind.MODEL token to the end of
             # the prompt, and then use the model's utterance as the response.
-            prompt = "".join([t.as_str() for t in cur_turns[:-1]])
+            prompt = system_str + "".join(turn_strs[window_start:idx])
             prompt += turn.get_model_turn()
-            
+
             generation = turn.utterance.strip()
             # ChatML format prefers to end with its own end token rather than the model's.
             if "chatml" in self.format:
@@ -116,9 +96,9 @@ class TrainingExampleGenerator:
             # would require a decent amount of rework to put at the task level
             # depending on the task so let's roll with this for now.
             prompt = prompt.replace("{{response_style_str}}",
-                                    _response_style_str_for(generation))
+                                    _response_style_str_for(generation, self.rng))
             prompt = prompt.replace("{{response_length_str}}",
-                                    _response_length_str_for(generation))
+                                    _response_length_str_for(generation, self.rng))
 
             yield TrainingExample(
                 prompt=prompt,
@@ -127,6 +107,192 @@ class TrainingExampleGenerator:
             )
             examples_yielded += 1
 
+    def records(self) -> t.Generator[EpisodeRecord, None, None]:
+        '''
+        Same as iterating over the generator, except that rather than one
+        example per model turn (each with its own copy of everything before
+        it), this yields one `EpisodeRecord` per context window: the window
+        rendered once, with spans marking every model turn within it which
+        gets trained on. Turns only leave the context window to make room for
+        newer ones, so each of those still gets trained on with the same turns
+        before it as its example would've had.
+
+        If the context has response style/length instructions in it, a new
+        record is also started whenever a generation calls for different
+        instructions than the record's first one, so every generation gets
+        trained on with instructions which actually describe it.
+        '''
+        records_yielded = 0
+        wrapped_turns, turn_strs = self._wrap_turns()
+
+        # How many turns up to (and not including) each index have any
+        # response instructions in them, to tell whether a window does.
+        instruction_counts = [0]
+        for turn_str in turn_strs:
+            instruction_counts.append(instruction_counts[-1] + int(
+                "{{response_style_str}}" in turn_str
+                or "{{response_length_str}}" in turn_str))
+
+        window_start: int | None = None
+        model_turn_idxs: list[int] = []
+        record_traits: tuple[bool, bool, int, int] | None = None
+        try:
+            for turn_window_start, idx in self._context_windows_for(
+                    wrapped_turns, turn_strs):
+                has_instructions = instruction_counts[1] > 0 \
+                    or instruction_counts[idx] > \
+                    instruction_counts[turn_window_start]
+                traits = _response_traits_for(
+                    wrapped_turns[idx].utterance.strip()) \
+                    if has_instructions else None
+
+                if model_turn_idxs and (turn_window_start != window_start
+                                        or traits != record_traits):
+                    assert window_start is not None
+                    yield self._record_for(wrapped_turns, turn_strs,
+                                           window_start, model_turn_idxs,
+                                           records_yielded)
+                    records_yielded += 1
+                    model_turn_idxs = []
+                if not model_turn_idxs:
+                    record_traits = traits
+                window_start = turn_window_start
+                model_turn_idxs.append(idx)
+        except TurnTooLargeError:
+            # Whatever fit before the oversized turn is still good to train
+            # on, same as the examples yielded before it when iterating.
+            if model_turn_idxs:
+                assert window_start is not None
+                yield self._record_for(wrapped_turns, turn_strs, window_start,
+                                       model_turn_idxs, records_yielded)
+            raise
+
+        if model_turn_idxs:
+            assert window_start is not None
+            yield self._record_for(wrapped_turns, turn_strs, window_start,
+                                   model_turn_idxs, records_yielded)
+
+    def _wrap_turns(self) -> tuple[list[TurnWrapper], list[str]]:
+        '''
+        Wraps and stringifies every turn exactly once. Everything else only
+        ever works with these cached pieces.
+        '''
+        wrapped_turns = [self.wrapper(turn) for turn in self.episode.turns]
+        turn_strs = [turn.as_str() for turn in wrapped_turns]
+
+        # Always start off with the system turn.
+        assert wrapped_turns[0].kind == TurnKind.SYSTEM
+        return wrapped_turns, turn_strs
+
+    def _context_windows_for(
+        self,
+        wrapped_turns: list[TurnWrapper],
+        turn_strs: list[str],
+    ) -> t.Generator[tuple[int, int], None, None]:
+        '''
+        Yields the index of every model turn, along with where the context
+        window it should be trained with starts. Raises a `TurnTooLargeError`
+        once it gets to a turn which doesn't fit into any context window.
+        '''
+        # Counting all of the turns' tokens in a single batch is a lot cheaper
+        # than tokenizing them one at a time.
+        turn_lens = self.token_counter.count_batch(turn_strs)
+
+        # The context window is always the system turn, plus every turn from
+        # `window_start` up to and including the current one. Sliding it
+        # forwards is O(1) amortized, so the whole episode is processed in
+        # linear time no matter how long it is.
+        window_start = 1
+        window_len = turn_lens[0]
+
+        for idx in range(1, len(wrapped_turns)):
+            turn_len = turn_lens[idx]
+
+            # Can't add this turn into the context window if it's too big, so
+            # start dropping older turns until we can fit it in here.
+            while window_len + turn_len > self.target_token_count:
+                if window_start == idx:
+                    raise TurnTooLargeError
+                window_len -= turn_lens[window_start]
+                window_start += 1
+
+            # We have space for the next turn, so add it to the context window.
+            window_len += turn_len
+
+            if wrapped_turns[idx].kind == TurnKind.MODEL:
+                yield window_start, idx
+
+    def _record_for(
+        self,
+        wrapped_turns: list[TurnWrapper],
+        turn_strs: list[str],
+        window_start: int,
+        model_turn_idxs: list[int],
+        record_idx: int,
+    ) -> EpisodeRecord:
+        '''
+        Renders the system turn plus every turn from `window_start` up to the
+        last of `model_turn_idxs`, marking the generations of those.
+        '''
+        # Each piece of the record, along with whether it gets trained on.
+        pieces: list[tuple[str, bool]] = [(turn_strs[0], False)]
+        trained_idxs = set(model_turn_idxs)
+        for idx in range(window_start, model_turn_idxs[-1] + 1):
+            if idx not in trained_idxs:
+                pieces.append((turn_strs[idx], False))
+                continue
+
+            turn_str = turn_strs[idx]
+            utterance = wrapped_turns[idx].utterance
+            utterance_start = self._utterance_offset_for(wrapped_turns[idx])
+            start = utterance_start + len(utterance) - len(utterance.lstrip())
+            end = utterance_start + len(utterance.rstrip())
+            # ChatML format prefers to end with its own end token rather than
+            # the model's, so that gets trained on too.
+            if "chatml" in self.format:
+                end = utterance_start + len(utterance) + len("<|im_end|>")
+                assert turn_str[:end].endswith("<|im_end|>")
+
+            pieces.extend([(turn_str[:start], False),
+                           (turn_str[start:end], True),
+                           (turn_str[end:], False)])
+
+        # Same as with examples, except the instructions are only picked once
+        # per record, going off of its first generation. `records` makes sure
+        # they fit the rest of its generations too.
+        first_generation = next(piece for piece, trained in pieces if trained)
+        response_style_str = _response_style_str_for(first_generation,
+                                                      self.rng)
+        response_length_str = _response_length_str_for(
+            first_generation, self.rng)
+
+        text_pieces: list[str] = []
+        spans: list[tuple[int, int]] = []
+        offset = 0
+        for piece, trained in pieces:
+            if trained:
+                # NOTE: Empty generations have nothing to train on.
+                if piece:
+                    spans.append((offset, offset + len(piece)))
+            else:
+                piece = piece.replace("{{response_style_str}}",
+                                      response_style_str)
+                piece = piece.replace("{{response_length_str}}",
+                                      response_length_str)
+            text_pieces.append(piece)
+            offset += len(piece)
+
+        return EpisodeRecord(
+            text="".join(text_pieces),
+            spans=spans,
+            identifier=f"{self.episode.identifier}-{record_idx}",
+        )
+
+    def _utterance_offset_for(self, wrapped_turn: TurnWrapper) -> int:
+        '''Where the turn's utterance starts within its `as_str()`.'''
+        marked_turn = replace(wrapped_turn.turn, utterance="\0")
+        return self.wrapper(marked_turn).as_str().index("\0")
+
 
 def _ocurrence_count_of(word: str, string_to_search_in: str) -> int:
     '''Returns how many times `word` shows up in `string_to_search_in`.'''
@@ -139,11 +305,31 @@ def _has_matching_pairs_of(word: str, string_to_search_in: str) -> bool:
     return count > 0 and count % 2 == 0
 
 
-def _token_count_for(string: str) -> int:
-    return math.ceil(len(string.split()) * AVG_WORD_TO_TOKEN_RATIO)
+def _response_traits_for(response: str) -> tuple[bool, bool, int, int]:
+    '''
+    Everything about `response` its style/length instructions depend on, other
+    than the random choice of wording.
+    '''
+    return (
+        _has_matching_pairs_of("*", response),
+        _has_matching_pairs_of('"', response),
+        _length_bucket_for(len(response.split())),
+        response.count("\n\n") + 1,
+    )
+
+
+def _length_bucket_for(word_count: int) -> int:
+    '''From 0 (short) to 3 (very long), as described by the instructions.'''
+    if word_count < 16:
+        return 0
+    elif word_count < 96:
+        return 1
+    elif word_count < 192:
+        return 2
+    return 3
 
 
-def _response_style_str_for(response: str) -> str:
+def _response_style_str_for(response: str, rng: random.Random) -> str:
     '''
     For the given `response`, spit out a random string containing instructions
     according to its writing style.
@@ -152,7 +338,7 @@ def _response_style_str_for(response: str) -> str:
 
     if _has_matching_pairs_of("*", response):
         instructions.append(
-            random.choice([
+            rng.choice([
                 "Use asterisks to denote actions",
                 "Enclose roleplay actions within asterisks",
                 "Use asterisks for roleplaying actions",
@@ -162,17 +348,17 @@ def _response_style_str_for(response: str) -> str:
 
     if _has_matching_pairs_of('"', response):
         instructions.append(
-            random.choice([
+            rng.choice([
                 "Enclose dialog in quotes", "Dialog should go between quotes",
                 'Enclose spoken dialog in quotes ("Like this")',
                 "Spoken dialogue should be in between quotes"
             ]))
 
-    random.shuffle(instructions)
+    rng.shuffle(instructions)
     return ". ".join(instructions)
 
 
-def _response_length_str_for(response: str) -> str:
+def _response_length_str_for(response: str, rng: random.Random) -> str:
     '''
     For the given `response`, spit out a random string containing an instruction
     according to its length.
@@ -180,7 +366,7 @@ def _response_length_str_for(response: str) -> str:
     word_count = len(response.split())
     paragraph_count = response.count("\n\n") + 1
 
-    paragraph_count_str = random.choice([
+    paragraph_count_str = rng.choice([
         f"It should contain {paragraph_count} paragraphs",
         f"Use exactly {paragraph_count} paragraphs",
         f"Write {paragraph_count} paragraphs",
@@ -188,26 +374,27 @@ def _response_length_str_for(response: str) -> str:
         f"Respond with {paragraph_count} paragraphs",
     ])
 
-    if word_count < 16:
-        length_str = random.choice([
+    length_bucket = _length_bucket_for(word_count)
+    if length_bucket == 0:
+        length_str = rng.choice([
             "The generation should be short",
             "Be brief when generating the message",
             "The generated reply should be small",
         ])
-    elif word_count < 96:
-        length_str = random.choice([
+    elif length_bucket == 1:
+        length_str = rng.choice([
             "The generated reply should be of medium length",
             "The generated response should be slightly lengthy",
             "The generated message should be on the medium side",
         ])
-    elif word_count < 192:
-        length_str = random.choice([
+    elif length_bucket == 2:
+        length_str = rng.choice([
             "The new message will be lengthy",
             "The reply should be long",
             "The generation should be long",
         ])
     else:
-        length_str = random.choice([
+        length_str = rng.choice([
             "The new message will be extremely lengthy",
             "The reply should be extremely long",
             "The generation should be very long",
@@ -219,10 +406,10 @@ def _response_length_str_for(response: str) -> str:
     # paragraph count + generation length. Ugly code but it works and I'm
     # rushing this a little.
     if paragraph_count == 1:
-        return random.choice([
+        return rng.choice([
             length_str, length_str, ". ".join([
                 length_str,
-                random.choice([
+                rng.choice([
                     f"It should contain a single paragraph",
                     f"Write only one paragraph",
                     f"Generate a single paragraph",
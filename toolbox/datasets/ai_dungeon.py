@@ -12,6 +12,8 @@ class AiDungeonDataset(BaseDataset[str]):
     def __iter__(self) -> t.Generator[str, None, None]:
         root_path = get_path_for("ai-dungeon")
         file_path = os.path.join(root_path, "text_adventures.txt")
+        if not self.files_in_shard([file_path]):
+            return
 
         with open(file_path, "r") as file:
             for line in file:
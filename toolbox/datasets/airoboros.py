@@ -12,6 +12,8 @@ class AiroborosDataset(BaseDataset[SimpleReplyDataInstance]):
     def __iter__(self) -> t.Generator[SimpleReplyDataInstance, None, None]:
         root_path = get_path_for("airoboros")
         file_path = os.path.join(root_path, "instructions.jsonl")
+        if not self.files_in_shard([file_path]):
+            return
 
         with open(file_path, "r", encoding="utf-8") as f:
             for line in f:
@@ -24,6 +24,8 @@ class Airoboros2Dataset(BaseDataset[Airoboros2DataInstance]):
     def __iter__(self) -> t.Generator[Airoboros2DataInstance, None, None]:
         root_path = get_path_for("airoboros2")
         file_path = os.path.join(root_path, "instructions.jsonl")
+        if not self.files_in_shard([file_path]):
+            return
 
         with open(file_path, "r", encoding="utf-8") as f:
             for line in f:
@@ -1,11 +1,12 @@
 import json
 import logging
-import math
 import os
 import typing as t
 from dataclasses import dataclass
 
-from toolbox.core.dataset import BaseDataset, get_path_for
+from toolbox.core.dataset import BaseDataset, shard_items
+from toolbox.utils.files import enumerate_files_for
+from toolbox.utils.json_stream import JsonStreamReader
 
 LOG = logging.getLogger(__name__)
 
@@ -47,38 +48,39 @@ class CharacterAiDataset(BaseDataset[CaiChat]):
     '''Dataset for CharacterAI dumps.'''
 
     def __iter__(self) -> t.Generator[CaiChat, None, None]:
-        bot_id_to_info_dict = {}
+        bot_id_to_info_dict: dict[str, CaiBotInfo] = {}
 
         # Do a first run through all the files to load all the definitions and
-        # descriptions.
-        for _, data in _available_json_data():
+        # descriptions. This intentionally ignores sharding, since a chat in
+        # our shard might belong to a bot whose definitions are in another.
+        for json_file_path in _json_file_paths():
             try:
-                if not _is_definition_data(data):
-                    continue
-
-                bot_info = _bot_info_from_dict(data["character"])
-                bot_id_to_info_dict[bot_info.external_id] = bot_info
+                bot_info = _definitions_from(json_file_path)
+                if bot_info is not None:
+                    bot_id_to_info_dict[bot_info.external_id] = bot_info
+            # TODO(TG): Fix the Unicode error more properly
+            except (json.decoder.JSONDecodeError, UnicodeDecodeError) as ex:
+                LOG.error("Failed to parse %s: %s", json_file_path, ex)
             except (AttributeError, KeyError, ValueError) as ex:
                 LOG.debug("Skipping over exception: %s", ex)
 
         # Now do a second pass, to actually handle chat histories/messages.
-        for timestamp, data in _available_json_data():
+        for json_file_path in shard_items(_json_file_paths(), self.shard_index,
+                                          self.num_shards):
+            # NOTE: A file which isn't valid JSON gets skipped entirely, rather
+            # than yielding whatever chats come before the broken part. Making
+            # sure of that takes a separate pass over the file, so the chats
+            # can still be streamed out of it afterwards.
             try:
-                if _is_definition_data(data):
-                    continue
+                _check_decodes(json_file_path)
+            except (json.decoder.JSONDecodeError, UnicodeDecodeError) as ex:
+                LOG.error("Failed to parse %s: %s", json_file_path, ex)
+                continue
 
-                # Prefer grabbing bot info from a Character Editor dump, if it
-                # exists. Fall back to public data otherwise.
-                bot_id = data["info"]["character"]["external_id"]
-                bot_info = bot_id_to_info_dict.get(
-                    bot_id, _bot_info_from_dict(data["info"]["character"]))
-
-                for history_dict in data["histories"]["histories"]:
-                    messages = _messages_from_dict(history_dict["msgs"])
-                    yield CaiChat(bot=bot_info,
-                                  messages=messages,
-                                  identifier=f"{timestamp}-{bot_info.name}",
-                                  timestamp=timestamp)
+            try:
+                yield from _chats_from(json_file_path, bot_id_to_info_dict)
+            except (json.decoder.JSONDecodeError, UnicodeDecodeError) as ex:
+                LOG.error("Failed to parse %s: %s", json_file_path, ex)
             except (AttributeError, KeyError, ValueError) as ex:
                 LOG.debug("Skipping over exception: %s", ex)
 
@@ -88,56 +90,104 @@ class CharacterAiDataset(BaseDataset[CaiChat]):
 #
 
 
-def _enumerate_json_files(root_path: str) -> list[str]:
-    '''Returns a list of files available in the given `root_path`.'''
-    # TODO(11b): Implement the sharding logic out in the util, and get rid of
-    # this function.
-
-    items = os.listdir(root_path)
-
-    files: list[str] = []
-    for item in items:
-        item_path = os.path.join(root_path, item)
-        if not os.path.isfile(item_path) or not item_path.endswith(".json"):
-            # We only care about JSON files.
-            continue
-
-        absolute_file_path = os.path.abspath(os.path.join(root_path, item))
-        files.append(absolute_file_path)
-
-    # Super nasty code to allow generation of CAI data with separate processes
-    # so I can speed it up. Pass the "SHARD" and "TOTAL_SHARDS" environment
-    # variables to operate on the different parts of the data.
-    if "SHARD" not in os.environ:
-        return files
-
-    TOTAL_SHARDS = int(os.environ.get("TOTAL_SHARDS", 10))
-    items_per_shard = math.floor(len(files) / TOTAL_SHARDS)
-
-    shard = int(os.environ["SHARD"])
-    file_range = (items_per_shard * shard, (items_per_shard * (shard + 1)) - 1)
-
-    return files[file_range[0]:file_range[1]]
+def _json_file_paths() -> list[str]:
+    '''Returns all JSON files in the CharacterAI data folder.'''
+    json_file_paths: list[str] = []
+    for folder in ["public", "private"]:
+        json_file_paths += enumerate_files_for("characterai",
+                                               file_extension=".json",
+                                               subfolder=folder)
+    return json_file_paths
 
 
-def _available_json_data() -> t.Generator[tuple[int, dict[str, t.Any]], None, None]:
+def _definitions_from(json_file_path: str) -> CaiBotInfo | None:
     '''
-    Yields all available JSON data, parsed from the files in the CharacterAI
-    data folder.
+    Returns the bot info from a Character Editor dump (which possibly contains
+    definitions), or None if the file is a regular chat dump.
     '''
-    dataset_path = get_path_for("characterai")
+    with open(json_file_path, "r", encoding="utf-8-sig") as json_file:
+        reader = JsonStreamReader(json_file)
+        for key in reader.iter_object():
+            if key == "character":
+                return _bot_info_from_dict(reader.read_value())
+            elif key != "user__username":
+                # Regular dumps have `info` and `histories` instead, so we can
+                # bail out without having to parse the rest of the file.
+                return None
+    return None
+
+
+def _check_decodes(json_file_path: str) -> None:
+    '''
+    Raises if the file isn't valid JSON. Histories are read one at a time, so
+    this never holds more than a single one in memory.
+    '''
+    with open(json_file_path, "r", encoding="utf-8-sig") as json_file:
+        reader = JsonStreamReader(json_file)
+        for key in reader.iter_object():
+            if key != "histories":
+                continue
+            for histories_key in reader.iter_object():
+                if histories_key == "histories":
+                    for _ in reader.iter_array():
+                        pass
+
+
+def _chats_from(
+    json_file_path: str,
+    bot_id_to_info_dict: dict[str, CaiBotInfo],
+) -> t.Generator[CaiChat, None, None]:
+    '''
+    Yields chats from a regular CAI dump as they're parsed. Yields nothing for
+    Character Editor dumps, and raises a `ValueError` if the file doesn't seem
+    like either so we can discard bad data.
+    '''
+    # Every valid submission has its filename start with a Unix timestamp (in ms)
+    timestamp = int(os.path.basename(json_file_path).split("_")[0])
+
+    bot_info: CaiBotInfo | None = None
+    buffered_histories: list[dict[str, t.Any]] | None = None
+
+    def chat_from(history_dict: dict[str, t.Any]) -> CaiChat:
+        assert bot_info is not None
+        return CaiChat(bot=bot_info,
+                       messages=_messages_from_dict(history_dict["msgs"]),
+                       identifier=f"{timestamp}-{bot_info.name}",
+                       timestamp=timestamp)
+
+    with open(json_file_path, "r", encoding="utf-8-sig") as json_file:
+        reader = JsonStreamReader(json_file)
+        for key in reader.iter_object():
+            if key == "info":
+                # Prefer grabbing bot info from a Character Editor dump, if it
+                # exists. Fall back to public data otherwise.
+                character = reader.read_value()["character"]
+                bot_info = bot_id_to_info_dict.get(
+                    character["external_id"], _bot_info_from_dict(character))
+            elif key == "histories":
+                if bot_info is None:
+                    # Some people messed with their files so the order of the
+                    # keys isn't always the same. We need the bot info before
+                    # we can yield anything, so hold on to the chats for now.
+                    buffered_histories = reader.read_value()["histories"]
+                    continue
 
-    for folder in ["public", "private"]:
-        folder_path = os.path.join(dataset_path, folder)
-        for json_file_path in _enumerate_json_files(folder_path):
-            with open(json_file_path, "r", encoding="utf-8-sig") as json_file:
-                # Every valid submission has its filename start with a Unix timestamp (in ms)
-                timestamp = int(os.path.basename(json_file_path).split("_")[0])
-                try:
-                    yield (timestamp, json.load(json_file))
-                # TODO(TG): Fix the Unicode error more properly
-                except (json.decoder.JSONDecodeError, UnicodeDecodeError) as ex:
-                    LOG.error("Failed to parse %s: %s", json_file_path, ex)
+                for histories_key in reader.iter_object():
+                    if histories_key == "histories":
+                        for history_dict in reader.iter_array():
+                            yield chat_from(history_dict)
+            elif key in ["character", "user__username"]:
+                # Character Editor dump, already handled in the first pass.
+                return
+            else:
+                raise ValueError(
+                    f"Unexpected key found in CAI dump JSON file: {key}")
+
+    if buffered_histories is not None:
+        if bot_info is None:
+            raise KeyError("info")
+        for history_dict in buffered_histories:
+            yield chat_from(history_dict)
 
 
 def _bot_info_from_dict(info_dict: dict[str, t.Any]) -> CaiBotInfo:
@@ -164,26 +214,3 @@ def _messages_from_dict(msgs_dict: list[dict[str, t.Any]]) -> list[CaiMessage]:
         )
         messages.append(message)
     return messages
-
-
-def _is_definition_data(dict_from_json: dict[str, t.Any]) -> bool:
-    '''
-    Figures out whether the given dict (parsed from a JSON file) is a regular
-    dump, or a dump from the Character Editor (possibly containing definitions).
-
-    If it doesn't seem like either, raises a `ValueError` so we can discard bad
-    data.
-    '''
-    keys = list(dict_from_json.keys())
-
-    # Some people messed with their files so the order of the keys isn't always
-    # the same, so we sort for consistency.
-    keys.sort()
-    if keys == ["character"]:
-        return True
-    elif keys == ["character", "user__username"]:
-        return True
-    elif keys == ["histories", "info"]:
-        return False
-    else:
-        raise ValueError(f"Unexpected keys found in CAI dump JSON file: {keys}")
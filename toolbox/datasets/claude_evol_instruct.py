@@ -1,10 +1,10 @@
-import json
 import logging
 import os
 import typing as t
 
 from toolbox.core.dataset import BaseDataset, get_path_for
 from toolbox.datasets.common import SimpleReplyDataInstance
+from toolbox.utils.json_stream import iter_json_array
 
 LOG = logging.getLogger(__name__)
 
@@ -16,11 +16,12 @@ class ClaudeEvolInstructDataset(BaseDataset[SimpleReplyDataInstance]):
     def __iter__(self) -> t.Generator[SimpleReplyDataInstance, None, None]:
         root_path = get_path_for("claude-evol")
         file_path = os.path.join(root_path, "claude_evol_instruct_210k.json")
+        if not self.files_in_shard([file_path]):
+            return
 
         with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
             # Go through the logs and simply fetch them
-            for entry in data:
+            for entry in iter_json_array(f):
                 yield SimpleReplyDataInstance(
                     prompt=entry["instruction"],
                     generation=entry["output"],
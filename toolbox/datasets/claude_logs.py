@@ -1,12 +1,11 @@
 import json
 import logging
-import math
-import os
 import typing as t
 
 from dataclasses import dataclass
 
-from toolbox.core.dataset import BaseDataset, get_path_for
+from toolbox.core.dataset import BaseDataset, shard_items
+from toolbox.utils.files import enumerate_files_for
 
 LOG = logging.getLogger(__name__)
 
@@ -28,8 +27,10 @@ class ClaudeRpDataset(BaseDataset[ClaudeRpMessage]):
 
     def __iter__(self) -> t.Generator[ClaudeRpMessage, None, None]:
         # NOTE(TG): Maybe change the method of convo ID from number to timestamp?
-        convo_num = 0
-        for data in _available_json_data():
+        # Conversations are numbered by their file's position across *all*
+        # shards, so IDs don't collide when building shards separately.
+        for convo_num, data in _available_json_data(self.shard_index,
+                                                    self.num_shards):
             msg_list: list[ClaudeRpMessage] = []
             user_name = ""
             bot_name = ""
@@ -66,53 +67,27 @@ class ClaudeRpDataset(BaseDataset[ClaudeRpMessage]):
 
             except Exception as ex:
                 LOG.info(f"Unable to parse data in conversation {convo_num} due to exception {ex}")
-            finally:
-                convo_num += 1
 
-def _available_json_data() -> t.Generator[list[dict[str, t.Any]], None, None]:
+def _available_json_data(
+    shard_index: int = 0,
+    num_shards: int = 1,
+) -> t.Generator[tuple[int, list[dict[str, t.Any]]], None, None]:
     '''
     Yields all available JSON data, parsed from the files in the Claude
-    data folder.
+    data folder which belong to the given shard, alongside the index of the
+    file it came from.
     '''
-    dataset_path = get_path_for("claude-rp")
-
+    json_file_paths: list[str] = []
     for folder in ["public", "private"]:
-        folder_path = os.path.join(dataset_path, folder)
-        for json_file_path in _enumerate_json_files(folder_path):
-            with open(json_file_path, "r", encoding="utf-8") as json_file:
-                try:
-                    yield [json.loads(line) for line in json_file]
-                # TODO(TG): Fix the Unicode error more properly
-                except (json.decoder.JSONDecodeError, UnicodeDecodeError) as ex:
-                    LOG.error("Failed to parse %s: %s", json_file_path, ex)
-
-def _enumerate_json_files(root_path: str) -> list[str]:
-    '''Returns a list of files available in the given `root_path`.'''
-    # TODO(11b): Implement the sharding logic out in the util, and get rid of
-    # this function.
-
-    items = os.listdir(root_path)
-
-    files: list[str] = []
-    for item in items:
-        item_path = os.path.join(root_path, item)
-        if not os.path.isfile(item_path) or not item_path.endswith(".jsonl"):
-            # We only care about JSON files.
-            continue
-
-        absolute_file_path = os.path.abspath(os.path.join(root_path, item))
-        files.append(absolute_file_path)
+        json_file_paths += enumerate_files_for("claude-rp",
+                                               file_extension=".jsonl",
+                                               subfolder=folder)
 
-    # Super nasty code to allow generation of Claude data with separate processes
-    # so I can speed it up. Pass the "SHARD" and "TOTAL_SHARDS" environment
-    # variables to operate on the different parts of the data.
-    if "SHARD" not in os.environ:
-        return files
-
-    TOTAL_SHARDS = int(os.environ.get("TOTAL_SHARDS", 10))
-    items_per_shard = math.floor(len(files) / TOTAL_SHARDS)
-
-    shard = int(os.environ["SHARD"])
-    file_range = (items_per_shard * shard, (items_per_shard * (shard + 1)) - 1)
-
-    return files[file_range[0]:file_range[1]]
+    for file_idx, json_file_path in shard_items(list(enumerate(json_file_paths)),
+                                                shard_index, num_shards):
+        with open(json_file_path, "r", encoding="utf-8") as json_file:
+            try:
+                yield file_idx, [json.loads(line) for line in json_file]
+            # TODO(TG): Fix the Unicode error more properly
+            except (json.decoder.JSONDecodeError, UnicodeDecodeError) as ex:
+                LOG.error("Failed to parse %s: %s", json_file_path, ex)
@@ -1,4 +1,3 @@
-import json
 import logging
 import os
 import typing as t
@@ -6,6 +5,7 @@ import typing as t
 from dataclasses import dataclass
 
 from toolbox.core.dataset import BaseDataset, get_path_for
+from toolbox.utils.json_stream import iter_json_array
 
 LOG = logging.getLogger(__name__)
 
@@ -22,11 +22,12 @@ class ClaudeInstructDataset(BaseDataset[ClaudeMultiround]):
     def __iter__(self) -> t.Generator[ClaudeMultiround, None, None]:
         root_path = get_path_for("claude-multiround")
         file_path = os.path.join(root_path, "claude_multiround_chat_30k.json")
+        if not self.files_in_shard([file_path]):
+            return
 
         with open(file_path, "r", encoding="utf-8") as f:
-            logs = json.load(f)
             # Go through the logs and simply fetch them
-            for round in logs:
+            for round in iter_json_array(f):
                 yield ClaudeMultiround(
                     conversation=round["conversations"],
                     id=round["id"],
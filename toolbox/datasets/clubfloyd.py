@@ -1,9 +1,9 @@
-import json
 import os
 import typing as t
 from dataclasses import dataclass
 
 from toolbox.core.dataset import BaseDataset, get_path_for
+from toolbox.utils.json_stream import iter_json_object
 
 
 @dataclass(frozen=True)
@@ -39,10 +39,11 @@ class ClubFloydDataset(BaseDataset[ClubFloydStory]):
     def __iter__(self) -> t.Generator[ClubFloydStory, None, None]:
         root_path = get_path_for("club-floyd")
         file_path = os.path.join(root_path, "floyd.json")
+        if not self.files_in_shard([file_path]):
+            return
 
         with open(file_path, "r") as file:
-            raw_stories = json.load(file).values()
-            for raw_story in raw_stories:
+            for _, raw_story in iter_json_object(file):
                 actions = [
                     _story_action_from_dict(action)
                     for action in raw_story["data"]
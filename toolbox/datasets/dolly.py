@@ -16,6 +16,8 @@ class DollyDataset(BaseDataset[AlpacaLikeDataInstance]):
     def __iter__(self) -> t.Generator[AlpacaLikeDataInstance, None, None]:
         root_path = get_path_for("dolly")
         file_path = os.path.join(root_path, "databricks-dolly-15k.jsonl")
+        if not self.files_in_shard([file_path]):
+            return
         
         with open(file_path, "r", encoding="utf-8") as f:
             for line in f:
@@ -1,9 +1,9 @@
-import json
 import os
 import typing as t
 
 from toolbox.core.dataset import BaseDataset, get_path_for
 from toolbox.datasets.common import AlpacaLikeDataInstance
+from toolbox.utils.json_stream import iter_json_array
 
 class EvolInstructDataset(BaseDataset[AlpacaLikeDataInstance]):
     '''
@@ -15,10 +15,11 @@ class EvolInstructDataset(BaseDataset[AlpacaLikeDataInstance]):
     def __iter__(self) -> t.Generator[AlpacaLikeDataInstance, None, None]:
         root_path = get_path_for("evol-instruct")
         file_path = os.path.join(root_path, "alpaca_evol_instruct_70k.json")
+        if not self.files_in_shard([file_path]):
+            return
 
         with open(file_path, "r") as file:
-            data = json.load(file)
-            for example in data:
+            for example in iter_json_array(file):
                 yield AlpacaLikeDataInstance(
                     instruction=example["instruction"],
                     input=None,
@@ -1,10 +1,9 @@
 import typing as t
 from dataclasses import dataclass
 
-import pandas as pd
-
 from toolbox.core.dataset import BaseDataset
 from toolbox.utils.files import enumerate_files_for
+from toolbox.utils.parquet import DEFAULT_BATCH_SIZE, iter_parquet_rows
 
 
 @dataclass(frozen=True)
@@ -21,15 +20,27 @@ class Gpt4AllDataset(BaseDataset[Gpt4AllDataInstance]):
     https://huggingface.co/datasets/nomic-ai/gpt4all_prompt_generations
     '''
 
+    def __init__(self,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 shard_index: int | None = None,
+                 num_shards: int | None = None) -> None:
+        self.batch_size = batch_size
+
+        super().__init__(shard_index=shard_index, num_shards=num_shards)
+
     def __iter__(self) -> t.Generator[Gpt4AllDataInstance, None, None]:
         parquet_files = enumerate_files_for("gpt4all_prompt_generations",
-                                            file_extension="parquet")
+                                            file_extension="parquet",
+                                            shard_index=self.shard_index,
+                                            num_shards=self.num_shards)
 
         for file in parquet_files:
-            df = pd.read_parquet(file)
-            for idx in df.index:
+            for row in iter_parquet_rows(
+                    file,
+                    columns=["prompt", "response", "source"],
+                    batch_size=self.batch_size):
                 yield Gpt4AllDataInstance(
-                    prompt=df["prompt"][idx],
-                    response=df["response"][idx],
-                    source=df["source"][idx],
+                    prompt=row["prompt"],
+                    response=row["response"],
+                    source=row["source"],
                 )
@@ -1,9 +1,9 @@
-import json
 import typing as t
 
 from toolbox.core.dataset import BaseDataset
 from toolbox.datasets.common import AlpacaLikeDataInstance
 from toolbox.utils.files import enumerate_files_for
+from toolbox.utils.json_stream import iter_json_array
 
 class Gpt4LlmDataset(BaseDataset[AlpacaLikeDataInstance]):
     '''
@@ -13,7 +13,10 @@ class Gpt4LlmDataset(BaseDataset[AlpacaLikeDataInstance]):
     '''
 
     def __iter__(self) -> t.Generator[AlpacaLikeDataInstance, None, None]:
-        filepaths = enumerate_files_for("gpt-4-llm", file_extension="json")
+        filepaths = enumerate_files_for("gpt-4-llm",
+                                        file_extension="json",
+                                        shard_index=self.shard_index,
+                                        num_shards=self.num_shards)
 
         for path in filepaths:
             if "comparision_data.json" in path:
@@ -21,8 +24,7 @@ class Gpt4LlmDataset(BaseDataset[AlpacaLikeDataInstance]):
                 continue
 
             with open(path, "r") as file:
-                data = json.load(file)
-                for entry in data:
+                for entry in iter_json_array(file):
                     yield AlpacaLikeDataInstance(
                         instruction=entry["instruction"],
                         input=entry["input"],
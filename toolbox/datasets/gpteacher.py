@@ -1,9 +1,9 @@
-import json
 import os
 import typing as t
 
 from toolbox.core.dataset import BaseDataset, get_path_for
 from toolbox.datasets.common import AlpacaLikeDataInstance
+from toolbox.utils.json_stream import iter_json_array
 
 class GpTeacherDataset(BaseDataset[AlpacaLikeDataInstance]):
     '''
@@ -14,11 +14,10 @@ class GpTeacherDataset(BaseDataset[AlpacaLikeDataInstance]):
 
     def __iter__(self) -> t.Generator[AlpacaLikeDataInstance, None, None]:
         path_to_root_folder = get_path_for("gpteacher")
-        for desired_filename in DESIRED_FILES:
+        for desired_filename in self.files_in_shard(DESIRED_FILES):
             path = os.path.join(path_to_root_folder, desired_filename)
             with open(path, "r") as file:
-                data = json.load(file)
-                for entry in data:
+                for entry in iter_json_array(file):
                     yield AlpacaLikeDataInstance(
                         instruction=entry["instruction"],
                         input=entry["input"],
@@ -23,9 +23,9 @@ class LimaRpDataset(BaseDataset[LimaRpEntry]):
     def __iter__(self) -> t.Generator[LimaRpEntry, None, None]:
         base_path = get_path_for("lima-erp")
         glob_path = f"{os.path.normpath(base_path)}/data/**/*.yaml"
-        file_paths = glob.glob(glob_path, recursive=True)
+        file_paths = sorted(glob.glob(glob_path, recursive=True))
 
-        for file in file_paths:
+        for file in self.files_in_shard(file_paths):
             forum = os.path.basename(os.path.dirname(file))
             thread_id = os.path.basename(file).split(".")[0]
             with open(file, 'r', encoding='utf-8') as f:
@@ -33,6 +33,8 @@ class McStoriesDataset(BaseDataset[McStory]):
 
         root_data_path = get_path_for("mcstories")
         file_path = os.path.join(root_data_path, "mcstories--all.csv")
+        if not self.files_in_shard([file_path]):
+            return
 
         with open(file_path, "r") as file:
             reader = csv.DictReader(file, delimiter=",")
@@ -1,12 +1,10 @@
 import logging
-import os
 import typing as t
 from dataclasses import dataclass
 
-import pandas as pd
-
 from toolbox.core.dataset import BaseDataset
 from toolbox.utils.files import enumerate_files_for
+from toolbox.utils.parquet import DEFAULT_BATCH_SIZE, iter_parquet_rows
 
 LOG = logging.getLogger(__name__)
 
@@ -19,14 +17,27 @@ class OpenOrcaEntry:
 
 class OpenOrcaDataset(BaseDataset[OpenOrcaEntry]):
     '''The OpenOrca dataset.'''
+    def __init__(self,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 shard_index: int | None = None,
+                 num_shards: int | None = None) -> None:
+        self.batch_size = batch_size
+
+        super().__init__(shard_index=shard_index, num_shards=num_shards)
+
     def __iter__(self) -> t.Generator[OpenOrcaEntry, None, None]:
         # We have this so that one can use GPT-4 OpenOrca, 3.5 OpenOrca, or both
-        for path in enumerate_files_for(dataset_name="openorca", file_extension=".parquet"):
-            df = pd.read_parquet(path)
-            for idx in df.index:
+        for path in enumerate_files_for(dataset_name="openorca",
+                                        file_extension=".parquet",
+                                        shard_index=self.shard_index,
+                                        num_shards=self.num_shards):
+            for row in iter_parquet_rows(
+                    path,
+                    columns=["id", "system_prompt", "question", "response"],
+                    batch_size=self.batch_size):
                 yield OpenOrcaEntry(
-                    id=df["id"][idx],
-                    system_prompt=df["system_prompt"][idx],
-                    question=df["question"][idx],
-                    response=df["response"][idx]
+                    id=row["id"],
+                    system_prompt=row["system_prompt"],
+                    question=row["question"],
+                    response=row["response"]
                 )
@@ -45,7 +45,9 @@ class RpForumsDataset(BaseDataset[RpThread]):
         csv.field_size_limit(sys.maxsize)
 
         for path in enumerate_files_for(dataset_name="rp_forums",
-                                        file_extension=".csv"):
+                                        file_extension=".csv",
+                                        shard_index=self.shard_index,
+                                        num_shards=self.num_shards):
             with open(path, "r") as file:
                 reader = csv.DictReader(file, delimiter=",")
                 source_file = os.path.basename(path)
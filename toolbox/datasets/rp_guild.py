@@ -26,7 +26,10 @@ class RpGuildDataset(BaseDataset[RpGuildThread]):
         # the csv library shits itself by default, so we fix that here.
         # See note from 11b in rp_forums.py for further details.
         csv.field_size_limit(sys.maxsize)
-        for path in enumerate_files_for(dataset_name="rp-guild", file_extension=".csv"):
+        for path in enumerate_files_for(dataset_name="rp-guild",
+                                        file_extension=".csv",
+                                        shard_index=self.shard_index,
+                                        num_shards=self.num_shards):
             with open(path, "r") as file:
                 reader = csv.DictReader(file, delimiter=",")
 
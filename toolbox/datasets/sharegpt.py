@@ -22,7 +22,9 @@ class ShareGptDataset(BaseDataset[ShareGptEpisode]):
 
     def __iter__(self) -> t.Generator[ShareGptEpisode, None, None]:
         for path in enumerate_files_for(dataset_name="sharegpt",
-                                        file_extension=".json"):
+                                        file_extension=".json",
+                                        shard_index=self.shard_index,
+                                        num_shards=self.num_shards):
             with open(path, "r", encoding="utf-8") as file:
                 data = json.load(file)
                 source_file = os.path.basename(path).replace(".json", "")
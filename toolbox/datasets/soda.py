@@ -2,9 +2,8 @@ import os
 import typing as t
 from dataclasses import dataclass
 
-import pandas as pd
-
 from toolbox.core.dataset import BaseDataset, get_path_for
+from toolbox.utils.parquet import DEFAULT_BATCH_SIZE, iter_parquet_rows
 
 
 @dataclass(frozen=True)
@@ -25,19 +24,31 @@ class SodaDataset(BaseDataset[SodaEpisode]):
     https://huggingface.co/datasets/allenai/soda
     '''
 
-    def __init__(self, split: str = "train") -> None:
+    def __init__(self,
+                 split: str = "train",
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 shard_index: int | None = None,
+                 num_shards: int | None = None) -> None:
         assert split in ["test", "train", "valid"]
         root_data_path = get_path_for("soda")
         self.file_path = os.path.join(root_data_path, f"{split}.parquet")
+        self.batch_size = batch_size
 
-        super().__init__()
+        super().__init__(shard_index=shard_index, num_shards=num_shards)
 
     def __iter__(self) -> t.Generator[SodaEpisode, None, None]:
-        df = pd.read_parquet(self.file_path)
-        for idx in df.index:
-            yield SodaEpisode(narrative=df["narrative"][idx],
-                              dialogue=df["dialogue"][idx],
-                              speakers=df["speakers"][idx],
-                              relation=df["relation"][idx],
-                              literal=df["literal"][idx],
-                              original_index=str(df["original_index"][idx]))
+        if not self.files_in_shard([self.file_path]):
+            return
+
+        for row in iter_parquet_rows(self.file_path,
+                                     columns=[
+                                         "narrative", "dialogue", "speakers",
+                                         "relation", "literal", "original_index"
+                                     ],
+                                     batch_size=self.batch_size):
+            yield SodaEpisode(narrative=row["narrative"],
+                              dialogue=row["dialogue"],
+                              speakers=row["speakers"],
+                              relation=row["relation"],
+                              literal=row["literal"],
+                              original_index=str(row["original_index"]))
@@ -1,10 +1,10 @@
-import json
 import logging
 import os
 import typing as t
 
 from toolbox.core.dataset import BaseDataset, get_path_for
 from toolbox.datasets.common import AlpacaLikeDataInstance
+from toolbox.utils.json_stream import iter_json_array
 
 logger = logging.getLogger(__name__)
 
@@ -16,10 +16,11 @@ class SuperCotDataset(BaseDataset[AlpacaLikeDataInstance]):
     def __iter__(self) -> t.Generator[AlpacaLikeDataInstance, None, None]:
         root_path = get_path_for("supercot")
         file_path = os.path.join(root_path, "filtered.json")
+        if not self.files_in_shard([file_path]):
+            return
 
         with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            for entry in data:
+            for entry in iter_json_array(f):
                 # "rewritten_intent" is pretty similar to just a standard input
                 # and replaces the "input" field in the JSON, so just conflate
                 # the two.
@@ -22,7 +22,10 @@ class WhocarsDataset(BaseDataset[WhocarsEntry]):
     '''Logs from the whocars proxy.'''
 
     def __iter__(self) -> t.Generator[WhocarsEntry, None, None]:
-        for file_path in enumerate_files_for("whocars", file_extension=".csv"):
+        for file_path in enumerate_files_for("whocars",
+                                             file_extension=".csv",
+                                             shard_index=self.shard_index,
+                                             num_shards=self.num_shards):
             if "__index__" in file_path:
                 continue
 
@@ -1,9 +1,9 @@
-import json
 import os
 import typing as t
 from dataclasses import dataclass
 
 from toolbox.core.dataset import BaseDataset, get_path_for
+from toolbox.utils.json_stream import iter_json_array
 
 
 @dataclass(frozen=True)
@@ -23,10 +23,11 @@ class WizardVicunaDataset(BaseDataset[WizardVicunaConversation]):
     def __iter__(self) -> t.Generator[WizardVicunaConversation, None, None]:
         root_path = get_path_for("wizard_vicuna_70k")
         file_path = os.path.join(root_path, "wizard_vicuna_dataset.json")
+        if not self.files_in_shard([file_path]):
+            return
 
         with open(file_path, "r") as file:
-            data = json.load(file)
-            for entry in data:
+            for entry in iter_json_array(file):
                 messages = entry["conversations"]
                 for idx in range(0, len(messages), 2):
                     human_message = messages[idx]
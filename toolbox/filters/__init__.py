@@ -1,10 +1,14 @@
 import typing as t
 
-from toolbox.filters.training_example.duplicate_filter import DuplicateFilter
-from toolbox.filters.training_example.refusal_filter import RefusalFilter
 from toolbox.filters.training_example_filter import TrainingExampleFilter
+from toolbox.utils.registry import LazyRegistry
 
-NAME_TO_TRAINING_EXAMPLE_FILTER_MAPPING: dict[
-    str, t.Type[TrainingExampleFilter]] = {
-        cls.__name__: cls for cls in [DuplicateFilter, RefusalFilter]
-    }
+NAME_TO_TRAINING_EXAMPLE_FILTER_MAPPING: LazyRegistry[
+    t.Type[TrainingExampleFilter]] = LazyRegistry({
+        "DuplicateFilter":
+            "toolbox.filters.training_example.duplicate_filter",
+        "NearDuplicateFilter":
+            "toolbox.filters.training_example.near_duplicate_filter",
+        "RefusalFilter":
+            "toolbox.filters.training_example.refusal_filter",
+    })
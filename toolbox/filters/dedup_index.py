@@ -0,0 +1,284 @@
+import hashlib
+import logging
+import math
+import os
+import typing as t
+
+import numpy as np
+
+LOG = logging.getLogger(__name__)
+
+# How many recently added keys are kept in a Python set before being flushed
+# out into a sorted NumPy array. Bounds the per-key overhead of the index to
+# (amortized) eight bytes, plus the bloom filter if enabled.
+DEFAULT_MEMTABLE_SIZE = 1 << 16
+
+# Initial amount of keys the bloom filter is sized for. It gets rebuilt twice
+# as big whenever the index outgrows it.
+DEFAULT_BLOOM_CAPACITY = 1 << 20
+BLOOM_FALSE_POSITIVE_RATE = 0.01
+
+# Keys are stored as little-endian unsigned 64-bit integers. With 64 bits,
+# a billion distinct examples have roughly a 3% chance of a single false
+# positive between them, which is an acceptable price for a 25x smaller index.
+KEY_DTYPE = np.dtype("<u8")
+
+
+def key_for(text: str) -> int:
+    '''Computes the fixed-width key used to identify `text` in the index.'''
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class DedupIndex:
+    '''
+    A compact set of 64-bit keys, meant for remembering which examples have
+    already been seen across very large (and multiple) builds.
+
+    New keys go into a small in-memory set, which gets flushed into a sorted
+    array once it fills up. Sorted arrays of similar sizes are merged together
+    (like an LSM tree), so lookups only ever need to binary search through a
+    logarithmic amount of them.
+
+    An optional bloom filter can sit in front of all that, so lookups for keys
+    which were never seen (the common case) usually don't have to touch the
+    arrays at all. It's pure Python, so it's only worth enabling when the
+    arrays themselves are slow to access, e.g. a big index that's been loaded
+    from disk and isn't in the page cache.
+
+    The index can be saved as a `.npy` file holding every key in sorted order,
+    and loading it back memory-maps that array instead of reading it in.
+    '''
+
+    def __init__(self,
+                 use_bloom_filter: bool = False,
+                 memtable_size: int = DEFAULT_MEMTABLE_SIZE) -> None:
+        self.memtable_size = memtable_size
+
+        self._num_keys = 0
+        self._memtable: set[int] = set()
+        # Sorted, disjoint arrays of keys, from largest to smallest.
+        self._runs: list[np.ndarray] = []
+        self._bloom: _BloomFilter | None = _BloomFilter(
+            DEFAULT_BLOOM_CAPACITY) if use_bloom_filter else None
+
+    def add(self, key: int) -> bool:
+        '''
+        Adds `key` into the index. Returns whether it was actually added, that
+        is, whether it wasn't already in the index.
+        '''
+        if key in self._memtable:
+            return False
+        if self._bloom is None:
+            if self._in_runs(key):
+                return False
+        elif self._bloom.add(key) and self._in_runs(key):
+            return False
+
+        self._memtable.add(key)
+        self._num_keys += 1
+        if self._bloom is not None and self._num_keys > self._bloom.capacity:
+            self._rebuild_bloom_filter()
+
+        if len(self._memtable) >= self.memtable_size:
+            self._flush_memtable()
+
+        return True
+
+    def __contains__(self, key: int) -> bool:
+        if key in self._memtable:
+            return True
+        if self._bloom is not None and not self._bloom.might_contain(key):
+            return False
+        return self._in_runs(key)
+
+    def __len__(self) -> int:
+        return self._num_keys
+
+    def keys(self) -> np.ndarray:
+        '''Returns every key in the index, as a single sorted array.'''
+        self._flush_memtable()
+        self._merge_runs(len(self._runs))
+        return self._runs[0] if self._runs else np.empty(0, dtype=KEY_DTYPE)
+
+    def save(self, path: str) -> None:
+        '''Writes the index out to `path`, atomically replacing it.'''
+        keys = self.keys()
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as file:
+            np.save(file, keys)
+        os.replace(tmp_path, path)
+
+        LOG.info("Saved %s keys into the dedup index at %s", len(keys), path)
+
+    @classmethod
+    def load(cls, path: str, use_bloom_filter: bool = False) -> "DedupIndex":
+        '''Loads an index previously written with `save`.'''
+        keys = _load_keys_from(path)
+        LOG.info("Loaded %s keys from the dedup index at %s", len(keys), path)
+        return cls.from_keys(keys, use_bloom_filter=use_bloom_filter)
+
+    @classmethod
+    def from_keys(cls,
+                  keys: np.ndarray,
+                  use_bloom_filter: bool = False) -> "DedupIndex":
+        '''Builds an index out of a sorted array of unique keys.'''
+        index = cls(use_bloom_filter=use_bloom_filter)
+        if len(keys) > 0:
+            index._runs.append(keys.astype(KEY_DTYPE, copy=False))
+            index._num_keys = len(keys)
+        if index._bloom is not None:
+            index._rebuild_bloom_filter()
+        return index
+
+    @classmethod
+    def merged_from(cls,
+                    paths: t.Iterable[str],
+                    use_bloom_filter: bool = False) -> "DedupIndex":
+        '''
+        Builds a single index out of several saved ones, e.g. the ones written
+        by each shard of a sharded build.
+        '''
+        all_keys = [_load_keys_from(path) for path in paths]
+        keys = np.unique(np.concatenate(all_keys)) if all_keys \
+            else np.empty(0, dtype=KEY_DTYPE)
+        return cls.from_keys(keys, use_bloom_filter=use_bloom_filter)
+
+    def _in_runs(self, key: int) -> bool:
+        # Otherwise, older NumPy versions compare through float64 and might
+        # report false matches.
+        key = np.uint64(key)
+        for run in self._runs:
+            idx = run.searchsorted(key)
+            if idx < len(run) and run[idx] == key:
+                return True
+        return False
+
+    def _flush_memtable(self) -> None:
+        if not self._memtable:
+            return
+
+        run = np.fromiter(self._memtable,
+                          dtype=KEY_DTYPE,
+                          count=len(self._memtable))
+        run.sort()
+        self._runs.append(run)
+        self._memtable = set()
+
+        # Keep run sizes roughly geometric, so there's only ever a logarithmic
+        # amount of them, and each key gets copied a logarithmic amount of times.
+        runs_to_merge = 1
+        while runs_to_merge < len(self._runs) and \
+                len(self._runs[-runs_to_merge - 1]) <= 2 * sum(
+                    len(run) for run in self._runs[-runs_to_merge:]):
+            runs_to_merge += 1
+        self._merge_runs(runs_to_merge)
+
+    def _merge_runs(self, count: int) -> None:
+        '''Merges the `count` smallest runs into a single one.'''
+        if count < 2:
+            return
+
+        runs = self._runs[-count:]
+        del self._runs[-count:]
+
+        # Every run is already sorted, so this is effectively a merge.
+        merged = np.concatenate(runs)
+        merged.sort(kind="stable")
+        self._runs.append(merged)
+
+    def _rebuild_bloom_filter(self) -> None:
+        capacity = DEFAULT_BLOOM_CAPACITY
+        while capacity < len(self):
+            capacity *= 2
+
+        bloom = _BloomFilter(capacity)
+        for run in self._runs:
+            bloom.add_many(run)
+        for key in self._memtable:
+            bloom.add(key)
+        self._bloom = bloom
+
+
+#
+# Private helpers.
+#
+
+
+class _BloomFilter:
+    '''
+    Plain bloom filter over 64-bit keys. Since the keys are already uniformly
+    distributed hashes, bit positions are derived from them directly via double
+    hashing instead of hashing them again.
+    '''
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+
+        # Rounded up to a power of two so positions can be masked instead of
+        # taking a (much slower) modulo. Only makes false positives rarer.
+        optimal_num_bits = -capacity * math.log(
+            BLOOM_FALSE_POSITIVE_RATE) / math.log(2)**2
+        self.num_bits = 1 << max(3, math.ceil(math.log2(optimal_num_bits)))
+        self.num_hashes = max(1,
+                              round(optimal_num_bits / capacity * math.log(2)))
+        self.bits = bytearray(self.num_bits // 8)
+
+    def add(self, key: int) -> bool:
+        '''
+        Adds `key` into the filter. Returns whether it might've already been
+        in there, i.e. whether all of its bits were already set.
+        '''
+        bits = self.bits
+        position, step = self._start_and_step_for(key)
+        position_mask = self.num_bits - 1
+        was_present = True
+        for _ in range(self.num_hashes):
+            bit = 1 << (position & 7)
+            if not bits[position >> 3] & bit:
+                bits[position >> 3] |= bit
+                was_present = False
+            position = (position + step) & position_mask
+        return was_present
+
+    def add_many(self, keys: np.ndarray, batch_size: int = 1 << 20) -> None:
+        bits = np.frombuffer(self.bits, dtype=np.uint8)
+        position_mask = np.uint64(self.num_bits - 1)
+        for start in range(0, len(keys), batch_size):
+            batch = np.asarray(keys[start:start + batch_size], dtype=np.uint64)
+            # Same as `_start_and_step_for`, just vectorized. Both halves are
+            # 32 bits wide, so none of this can overflow.
+            low = batch & np.uint64(0xFFFFFFFF)
+            high = (batch >> np.uint64(32)) | np.uint64(1)
+            for i in range(self.num_hashes):
+                positions = (low + np.uint64(i) * high) & position_mask
+                masks = np.left_shift(1, positions & np.uint64(7)).astype(
+                    np.uint8)
+                np.bitwise_or.at(bits, positions >> np.uint64(3), masks)
+
+    def might_contain(self, key: int) -> bool:
+        bits = self.bits
+        position, step = self._start_and_step_for(key)
+        position_mask = self.num_bits - 1
+        for _ in range(self.num_hashes):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+            position = (position + step) & position_mask
+        return True
+
+    def _start_and_step_for(self, key: int) -> tuple[int, int]:
+        # Double hashing: the i-th bit position is `(low + i * high) % m`.
+        position_mask = self.num_bits - 1
+        low = key & 0xFFFFFFFF
+        high = (key >> 32) | 1
+        return low & position_mask, high & position_mask
+
+
+def _load_keys_from(path: str) -> np.ndarray:
+    keys = np.load(path, mmap_mode="r")
+    if keys.dtype != KEY_DTYPE or keys.ndim != 1:
+        raise ValueError(
+            f"{path} doesn't look like a dedup index (got an array of {keys.dtype} with shape {keys.shape})"
+        )
+    return keys
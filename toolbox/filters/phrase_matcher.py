@@ -0,0 +1,97 @@
+import re
+import typing as t
+
+
+class PhraseMatcher:
+    '''
+    Finds any of a (potentially large) list of phrases within a piece of text,
+    in a single pass.
+
+    The phrases get folded into a trie, which is then compiled down into one
+    regular expression (e.g.: `["illegal", "illegality", "ill"]` becomes
+    `ill(?:egal(?:ity)?)?`). At each position in the text the regex engine only
+    has to follow the branch for the current character instead of testing every
+    phrase, which is the same idea as an Aho-Corasick automaton but runs
+    entirely inside `re`'s C implementation.
+    '''
+
+    def __init__(self,
+                 phrases: t.Iterable[str],
+                 case_sensitive: bool = False) -> None:
+        self.case_sensitive = case_sensitive
+        self.phrases = list(
+            dict.fromkeys(
+                phrase if case_sensitive else phrase.lower()
+                for phrase in phrases))
+        assert all(self.phrases), "Phrases must not be empty"
+
+        self._regex = re.compile(trie_pattern_for(self.phrases))
+
+    def find(self, text: str) -> str | None:
+        '''
+        Returns the first phrase found within `text`, or None if none of them
+        are there. When several phrases start at the same position, the
+        longest one is reported.
+        '''
+        if not self.phrases:
+            return None
+
+        if not self.case_sensitive:
+            text = text.lower()
+
+        match = self._regex.search(text)
+        return match.group() if match is not None else None
+
+    def find_all(self, text: str) -> list[str]:
+        '''Returns every (non-overlapping) phrase found within `text`.'''
+        if not self.phrases:
+            return []
+
+        if not self.case_sensitive:
+            text = text.lower()
+
+        return [match.group() for match in self._regex.finditer(text)]
+
+
+def trie_pattern_for(phrases: t.Iterable[str]) -> str:
+    '''
+    Returns a regex pattern which matches any of the given phrases literally,
+    preferring the longest one when several start at the same position.
+    '''
+    root: _TrieNode = {}
+    for phrase in phrases:
+        node = root
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[_END_OF_PHRASE] = {}
+
+    return _pattern_for_node(root)
+
+
+#
+# Private helpers.
+#
+
+# Marks the end of a phrase within a trie node. Can't collide with an actual
+# character, since those are all strings of length one.
+_END_OF_PHRASE = ""
+
+_TrieNode = dict[str, "_TrieNode"]
+
+
+def _pattern_for_node(node: _TrieNode) -> str:
+    branches = [
+        re.escape(char) + _pattern_for_node(child)
+        for char, child in sorted(node.items())
+        if char != _END_OF_PHRASE
+    ]
+    if not branches:
+        return ""
+
+    pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+    if _END_OF_PHRASE in node:
+        # A phrase ends here, but longer ones continue on. Greedy `?` means
+        # we'll still report the longest phrase at any given position.
+        pattern = f"(?:{pattern})?"
+
+    return pattern
@@ -1,26 +1,43 @@
-import hashlib
+import os
 
 from toolbox.core.training_example import TrainingExample
+from toolbox.filters.dedup_index import DedupIndex, key_for
 from toolbox.filters.training_example_filter import TrainingExampleFilter
 
 
 class DuplicateFilter(TrainingExampleFilter):
-    '''Filters out training examples which are exact duplicates.'''
+    '''
+    Filters out training examples which are exact duplicates.
 
-    def __init__(self) -> None:
+    If `index_path` is given, examples seen by previous builds which used the
+    same index are considered duplicates as well, and the index gets updated
+    with this build's examples once it's done.
+    '''
+
+    def __init__(self,
+                 index_path: str | None = None,
+                 use_bloom_filter: bool = False) -> None:
         super().__init__()
 
-        self.seen_hashes: set[str] = set()
+        self.index_path = index_path
+        self.use_bloom_filter = use_bloom_filter
+        if index_path is not None and os.path.exists(index_path):
+            self.index = DedupIndex.load(index_path,
+                                         use_bloom_filter=use_bloom_filter)
+        else:
+            self.index = DedupIndex(use_bloom_filter=use_bloom_filter)
 
     def should_keep(self, example: TrainingExample) -> bool:
         serialized_example = example.prompt + example.generation
-        example_hash = _calculate_hash_for(serialized_example)
-        if example_hash in self.seen_hashes:
-            return False
+        return self.index.add(key_for(serialized_example))
 
-        self.seen_hashes.add(example_hash)
-        return True
+    def save_state(self, path: str) -> None:
+        self.index.save(path)
 
+    def load_state(self, path: str) -> None:
+        self.index = DedupIndex.load(path,
+                                     use_bloom_filter=self.use_bloom_filter)
 
-def _calculate_hash_for(text: str) -> str:
-    return hashlib.sha512(text.encode("utf-8")).hexdigest()
+    def close(self) -> None:
+        if self.index_path is not None:
+            self.index.save(self.index_path)
@@ -0,0 +1,223 @@
+import logging
+import zlib
+
+import numpy as np
+
+from toolbox.core.training_example import TrainingExample
+from toolbox.filters.dedup_index import DedupIndex
+from toolbox.filters.training_example_filter import TrainingExampleFilter
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_SHINGLE_SIZE = 5
+DEFAULT_NUM_PERMUTATIONS = 128
+# How many of the most recently kept examples get remembered, at most. Each
+# takes up eight bytes per band (so around 72 bytes with the defaults).
+DEFAULT_CAPACITY = 1_000_000
+
+# Shingles are hashed against all permutations in blocks of this many rows, so
+# memory stays bounded no matter how long an example is.
+SHINGLE_BLOCK_SIZE = 2048
+
+# Odd 64-bit constant used to mix words into shingles and rows into bands.
+_MIX_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+class NearDuplicateFilter(TrainingExampleFilter):
+    '''
+    Filters out training examples which are near-duplicates of ones that have
+    already been kept, e.g. the same conversation with different whitespace, a
+    different system prompt or an extra trailing sentence.
+
+    Each example is split into overlapping word n-grams ("shingles") and boiled
+    down to a MinHash signature, computed for all permutations at once with
+    NumPy. The signature is then cut into bands, and an example counts as a
+    near-duplicate if any of its bands has been seen before (banded LSH). The
+    amount of bands and rows per band is picked so that the probability of a
+    match rises sharply around `threshold` (estimated Jaccard similarity).
+
+    Only the band hashes of kept examples are remembered, in a `DedupIndex`, so
+    memory use is a small fixed amount per kept example regardless of how long
+    it is. To keep it bounded, only the last `capacity` kept examples (at
+    most, and at least half of that) are compared against: band hashes go
+    into one of two generations, and once the newer one holds half of
+    `capacity` the older one gets dropped. Without a `capacity`, every kept
+    example is remembered for the whole build.
+
+    Examples are never compared against others from their own episode, since
+    consecutive turns of a conversation share almost their entire prompt. The
+    band hashes of an episode's examples only get remembered once the next
+    episode comes along (which relies on an episode's examples going through
+    the filter one after the other, with identifiers made up of the episode's
+    identifier and a suffix).
+    '''
+
+    def __init__(self,
+                 threshold: float = DEFAULT_THRESHOLD,
+                 shingle_size: int = DEFAULT_SHINGLE_SIZE,
+                 num_permutations: int = DEFAULT_NUM_PERMUTATIONS,
+                 capacity: int | None = DEFAULT_CAPACITY,
+                 seed: int = 1) -> None:
+        super().__init__()
+
+        assert 0.0 < threshold < 1.0, "Threshold must be between 0 and 1"
+        assert shingle_size >= 1, "Shingle size must be positive"
+        assert capacity is None or capacity >= 2, "Capacity must be at least 2"
+
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.num_bands, self.rows_per_band = _lsh_params_for(
+            threshold, num_permutations)
+        LOG.debug("Using %s bands of %s rows for a threshold of %s",
+                  self.num_bands, self.rows_per_band, threshold)
+
+        # Universal multiply-add hash functions (modulo 2^64) standing in for
+        # random permutations. `a` must be odd.
+        rng = np.random.default_rng(seed)
+        num_hashes = self.num_bands * self.rows_per_band
+        self._a = rng.integers(0, 2**64, num_hashes, dtype=np.uint64) | 1
+        self._b = rng.integers(0, 2**64, num_hashes, dtype=np.uint64)
+
+        self.capacity = capacity
+        # Oldest first. New band hashes go into the last one.
+        self.seen_bands = [DedupIndex()]
+        self._examples_in_generation = 0
+
+        # Band hashes of the examples kept from the current episode, which
+        # don't get added into `seen_bands` until the episode is over.
+        self._episode_identifier: str | None = None
+        self._episode_band_keys: list[list[int]] = []
+
+    def should_keep(self, example: TrainingExample) -> bool:
+        episode_identifier = _episode_identifier_for(example)
+        if episode_identifier != self._episode_identifier:
+            self._remember_episode_band_keys()
+            self._episode_identifier = episode_identifier
+
+        shingles = self._shingles_for(example.prompt + example.generation)
+        if len(shingles) == 0:
+            return True
+
+        band_keys = self._band_keys_for(self._signature_for(shingles))
+        if any(key in generation for generation in self.seen_bands
+               for key in band_keys):
+            return False
+
+        self._episode_band_keys.append(band_keys)
+        return True
+
+    def save_state(self, path: str) -> None:
+        episode_band_keys = np.array(self._episode_band_keys,
+                                     dtype=np.uint64).reshape(
+                                         -1, self.num_bands)
+        # Written through a file object, or NumPy tacks `.npz` onto the path.
+        with open(path, "wb") as file:
+            np.savez(file,
+                     np.array(self._examples_in_generation),
+                     np.array(self._episode_identifier or ""),
+                     episode_band_keys,
+                     *[generation.keys() for generation in self.seen_bands])
+
+    def load_state(self, path: str) -> None:
+        with np.load(path) as state:
+            arrays = [state[f"arr_{idx}"] for idx in range(len(state.files))]
+        self._examples_in_generation = int(arrays[0])
+        self._episode_identifier = str(arrays[1]) or None
+        self._episode_band_keys = arrays[2].tolist()
+        self.seen_bands = [DedupIndex.from_keys(keys) for keys in arrays[3:]]
+
+    def _remember_episode_band_keys(self) -> None:
+        '''Adds the current episode's band hashes into `seen_bands`.'''
+        for band_keys in self._episode_band_keys:
+            for key in band_keys:
+                self.seen_bands[-1].add(key)
+            self._examples_in_generation += 1
+            if self.capacity is not None \
+                    and self._examples_in_generation >= self.capacity // 2:
+                self.seen_bands = [self.seen_bands[-1], DedupIndex()]
+                self._examples_in_generation = 0
+        self._episode_band_keys = []
+
+    def _shingles_for(self, text: str) -> np.ndarray:
+        '''Hashes every word n-gram in `text` into a 32-bit value.'''
+        # Splitting the encoded text and hashing through `map` keeps the
+        # per-word work entirely in C, which matters since this is most of the
+        # time spent on an example.
+        words = np.fromiter(map(zlib.crc32,
+                                text.lower().encode("utf-8").split()),
+                            dtype=np.uint64)
+        if len(words) == 0:
+            return words
+
+        # Texts shorter than a single shingle become one shingle on their own.
+        shingle_size = min(self.shingle_size, len(words))
+        num_shingles = len(words) - shingle_size + 1
+
+        # Unsigned overflow wraps around, which is what we want here.
+        hashes = np.zeros(num_shingles, dtype=np.uint64)
+        for offset in range(shingle_size):
+            hashes = hashes * _MIX_MULTIPLIER + words[offset:offset +
+                                                      num_shingles]
+        return hashes >> np.uint64(32)
+
+    def _signature_for(self, shingles: np.ndarray) -> np.ndarray:
+        '''Computes the MinHash signature for the given shingle hashes.'''
+        signature = np.full(len(self._a), np.iinfo(np.uint64).max,
+                            dtype=np.uint64)
+        for start in range(0, len(shingles), SHINGLE_BLOCK_SIZE):
+            block = shingles[start:start + SHINGLE_BLOCK_SIZE, np.newaxis]
+            hashes = block * self._a
+            hashes += self._b
+            np.minimum(signature, hashes.min(axis=0), out=signature)
+        return signature
+
+    def _band_keys_for(self, signature: np.ndarray) -> list[int]:
+        '''Hashes each band of the signature into a single 64-bit key.'''
+        bands = signature.reshape(self.num_bands, self.rows_per_band)
+
+        # Seeded with the band number, so identical rows in different bands
+        # don't collide with each other.
+        keys = np.arange(1, self.num_bands + 1, dtype=np.uint64)
+        for row in range(self.rows_per_band):
+            keys = keys * _MIX_MULTIPLIER + bands[:, row]
+        return keys.tolist()
+
+
+#
+# Private helpers.
+#
+
+
+def _episode_identifier_for(example: TrainingExample) -> str:
+    '''
+    Returns the identifier of the episode `example` came out of, which is
+    everything before the example's number.
+    '''
+    return example.identifier.rpartition("-")[0]
+
+
+def _lsh_params_for(threshold: float,
+                    num_permutations: int) -> tuple[int, int]:
+    '''
+    Picks the amount of bands `b` and rows per band `r` (using at most
+    `num_permutations` hashes) which minimize the chance of false positives
+    below `threshold` plus the chance of false negatives above it.
+
+    Two examples with similarity `s` end up sharing at least one band with
+    probability `1 - (1 - s^r)^b`, so both chances are just integrals of that
+    over `[0, threshold]` and `[threshold, 1]` respectively.
+    '''
+    below = np.linspace(0.0, threshold, 256)
+    above = np.linspace(threshold, 1.0, 256)
+
+    def error_for(bands: int, rows: int) -> float:
+        false_positives = 1.0 - (1.0 - below**rows)**bands
+        false_negatives = (1.0 - above**rows)**bands
+        return float(false_positives.mean() * threshold +
+                     false_negatives.mean() * (1.0 - threshold))
+
+    return min(((bands, rows)
+                for rows in range(1, num_permutations + 1)
+                for bands in range(1, num_permutations // rows + 1)),
+               key=lambda params: error_for(*params))
@@ -1,6 +1,12 @@
+import collections
+import logging
+
 from toolbox.core.training_example import TrainingExample
+from toolbox.filters.phrase_matcher import PhraseMatcher
 from toolbox.filters.training_example_filter import TrainingExampleFilter
 
+LOG = logging.getLogger(__name__)
+
 
 class RefusalFilter(TrainingExampleFilter):
     '''
@@ -8,12 +14,21 @@ class RefusalFilter(TrainingExampleFilter):
     user's request.
     '''
 
+    def __init__(self) -> None:
+        super().__init__()
+
+        # How many examples each phrase has caused to be dropped, for auditing.
+        self.matched_phrase_counts: collections.Counter[str] = \
+            collections.Counter()
+
     def should_keep(self, example: TrainingExample) -> bool:
-        generation = example.generation.lower()
-        for bad_phrase in _TIER_1_BAD_PHRASES:
-            if bad_phrase in generation:
-                return False
-        return True
+        bad_phrase = TIER_1_BAD_PHRASE_MATCHER.find(example.generation)
+        if bad_phrase is None:
+            return True
+
+        LOG.debug("Dropping example due to bad phrase: %r", bad_phrase)
+        self.matched_phrase_counts[bad_phrase] += 1
+        return False
 
 
 # Taken from the dataset card in:
@@ -136,4 +151,6 @@ _TIER_1_BAD_PHRASES = [
     "focus on promoting safety",
     "openai",
     "chatgpt",
-]
\ No newline at end of file
+]
+
+TIER_1_BAD_PHRASE_MATCHER = PhraseMatcher(_TIER_1_BAD_PHRASES)
@@ -9,4 +9,21 @@ class TrainingExampleFilter:
         Whether or not the given training example should be kept and used for
         training.
         '''
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    def close(self) -> None:
+        '''
+        Called once all training examples have gone through the filter, so it
+        can persist any state it needs to. Not called if the build crashes.
+        '''
+
+    def save_state(self, path: str) -> None:
+        '''
+        Saves whatever the filter remembers about the examples it's seen so far
+        (e.g. which ones it's already kept) into `path`, so a resumed build can
+        pick up where this one left off. Stateless filters can leave this be,
+        and just not write anything.
+        '''
+
+    def load_state(self, path: str) -> None:
+        '''Restores state previously saved with `save_state`.'''
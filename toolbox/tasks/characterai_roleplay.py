@@ -4,6 +4,7 @@ import typing as t
 from toolbox.core.models import Episode, Turn, TurnKind
 from toolbox.core.task import BaseTask
 from toolbox.datasets.characterai import CharacterAiDataset
+from toolbox.utils.anonymizer import Anonymizer
 from toolbox.utils.prompts import generate_prompts, select_prompt
 
 LOG = logging.getLogger(__name__)
@@ -29,10 +30,10 @@ class CharacterAiRoleplayTask(BaseTask):
             system_turn = Turn(utterance=system_prompt, kind=TurnKind.SYSTEM)
 
             turns: list[Turn] = [system_turn]
+            anonymizer = _anonymizer_for(char_name=conversation.bot.name)
             for message in conversation.messages:
                 turn = Turn(
-                    utterance=_replace_placeholders_in(
-                        message.text, char_name=conversation.bot.name),
+                    utterance=anonymizer.anonymize(message.text),
                     kind=TurnKind.USER if message.is_human else TurnKind.MODEL)
                 turns.append(turn)
             yield Episode(
@@ -40,12 +41,13 @@ class CharacterAiRoleplayTask(BaseTask):
                 identifier=f"characterai-roleplay-{conversation.identifier}")
 
 
-def _replace_placeholders_in(utterance: str, char_name: str) -> str:
+def _anonymizer_for(char_name: str) -> Anonymizer:
     '''
-    Replaces placeholders generated by my userscript (or commonly found in CAI
-    logs) with their expected substitutions.
+    Returns an anonymizer which replaces placeholders generated by my
+    userscript (or commonly found in CAI logs) with their expected
+    substitutions.
     '''
-    s = utterance.replace("{{char}}", char_name)
+    substitutions = {"{{char}}": char_name}
     for redaction_token in [
             "[NAME_IN_MESSAGE_REDACTED]",
             "[REDACTED]",
@@ -53,9 +55,9 @@ def _replace_placeholders_in(utterance: str, char_name: str) -> str:
             "[USERNAME_REDACTED]",
             "[NAME_REDACTED]",
     ]:
-        s = s.replace(redaction_token, "{{user}}")
+        substitutions[redaction_token] = "{{user}}"
 
-    return s
+    return Anonymizer(substitutions, whole_words=False)
 
 
 _BASE_SYSTEM_PROMPTS = [
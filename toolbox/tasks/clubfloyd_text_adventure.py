@@ -71,7 +71,7 @@ def _process_tags(tags: list[str]) -> str:
     ]
 
     # Shuffle and remove duplicates to ensure data diversity.
-    tags = list(set(tags))
+    tags = list(dict.fromkeys(tags))
     random.shuffle(tags)
 
     return ", ".join(tags)
@@ -2,11 +2,10 @@ import logging
 import re
 import typing as t
 
-from markdownify import markdownify
-
 from toolbox.core.models import Episode, Turn, TurnKind
 from toolbox.core.task import BaseTask
 from toolbox.datasets.gpt4all import Gpt4AllDataset
+from toolbox.utils.markdown import html_to_markdown
 from toolbox.utils.prompts import generate_prompts, select_prompt
 
 LOG = logging.getLogger(__name__)
@@ -48,7 +47,7 @@ def _html_to_clean_markdown(html: str) -> str:
     Converts the given HTML to Markdown and cleans up any weird-looking stuff
     left behind. Manually identified by randomly sampling the data.
     '''
-    markdown = markdownify(html)
+    markdown = html_to_markdown(html, default_backend="html.parser")
 
     # Fix excessive spaces after converting to Markdown.
     markdown = re.sub("\n{2,}", "\n\n", markdown)
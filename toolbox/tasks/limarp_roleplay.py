@@ -7,6 +7,7 @@ import typing as t
 from toolbox.core.models import Episode, Turn, TurnKind
 from toolbox.core.task import BaseTask
 from toolbox.datasets.limarp import LimaRpDataset, LimaRpEntry
+from toolbox.utils.anonymizer import Anonymizer
 from toolbox.utils.prompts import generate_prompts, select_prompt
 
 LOG = logging.getLogger(__name__)
@@ -15,10 +16,11 @@ class LimaRpRoleplayTask(BaseTask):
     def __iter__(self) -> t.Generator[Episode, None, None]:
         for entry in LimaRpDataset():
             turns: list[Turn] = []
+            anonymizer = _anonymizer_for(entry)
             # Format the system prompt first.
             system_prompt = select_prompt(SYSTEM_PROMPTS)
             # Fix it up and append it as the first turn
-            system_prompt = _fix_punctuation(_substitute_elements(system_prompt, entry))
+            system_prompt = _fix_punctuation(anonymizer.anonymize(system_prompt))
             turns.append(Turn(
                 utterance=system_prompt,
                 kind=TurnKind.SYSTEM
@@ -26,7 +28,7 @@ class LimaRpRoleplayTask(BaseTask):
 
             # Now for the rest
             for msg in entry.conversation:
-                cleaned_msg = _fix_punctuation(_substitute_elements(msg['text'], entry))
+                cleaned_msg = _fix_punctuation(anonymizer.anonymize(msg['text']))
                 turns.append(Turn(
                     utterance=cleaned_msg,
                     kind=TurnKind.MODEL if msg['name'] == "<FIRST>" else TurnKind.USER
@@ -42,20 +44,28 @@ class LimaRpRoleplayTask(BaseTask):
                 identifier=f"limarp-{entry.forum}-{entry.thread_id}"
             )
 
-def _substitute_elements(input_string: str, entry: LimaRpEntry) -> str:
+def _anonymizer_for(entry: LimaRpEntry) -> Anonymizer:
     '''
-    Replace blank/template fields with data from the particular entry.
+    Returns an anonymizer which replaces blank/template fields with data from
+    the particular entry.
     '''
-    # System prompts
-    input_string = input_string.replace("<CHAR>", entry.names['<FIRST>'])
-    input_string = input_string.replace("<PERSONA>", entry.personas['<FIRST>'])
-    input_string = input_string.replace("<SCENARIO>", entry.scenario)
-
     # Users
-    input_string = input_string.replace("<SECOND>", "{{user}}")
-    input_string = input_string.replace("<FIRST>", entry.names['<FIRST>'])
-
-    return input_string
+    user_substitutions = {
+        "<SECOND>": "{{user}}",
+        "<FIRST>": entry.names['<FIRST>'],
+    }
+
+    # System prompts. The persona and scenario can refer to the users too, so
+    # those get substituted within them first.
+    users_anonymizer = Anonymizer(user_substitutions, whole_words=False)
+    return Anonymizer(
+        {
+            "<CHAR>": entry.names['<FIRST>'],
+            "<PERSONA>": users_anonymizer.anonymize(entry.personas['<FIRST>']),
+            "<SCENARIO>": users_anonymizer.anonymize(entry.scenario),
+            **user_substitutions,
+        },
+        whole_words=False)
 
 def _fix_punctuation(input_string: str) -> str:
     '''
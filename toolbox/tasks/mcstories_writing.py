@@ -2,11 +2,10 @@ import logging
 import random
 import typing as t
 
-from markdownify import markdownify
-
 from toolbox.core.models import Episode, Turn, TurnKind
 from toolbox.core.task import BaseTask
 from toolbox.datasets.mcstories import McStoriesDataset
+from toolbox.utils.markdown import html_to_markdown
 from toolbox.utils.prompts import generate_prompts, select_prompt
 
 LOG = logging.getLogger(__name__)
@@ -52,7 +51,7 @@ class McStoriesWritingTask(BaseTask):
 
 
 def _html_story_to_clean_md(html: str) -> str:
-    md = str(markdownify(html))
+    md = html_to_markdown(html, default_backend="html.parser")
 
     lines: list[str] = []
     for line in md.splitlines():
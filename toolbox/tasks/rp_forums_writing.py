@@ -3,12 +3,19 @@ import random
 import re
 import typing as t
 
-from markdownify import markdownify
-
 from toolbox.core.models import Episode, Turn, TurnKind
 from toolbox.core.task import BaseTask
 from toolbox.datasets.rp_forums import RpForumsDataset, RpType
-from toolbox.utils.prompts import generate_prompts, select_prompt
+from toolbox.utils.anonymizer import Anonymizer
+from toolbox.utils.markdown import html_to_markdown
+from toolbox.utils.prompts import PromptTemplate, generate_prompts, select_prompt
+from toolbox.utils.text_cleaning import (
+    CleaningPipeline,
+    Fused,
+    Replace,
+    Substitute,
+    Transform
+)
 
 LOG = logging.getLogger(__name__)
 
@@ -43,10 +50,11 @@ class RpForumsWritingTask(BaseTask):
                 continue
 
             # Build up a dictionary of usernames to replace for privacy reasons.
-            usernames = set([message.author for message in thread.messages])
+            usernames = dict.fromkeys([message.author for message in thread.messages])
             username_substitutions: dict[str, str] = {}
             for idx, name in enumerate(usernames):
                 username_substitutions[name] = "{{char_" + str(idx) + "}}"
+            anonymizer = Anonymizer(username_substitutions)
 
             # System prompt
             system_prompt = select_prompt(SYSTEM_PROMPTS)
@@ -64,11 +72,7 @@ class RpForumsWritingTask(BaseTask):
             current_speaker = random.choice([TurnKind.MODEL, TurnKind.USER, TurnKind.USER, TurnKind.USER])
 
             for message in thread.messages:
-                long_message = message.message
-
-                long_message = _fix_style_and_encoding_issues(long_message)
-                long_message = _remove_bad_html_tags(long_message)
-                long_message = _remove_links(long_message)
+                long_message = HTML_CLEANING_PIPELINE(message.message)
 
                 assert "http://" not in long_message and "https://" not in long_message \
                     , "Failed to clean URLs properly."
@@ -81,22 +85,16 @@ class RpForumsWritingTask(BaseTask):
                         long_message,
                         target_word_count=target_word_count,
                         delimiter="<br/><br/>"):
-                    cleaned_message = str(markdownify(message))
-                    cleaned_message = _remove_trailing_whitespace_and_bad_lines(
+                    cleaned_message = html_to_markdown(
+                        message, default_backend="html.parser")
+                    cleaned_message = MARKDOWN_CLEANING_PIPELINE(
                         cleaned_message)
 
-                    cleaned_message = _fix_markdown(cleaned_message)
-
-                    # Fix excessive spaces after converting to Markdown.
-                    cleaned_message = re.sub("\n{2,}", "\n\n", cleaned_message)
-
                     # Username substitutions need to be done _after_ the HTML has
                     # been converted into markdown, otherwise we get escape
                     # characters messing things up.
-                    for name, substitution in username_substitutions.items():
-                        cleaned_message = re.sub(rf"\b{re.escape(name)}\b",
-                                                 substitution, cleaned_message)
-                        
+                    cleaned_message = anonymizer.anonymize(cleaned_message)
+
                     # NOTE(TG): 11b's original idea where RP generations were framed
                     # as almost entirely model turns in order to get as much data from
                     # it as possible was nice, but a little flawed. In 7B and 13B models,
@@ -166,34 +164,37 @@ def _split_message(original_message: str, target_word_count: int,
     return reconstructed_messages
 
 
-def _fix_style_and_encoding_issues(original_message: str) -> str:
-    '''Cleans up any style-related issues.'''
-    message = original_message
-    message = message.replace(" .. ", "... ")
-    message = message.replace(" ... ", "... ")
-    message = re.sub(r'\b(\.\.\.?)\b', '... ', message)
-
-    message = message.replace(" . ", ". ")
-    message = message.replace(" , ", ", ")
-    message = message.replace(" ? ", "? ")
-    message = message.replace(" ! ", "! ")
-
-    message = re.sub(r"(\S)(…)(\S)", "\\1\\2 \\3", message)
-
-    # Some forums have their pages incorrectly tagged as UTF-8, so we get
-    # garbage when decoding. Most common problem I've seen is bad quotation
-    # marks, so we paper over that here.
-    message = message.replace("â??", "'")
-    message = message.replace("â?", "'")
-
-    message = message.replace("", " ")
-
-    return message
+def _space_out_ellipsis_characters(original_message: str) -> str:
+    '''
+    Same as `re.sub(r"(\S)(…)(\S)", "\\1\\2 \\3", message)`, just without
+    the regex having to try every single position in the message.
+    '''
+    idx = original_message.find("…", 1)
+    if idx == -1:
+        return original_message
+
+    pieces: list[str] = []
+    last_idx = 0
+    # Matches can't overlap, so the text before an ellipsis character can't be
+    # the text after the previous one.
+    min_idx = 1
+    while idx != -1:
+        if idx >= min_idx and idx + 1 < len(original_message) \
+                and not original_message[idx - 1].isspace() \
+                and not original_message[idx + 1].isspace():
+            pieces.append(original_message[last_idx:idx + 1])
+            pieces.append(" ")
+            last_idx = idx + 1
+            min_idx = idx + 3
+        idx = original_message.find("…", idx + 1)
+
+    pieces.append(original_message[last_idx:])
+    return "".join(pieces)
 
 
 def _remove_links(original_message: str) -> str:
     '''Removes any links from the given message, due to privacy concerns.'''
-    return re.sub(r"https?:\/\/.+?(\s|$)", "", original_message)
+    return _LINK_REMOVER.anonymize(original_message)
 
 
 def _remove_trailing_whitespace_and_bad_lines(original_message: str) -> str:
@@ -218,45 +219,35 @@ def _not_usable_as_training_label(message: str) -> bool:
     and we're better off not training on.
     '''
 
-    # "Floating" quotation marks.
-    if re.search(r'\b " \b', message) is not None:
-        return True
-
-    # Quotation marks mushed together with text.
-    if re.search(r'\S"\S', message) is not None:
-        return True
-
-    # Parenthesis mushed together with text.
-    if re.search(r'\S\(', message) is not None \
-        or re.search(r'\)\S', message) is not None:
-        return True
-
-    # Lowercase "I". Fixable, but a sign of low-quality writing so I'd rather
-    # not train the model on these.
-    if re.search(r"\bi('m|'ll)?\b", message) is not None:
-        return True
-
-    # Links.
-    if re.search(r"\[.+\]\(\S+\)", message) is not None:
-        return True
-
-    return False
+    return _NOT_USABLE_AS_TRAINING_LABEL_REGEX.search(message) is not None
 
 
 def _fix_markdown(original_message: str) -> str:
-    s = original_message
-
     # Bold/italics sometimes doesn't have spaces around it after converting from
     # HTML to Markdown for some reason.
+    #
+    # Inserting a space never creates a new match, and the next match can start
+    # at the last character of the current one at the earliest, so this can
+    # all be done in a single scan over the original message.
+    pieces: list[str] = []
+    last_idx = 0
     is_opening_asterisk = True
-    while (match := re.search(r"([\w\d])(\*{1,2})([\w\d])", s)) is not None:
-        if is_opening_asterisk:
-            s = s[:match.start() + 1] + " " + s[match.start() + 1:]
-        else:
-            s = s[:match.end() - 1] + " " + s[match.end() - 1:]
+    match = _UNSPACED_ASTERISKS_REGEX.search(original_message)
+    while match is not None:
+        # Space goes between the text and the opening asterisks, or between
+        # the closing asterisks and the text.
+        split_idx = match.start() + 1 if is_opening_asterisk \
+            else match.end() - 1
+        pieces.append(original_message[last_idx:split_idx])
+        pieces.append(" ")
+        last_idx = split_idx
         is_opening_asterisk = not is_opening_asterisk
 
-    return s
+        match = _UNSPACED_ASTERISKS_REGEX.search(original_message,
+                                                 match.end() - 1)
+
+    pieces.append(original_message[last_idx:])
+    return "".join(pieces)
 
 
 def _remove_bad_html_tags(message: str) -> str:
@@ -300,6 +291,71 @@ def _seems_to_have_ooc_talk(message: str) -> bool:
 
 _OOC_REGEX = re.compile(r"^\((OOC: ?)?.+\)$", flags=re.MULTILINE)
 
+# Links get removed from the raw HTML, before it's converted into Markdown (and
+# before names can be substituted), so this is a separate pass.
+_LINK_REMOVER = Anonymizer({}, remove_links=True)
+
+_UNSPACED_ASTERISKS_REGEX = re.compile(r"([\w\d])(\*{1,2})([\w\d])")
+
+# Any of these means we'd rather not train on a message.
+_NOT_USABLE_AS_TRAINING_LABEL_REGEX = re.compile("|".join([
+    # "Floating" quotation marks.
+    r'\b " \b',
+    # Quotation marks mushed together with text.
+    r'\S"\S',
+    # Parenthesis mushed together with text.
+    r'\S\(',
+    r'\)\S',
+    # Lowercase "I". Fixable, but a sign of low-quality writing so I'd rather
+    # not train the model on these.
+    r"\bi(?:'m|'ll)?\b",
+    # Links.
+    r"\[.+\]\(\S+\)",
+]))
+
+# Cleans up style-related issues. These only ever touch runs of spaces and
+# punctuation (and `\b` only looks at what's right next to one), so they can
+# all be done in a single pass over each run which might need cleaning: any
+# which contains a space followed by more of those, or a "..". Applying them
+# one after another per run still matters, e.g. " .. " turns into "... ", so
+# "  .. " ends up as "... " too.
+_STYLE_RULES = Fused("style", r" [ .,?!]+|\.\.[ .,?!]*", [
+    Replace("spaced double ellipsis", " .. ", "... "),
+    Replace("spaced ellipsis", " ... ", "... "),
+    Substitute("unspaced ellipsis", r'\b(\.\.\.?)\b', '... ', trigger=".."),
+    Replace("spaced period", " . ", ". "),
+    Replace("spaced comma", " , ", ", "),
+    Replace("spaced question mark", " ? ", "? "),
+    Replace("spaced exclamation mark", " ! ", "! "),
+])
+
+# Everything that gets done to a message while it's still HTML.
+HTML_CLEANING_PIPELINE = CleaningPipeline([
+    _STYLE_RULES,
+    Transform("unspaced ellipsis character",
+              _space_out_ellipsis_characters),
+
+    # Some forums have their pages incorrectly tagged as UTF-8, so we get
+    # garbage when decoding. Most common problem I've seen is bad quotation
+    # marks, so we paper over that here. Has to come after the above, since
+    # it turns some of what that looks at into whitespace.
+    Replace("bad quotation mark", "â??", "'"),
+    Replace("bad quotation mark", "â?\x9d", "'"),
+    Replace("stray control character", "\x9d", " "),
+
+    Transform("bad HTML tags", _remove_bad_html_tags),
+    Transform("links", _remove_links),
+])
+
+# Everything that gets done to a message after converting it into Markdown.
+MARKDOWN_CLEANING_PIPELINE = CleaningPipeline([
+    Transform("trailing whitespace and bad lines",
+              _remove_trailing_whitespace_and_bad_lines),
+    Transform("unspaced asterisks", _fix_markdown),
+    # Fix excessive spaces after converting to Markdown.
+    Substitute("excessive newlines", "\n{2,}", "\n\n", trigger="\n\n"),
+])
+
 _BASE_SYSTEM_PROMPTS = [
     '''%{Enter|Engage|Enable|Start} %{fiction writing|fantasy writing|fantasy roleplay|fictional RP|roleplay|RP} mode. {{content_type_str}}. {{response_length_str}}.''',
     #
@@ -341,7 +397,7 @@ NSFW_PROMPTS = generate_prompts([
     "%{Generations|Your writing|The generated response|Your reply|Generated replies} must %{be not safe for work|be NSFW|include adult themes|include erotic themes|include 18+ content}",
 ])
 
-CONTENT_TYPE_TO_PROMPTS: dict[RpType, list[str]] = {
+CONTENT_TYPE_TO_PROMPTS: dict[RpType, list[PromptTemplate]] = {
     RpType.RP: SFW_PROMPTS,
     RpType.ERP: NSFW_PROMPTS,
     RpType.MIXED: MIXED_SFW_NSFW_PROMPTS,
@@ -3,26 +3,21 @@ import random
 import re
 import typing as t
 
-from markdownify import markdownify
-
 from toolbox.core.models import Episode, Turn, TurnKind
 from toolbox.core.task import BaseTask
 from toolbox.datasets.rp_guild import RpGuildDataset
 # No need to re-invent the wheel.
 from toolbox.tasks.rp_forums_writing import(
-    _fix_markdown,
-    _fix_style_and_encoding_issues,
+    HTML_CLEANING_PIPELINE,
+    MARKDOWN_CLEANING_PIPELINE,
     _not_usable_as_training_label,
-    _remove_bad_html_tags,
-    _remove_links,
-    _remove_trailing_whitespace_and_bad_lines,
     _seems_to_have_ooc_talk,
     _split_message,
 )
+from toolbox.utils.anonymizer import Anonymizer
+from toolbox.utils.markdown import html_to_markdown
 from toolbox.utils.prompts import generate_prompts, select_prompt
 
-# Gaze upon my works, ye mighty, and despair.
-MENTION_PATTERN = re.compile(r"(?<!\w)([^\S\r\n]|^)*@[^\W\s]+?(?=(,|\.|\?|~|!|\s|:|$))", flags=re.MULTILINE)
 OOC_PATTERN = re.compile(r"((\[\[|\(\().*(\)\)|\]\])|\(OOC:.+\)|(?<=\s)OOC:.*(?!$))")
 
 LOG = logging.getLogger(__name__)
@@ -55,10 +50,12 @@ class RpGuildWritingTask(BaseTask):
                 continue
 
             # Build up a dictionary of usernames to replace for privacy reasons.
-            usernames = set([message.author for message in thread.messages])
+            usernames = dict.fromkeys([message.author for message in thread.messages])
             username_substitutions: dict[str, str] = {}
             for idx, name in enumerate(usernames):
                 username_substitutions[name] = "{{char_" + str(idx) + "}}"
+            anonymizer = Anonymizer(username_substitutions,
+                                    remove_mentions=True)
 
             # NOTE(TG): For now, I'm having this be 1x1 roleplays only, but I really do
             # want this to account for group roleplays. I'll figure something out later.
@@ -95,11 +92,7 @@ class RpGuildWritingTask(BaseTask):
             current_speaker = random.choice([TurnKind.MODEL, TurnKind.USER, TurnKind.USER, TurnKind.USER])
             
             for message in thread.messages:
-                long_message = message.message
-
-                long_message = _fix_style_and_encoding_issues(long_message)
-                long_message = _remove_bad_html_tags(long_message)
-                long_message = _remove_links(long_message)
+                long_message = HTML_CLEANING_PIPELINE(message.message)
 
                 assert "http://" not in long_message and "https://" not in long_message \
                     , "Failed to clean URLs properly."
@@ -112,26 +105,22 @@ class RpGuildWritingTask(BaseTask):
                         long_message,
                         target_word_count=target_word_count,
                         delimiter="<br/><br/>"):
-                    cleaned_message = str(markdownify(message))
-                    cleaned_message = _remove_trailing_whitespace_and_bad_lines(
+                    cleaned_message = html_to_markdown(
+                        message, default_backend="html.parser")
+                    cleaned_message = MARKDOWN_CLEANING_PIPELINE(
                         cleaned_message)
 
-                    cleaned_message = _fix_markdown(cleaned_message)
-
-                    # Fix excessive spaces after converting to Markdown.
-                    cleaned_message = re.sub("\n{2,}", "\n\n", cleaned_message)
+                    # Username substitutions and mention removal need to be done
+                    # _after_ the HTML has been converted into markdown,
+                    # otherwise we get escape characters messing things up.
+                    cleaned_message = anonymizer.anonymize(cleaned_message)
 
-                    # Username substitutions need to be done _after_ the HTML has
-                    # been converted into markdown, otherwise we get escape
-                    # characters messing things up.
-                    for name, substitution in username_substitutions.items():
-                        cleaned_message = re.sub(rf"\b{re.escape(name)}\b",
-                                                 substitution, cleaned_message)
-                        
-                    # Now remove mentions and clean OOC as well if specified
+                    # Now clean OOC as well if specified
                     if not self.keep_ooc:
                         cleaned_message = _remove_ooc(cleaned_message)
-                    cleaned_message = _remove_mentions(cleaned_message)
+                    # There's sometimes weirdness where at the beginning, a
+                    # whitespace character can remain after removing mentions.
+                    cleaned_message = cleaned_message.strip()
                         
                     # NOTE(TG): See note in rp_forums_writing.py for explanation
                     # on why we don't have RP data be all model turns anymore.
@@ -179,35 +168,6 @@ class RpGuildWritingTask(BaseTask):
             )
 
 
-def _remove_mentions(message: str) -> str:
-    '''Removes username mentions from the message.'''
-    cleaned_message = message
-    removal_bounds: list[tuple[int, int]] = []
-    for match in re.finditer(MENTION_PATTERN, message):
-        end_char = message[match.end()-1]
-        # If the next character is a whitespace or punctuation,
-        # we can assume that removing the mention won't affect the message
-        # much in terms of coherency. We store the bounds in a tuple
-        # so we can take out all the mentions at once later.
-        if end_char in [" ", ".", "!", "?"]:
-            removal_bounds.append(match.span())
-        # Else, we leave it be.
-
-    # Clean the message now.
-    if len(removal_bounds) > 0:
-        # Set up an offset for adjusting the position of the next bounds
-        # after the mention is deleted.
-        offset = 0
-        for start, end in removal_bounds:
-            start -= offset
-            end -= offset
-            offset += end - start
-            cleaned_message = cleaned_message[:start] + cleaned_message[end:]
-
-    # There's sometimes weirdness where at the beginning, a whitespace character can remain.
-    # Impromptu patch that here.
-    return cleaned_message.strip()
-
 def _remove_ooc(message: str) -> str:
     return re.sub(OOC_PATTERN, "", message)
 
@@ -1,14 +1,11 @@
 import logging
 import re
 import typing as t
-import warnings
-
-import bs4
-from markdownify import MarkdownConverter
 
 from toolbox.core.models import Episode, Turn, TurnKind
 from toolbox.core.task import BaseTask
 from toolbox.datasets.sharegpt import ShareGptDataset
+from toolbox.utils.markdown import html_to_markdown
 from toolbox.utils.prompts import generate_prompts, select_prompt
 
 LOG = logging.getLogger(__name__)
@@ -17,10 +14,6 @@ LOG = logging.getLogger(__name__)
 class ShareGptInstructionFollowingTask(BaseTask):
     '''Generalized instruction following task(s) based on ChatGPT data.'''
 
-    def __init__(self) -> None:
-        self.markdown_converter = MarkdownConverter()
-        super().__init__()
-
     def __iter__(self) -> t.Generator[Episode, None, None]:
         for conversation in ShareGptDataset():
             # Start with a randomly chosen "assistant" system prompt.
@@ -83,18 +76,9 @@ class ShareGptInstructionFollowingTask(BaseTask):
         html = re.sub(DIV_REGEX, "", html)  # fixes indentation in code blocks
         html = re.sub(SPAN_REGEX, "", html)  # fixes underscores in code blocks
 
-        # Apparently the default BS4 parser has some bugs, so let's drop down
-        # a level and parse with html5lib and convert the soup instead.
-        #
-        # https://github.com/matthewwithanm/python-markdownify/issues/58#issuecomment-1275703664
-        with warnings.catch_warnings():
-            # BS4 loves throwing this out for perfectly valid data so let's
-            # silence it.
-            warnings.filterwarnings(
-                "ignore", "The input looks more like a filename than markup")
-            soup = bs4.BeautifulSoup(html, 'html5lib')
-
-        markdown = str(self.markdown_converter.convert_soup(soup))
+        # Apparently the default BS4 parser has some bugs, so this defaults to
+        # parsing with html5lib instead.
+        markdown = html_to_markdown(html, default_backend="html5lib")
 
         # Problem: code blocks get messed up when a language is specified. Looks
         # like this, for example:
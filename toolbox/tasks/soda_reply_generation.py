@@ -35,7 +35,7 @@ class SodaReplyGenerationTask(BaseTask):
                     # going.
                     continue
 
-                participants = list(set(conversation.speakers))
+                participants = list(dict.fromkeys(conversation.speakers))
 
                 # Original model experiments were very sensitive to participant
                 # order, so let's randomize to hopefully fix that.
@@ -12,7 +12,7 @@ LOG = logging.getLogger(__name__)
 class SodaSummarizationTask(BaseTask):
     '''Task to summarize a chat log. Based on SODA.'''
 
-    def __init__(self, split: str) -> None:
+    def __init__(self, split: str = "train") -> None:
         self.split = split
 
         super().__init__()
@@ -25,7 +25,7 @@ class SodaSummarizationTask(BaseTask):
                 history.append(f"{speaker_name}: {utterance}")
             history_str = "\n".join(history)
 
-            participants = list(set(conversation.speakers))
+            participants = list(dict.fromkeys(conversation.speakers))
             participants_str = " and ".join(
                 [", ".join(participants[:-1]), participants[-1]])
 
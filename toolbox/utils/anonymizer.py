@@ -0,0 +1,79 @@
+import functools
+import re
+
+from toolbox.filters.phrase_matcher import trie_pattern_for
+
+# Links get removed entirely, along with the whitespace character after them.
+LINK_PATTERN = r"https?:\/\/.+?(?:\s|$)"
+
+# Mentions (e.g.: `@SomeUser`) which are followed by whitespace, punctuation
+# that ends a sentence or the end of a line, since removing those doesn't
+# affect the rest of the message much. Anything else is left alone.
+MENTION_PATTERN = r"(?<!\w)[^\S\r\n]*@[^\W\s]+?(?=[ .!?]|$)"
+
+
+class Anonymizer:
+    '''
+    Replaces usernames (and other identifying strings) with placeholders, and
+    optionally removes mentions and links, all in a single pass over the text.
+
+    Everything gets compiled into one regular expression, with the names folded
+    into a trie (see `PhraseMatcher`), so the cost of anonymizing a message
+    doesn't grow with the amount of users in a thread. When several names
+    start at the same position, the longest one wins.
+    '''
+
+    def __init__(self,
+                 substitutions: dict[str, str],
+                 whole_words: bool = True,
+                 remove_mentions: bool = False,
+                 remove_links: bool = False) -> None:
+        '''
+        `substitutions` maps each name to what it should be replaced with.
+        With `whole_words`, names are only replaced when they're not part of a
+        larger word (like `\\b` in a regex).
+        '''
+        # An empty name would match everywhere.
+        self.substitutions = {k: v for k, v in substitutions.items() if k}
+
+        self._regex = _compiled_pattern_for(tuple(self.substitutions),
+                                            whole_words, remove_mentions,
+                                            remove_links)
+
+    def anonymize(self, text: str) -> str:
+        '''Returns `text` with all names substituted and mentions/links removed.'''
+        if self._regex is None:
+            return text
+        return self._regex.sub(self._replacement_for, text)
+
+    def _replacement_for(self, match: re.Match[str]) -> str:
+        if match.lastgroup == "name":
+            return self.substitutions[match.group("name")]
+        return ""
+
+
+#
+# Private helpers.
+#
+
+
+@functools.lru_cache(maxsize=256)
+def _compiled_pattern_for(names: tuple[str, ...], whole_words: bool,
+                          remove_mentions: bool,
+                          remove_links: bool) -> re.Pattern[str] | None:
+    # NOTE: Order matters here, since the first alternative that matches at a
+    # given position is the one that gets used.
+    alternatives: list[str] = []
+    if remove_links:
+        alternatives.append(f"(?P<link>{LINK_PATTERN})")
+    if remove_mentions:
+        alternatives.append(f"(?P<mention>{MENTION_PATTERN})")
+    if names:
+        name_pattern = f"(?P<name>{trie_pattern_for(names)})"
+        if whole_words:
+            name_pattern = rf"\b{name_pattern}\b"
+        alternatives.append(name_pattern)
+
+    if not alternatives:
+        return None
+    return re.compile("|".join(alternatives), flags=re.MULTILINE)
@@ -1,7 +1,7 @@
 import logging
 import os
 
-from toolbox.core.dataset import get_path_for
+from toolbox.core.dataset import get_path_for, shard_items
 
 LOG = logging.getLogger(__name__)
 
@@ -10,8 +10,14 @@ def enumerate_files_for(
     dataset_name: str,
     file_extension: str,
     subfolder: str | None = None,
+    shard_index: int = 0,
+    num_shards: int = 1,
 ) -> list[str]:
-    '''Returns a list of files available for the given dataset.'''
+    '''
+    Returns a sorted list of files available for the given dataset. If
+    `num_shards` is given, only the files belonging to `shard_index` are
+    returned.
+    '''
     dataset_path = get_path_for(dataset_name)
     final_path = dataset_path if subfolder is None else os.path.join(
         dataset_path, subfolder)
@@ -31,4 +37,8 @@ def enumerate_files_for(
         absolute_file_path = os.path.abspath(item_path)
         files.append(absolute_file_path)
 
-    return files
+    # `os.listdir` makes no guarantees about ordering, so we sort to make sure
+    # every machine agrees on which files belong to which shard.
+    files.sort()
+
+    return shard_items(files, shard_index=shard_index, num_shards=num_shards)
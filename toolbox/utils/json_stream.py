@@ -0,0 +1,164 @@
+import json
+import re
+import typing as t
+
+# How many characters to read from the file at once. Grows as needed for any
+# single JSON value larger than this.
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE_REGEX = re.compile(r"[ \t\n\r]*")
+_NUMBER_CHARS_REGEX = re.compile(r"[0-9.eE+-]*")
+
+
+class JsonStreamReader:
+    '''
+    Incrementally parses JSON from a file, so huge arrays/objects can be
+    processed one element at a time instead of loading the entire file into
+    memory first.
+
+    This is a pull-style parser: `iter_array` yields every element of an array,
+    while `iter_object` yields every key of an object and lets the caller
+    decide what to do with its value: read it whole with `read_value`, stream
+    it with `iter_array`/`iter_object`, or ignore it (in which case it gets
+    skipped over).
+    '''
+
+    def __init__(self,
+                 file: t.TextIO,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        self.file = file
+        self.chunk_size = chunk_size
+
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        # How many characters have been dropped from the start of the buffer,
+        # so we can tell where we are in the file as a whole.
+        self._dropped = 0
+        self._eof = False
+
+    def read_value(self) -> t.Any:
+        '''Reads and returns the next whole JSON value.'''
+        self._skip_whitespace()
+
+        read_size = self.chunk_size
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # Most likely the value is just cut off at the end of our
+                # buffer, so read some more and try again.
+                if self._eof:
+                    raise
+                self._fill(read_size)
+                read_size *= 2
+                continue
+
+            # Numbers can decode successfully even if they're cut off (e.g.:
+            # `12` out of `123`, or `1` out of `1.5`), so make sure there's
+            # something other than a number after the value.
+            value_end = end
+            if isinstance(value, (int, float)):
+                value_end = _NUMBER_CHARS_REGEX.match(self._buffer, end).end()  # type: ignore
+            if value_end == len(self._buffer) and not self._eof:
+                self._fill(read_size)
+                continue
+
+            self._pos = end
+            return value
+
+    def iter_array(self) -> t.Generator[t.Any, None, None]:
+        '''Yields every element of the JSON array at the current position.'''
+        self._consume("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+
+        while True:
+            yield self.read_value()
+
+            if self._peek() == ",":
+                self._pos += 1
+            else:
+                self._consume("]")
+                return
+
+    def iter_object(self) -> t.Generator[str, None, None]:
+        '''
+        Yields every key of the JSON object at the current position. The
+        corresponding value must be consumed before resuming iteration,
+        otherwise it's skipped over.
+        '''
+        self._consume("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+
+        while True:
+            key = self.read_value()
+            if not isinstance(key, str):
+                raise self._error("Expecting property name")
+            self._consume(":")
+
+            self._skip_whitespace()
+            value_start = self._tell()
+            yield key
+            if self._tell() == value_start:
+                self.read_value()
+
+            if self._peek() == ",":
+                self._pos += 1
+            else:
+                self._consume("}")
+                return
+
+    def _peek(self) -> str:
+        '''Returns the next non-whitespace character, or "" at EOF.'''
+        self._skip_whitespace()
+        return self._buffer[self._pos] if self._pos < len(self._buffer) else ""
+
+    def _consume(self, char: str) -> None:
+        if self._peek() != char:
+            raise self._error(f"Expecting '{char}'")
+        self._pos += 1
+
+    def _skip_whitespace(self) -> None:
+        while True:
+            self._pos = _WHITESPACE_REGEX.match(self._buffer, self._pos).end()  # type: ignore
+            if self._pos < len(self._buffer) or self._eof:
+                return
+            self._fill(self.chunk_size)
+
+    def _fill(self, size: int) -> None:
+        '''Reads more data into the buffer, dropping what's been consumed.'''
+        chunk = self.file.read(size)
+        if not chunk:
+            self._eof = True
+            return
+
+        self._dropped += self._pos
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+
+    def _tell(self) -> int:
+        return self._dropped + self._pos
+
+    def _error(self, message: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(message, self._buffer, self._pos)
+
+
+def iter_json_array(
+        file: t.TextIO,
+        chunk_size: int = DEFAULT_CHUNK_SIZE) -> t.Generator[t.Any, None, None]:
+    '''Yields every element of a file containing a JSON array.'''
+    yield from JsonStreamReader(file, chunk_size).iter_array()
+
+
+def iter_json_object(
+    file: t.TextIO,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> t.Generator[tuple[str, t.Any], None, None]:
+    '''Yields every key/value pair of a file containing a JSON object.'''
+    reader = JsonStreamReader(file, chunk_size)
+    for key in reader.iter_object():
+        yield key, reader.read_value()
@@ -0,0 +1,75 @@
+import functools
+import warnings
+
+import bs4
+from markdownify import MarkdownConverter
+
+# HTML parsers which can be used when converting HTML to Markdown, from slowest
+# (but most faithful to how browsers parse HTML) to fastest. `lxml` needs the
+# `lxml` package installed.
+HTML_BACKENDS = ["html5lib", "html.parser", "lxml"]
+
+# The backend every other one gets compared against. bs4's default parser has
+# some bugs that mess up the conversion, so this is what we originally
+# switched to:
+#
+# https://github.com/matthewwithanm/python-markdownify/issues/58#issuecomment-1275703664
+REFERENCE_BACKEND = "html5lib"
+
+# Overrides whichever backend callers ask for, when set.
+_backend_override: str | None = None
+
+
+def html_to_markdown(html: str, default_backend: str = REFERENCE_BACKEND) -> str:
+    '''
+    Converts the given HTML to Markdown. `default_backend` is the HTML parser
+    to use, unless a different one has been set with `set_html_backend`.
+    '''
+    backend = _backend_override or default_backend
+    _check_backend(backend)
+    with warnings.catch_warnings():
+        # BS4 loves throwing this out for perfectly valid data so let's
+        # silence it.
+        warnings.filterwarnings(
+            "ignore", "The input looks more like a filename than markup")
+        # NOTE: Parsed here rather than by markdownify, since older versions
+        # of it always use `html.parser` no matter what they're told.
+        soup = bs4.BeautifulSoup(html, backend)
+    return str(_converter().convert_soup(soup))
+
+
+def get_html_backend() -> str | None:
+    '''Returns the backend set with `set_html_backend`, if any.'''
+    return _backend_override
+
+
+def set_html_backend(backend: str | None) -> None:
+    '''
+    Makes all HTML to Markdown conversions go through the given backend, or
+    back to whichever one each caller asks for if None.
+    '''
+    if backend is not None:
+        # Fail early, instead of in the middle of a build.
+        _check_backend(backend)
+
+    global _backend_override
+    _backend_override = backend
+
+
+#
+# Private helpers.
+#
+
+
+@functools.cache
+def _converter() -> MarkdownConverter:
+    return MarkdownConverter()
+
+
+@functools.cache
+def _check_backend(backend: str) -> None:
+    assert backend in HTML_BACKENDS, f"Invalid HTML backend specified! Valid options: {', '.join(HTML_BACKENDS)}"
+
+    if bs4.builder.builder_registry.lookup(backend) is None:
+        raise ImportError(
+            f"The `{backend}` HTML backend requires the `{backend}` package")
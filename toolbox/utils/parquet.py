@@ -0,0 +1,27 @@
+import typing as t
+
+import pyarrow.parquet as pq
+
+# How many rows to decode at once. Memory usage is bounded by this (and by the
+# size of the file's row groups), rather than by the size of the whole file.
+DEFAULT_BATCH_SIZE = 4096
+
+
+def iter_parquet_rows(
+    path: str,
+    columns: list[str] | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> t.Generator[dict[str, t.Any], None, None]:
+    '''
+    Streams rows out of a Parquet file as dicts, one record batch at a time.
+    Only the given `columns` are read from disk, if specified.
+    '''
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=batch_size,
+                                           columns=columns):
+        # Converting whole columns to Python lists in one go is a lot faster
+        # than fetching values one by one.
+        data = batch.to_pydict()
+        names = list(data.keys())
+        for values in zip(*data.values()):
+            yield dict(zip(names, values))
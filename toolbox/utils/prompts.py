@@ -6,10 +6,83 @@ import typing as t
 VARIANT_REGEX = re.compile(r'%{(.+?)}')
 
 
+class PromptTemplate:
+    '''
+    A string with message variants in it, like "%{Hello|Hi} there%{.|!}",
+    which stands for every possible combination of them:
+
+    - Hello there.
+    - Hello there!
+    - Hi there.
+    - Hi there!
+
+    The variants themselves are never generated up-front. Instead, each
+    combination is identified by its index (like a number where each variant
+    block is a digit), so picking one uniformly at random only takes picking a
+    random index and building the string for it.
+    '''
+
+    def __init__(self, template: str) -> None:
+        self.template = template
+
+        # Literal text, alternating with the alternatives for each variant
+        # block: `[prefix, alternatives, text, alternatives, ..., suffix]`.
+        self._literals: list[str] = []
+        self._alternatives: list[list[str]] = []
+
+        last_end = 0
+        for match in VARIANT_REGEX.finditer(template):
+            self._literals.append(template[last_end:match.start()])
+            self._alternatives.append(
+                [x for x in match.groups()[0].split("|") if x.strip()])
+            last_end = match.end()
+        self._literals.append(template[last_end:])
+
+        self.variant_count = 1
+        for alternatives in self._alternatives:
+            self.variant_count *= len(alternatives)
+
+    def variant_at(self, index: int) -> str:
+        '''
+        Builds the variant at the given index. Variants are numbered in the
+        order they'd be listed in, with the last variant block changing the
+        fastest.
+        '''
+        if not 0 <= index < self.variant_count:
+            raise IndexError(
+                f"Variant index {index} out of range for {self.variant_count} variants"
+            )
+
+        # Unrank the index into a choice for each variant block, starting from
+        # the last (least significant) one.
+        choices: list[str] = []
+        for alternatives in reversed(self._alternatives):
+            index, choice_idx = divmod(index, len(alternatives))
+            choices.append(alternatives[choice_idx])
+        choices.reverse()
+
+        parts = [self._literals[0]]
+        for choice, literal in zip(choices, self._literals[1:]):
+            parts.append(choice)
+            parts.append(literal)
+        return "".join(parts)
+
+    def sample(self, rng: random.Random | None = None) -> str:
+        '''Returns a uniformly random variant.'''
+        index = (rng or random).randrange(self.variant_count)
+        return self.variant_at(index)
+
+    def __iter__(self) -> t.Generator[str, None, None]:
+        for index in range(self.variant_count):
+            yield self.variant_at(index)
+
+    def __len__(self) -> int:
+        return self.variant_count
+
+
 def generate_variants_for(
         string: str,
-        max_generations: int | None = 256,
-        start_counter_at: int = 0) -> t.Generator[str, None, None]:
+        max_generations: int | None = 256) -> t.Generator[str, None, None]:
     '''
     Given a string like "%{Hello|Hi} there%{.|!}, this should yield:
 
@@ -17,71 +90,30 @@ def generate_variants_for(
     - Hello there!
     - Hi there.
     - Hi there!
+
+    Stops after `max_generations` variants, if given. Prefer `PromptTemplate`
+    for picking random variants, since it doesn't need to go through all of
+    them.
     '''
+    for index, variant in enumerate(PromptTemplate(string)):
+        if max_generations is not None and index >= max_generations:
+            break
+        yield variant
 
-    # Some bot creators went wild with the variants, which causes ridiculous
-    # generations if we try to exhaust all possibilities so we cap that here.
-    # `start_counter_at` is used for keeping track across recursive calls.
-    counter = start_counter_at
-
-    if (match := re.search(VARIANT_REGEX, string)) is not None:
-        # Once we have a "%{X|Y|Z}" matched inside the original string, we:
-        # - Fetch .groups()[0] (which will give us `X|Y|Z`)
-        # - Split by `|` (so we have ["X", "Y", "Z"])
-        # - Filter out empty strings
-        alternatives = filter(lambda x: x.strip(), match.groups()[0].split("|"))
-
-        # Then, we break the string apart into what comes before and after the
-        # alternatives, that way we can re-build with "prefix + choice + sufix".
-        prefix = string[:match.start()]
-        sufix = string[match.end():]
-
-        for alternative in alternatives:
-            variant = f'{prefix}{alternative}{sufix}'
-
-            # However, some strings have multiple variant blocks. In that case,
-            # we operate on them recursively until we have just regular strings
-            # after generating all possible variants.
-            still_have_match = re.search(VARIANT_REGEX, variant) is not None
-            if still_have_match:
-                for inner_variant in generate_variants_for(
-                        variant, start_counter_at=counter):
-                    yield inner_variant
-
-                    # Keep track and break after `max_generations`.
-                    counter += 1
-                    if max_generations is not None and counter >= max_generations:
-                        break
-            else:
-                yield variant
-
-                # Keep track and break after `max_generations`.
-                counter += 1
-                if max_generations is not None and counter >= max_generations:
-                    break
-    else:
-        yield string
-
-
-def generate_prompts(system_prompts: list[str]) -> list[str]:
+
+def generate_prompts(system_prompts: list[str]) -> list[PromptTemplate]:
     '''
-    Given a list of base system prompts,
-    this function generates a list of variants on these prompts using generate_variants_for
+    Given a list of base system prompts, compiles each of them into a
+    `PromptTemplate` so `select_prompt` can pick variants from them.
     '''
     # NOTE(TG): If we don't choose a singular base prompt *before* generating variants,
     # certain base prompts can have a lot more appearances in the final list to choose from
     # due to the amount of variants.
-    unflattened_list = [list(generate_variants_for(x)) for x in system_prompts]
-
-    # flattened_list: list[str] = []
-    # for l in unflattened_list:
-    #     flattened_list += l
-
-    return unflattened_list
+    return [PromptTemplate(x) for x in system_prompts]
 
-def select_prompt(system_prompts: list[list[str]]) -> str:
+def select_prompt(system_prompts: list[PromptTemplate]) -> str:
     '''
     Selects a random system prompt which takes into account
     that certain base system prompts have more variations than others
     '''
-    return random.choice(random.choice(system_prompts))
+    return random.choice(system_prompts).sample()
@@ -0,0 +1,31 @@
+import importlib
+import typing as t
+
+_T = t.TypeVar("_T")
+
+
+class LazyRegistry(t.Mapping[str, _T]):
+    '''
+    Maps names to classes (or anything else) defined in other modules, only
+    importing a module once something defined in it is actually looked up.
+
+    Lots of our modules pull in heavy dependencies at import time, so this
+    keeps e.g. building a single task from having to import all of them.
+    '''
+
+    def __init__(self, name_to_module: dict[str, str]) -> None:
+        self._name_to_module = name_to_module
+
+    def __getitem__(self, name: str) -> _T:
+        module = importlib.import_module(self._name_to_module[name])
+        return t.cast(_T, getattr(module, name))
+
+    def __iter__(self) -> t.Iterator[str]:
+        return iter(self._name_to_module)
+
+    def __len__(self) -> int:
+        return len(self._name_to_module)
+
+    def __contains__(self, name: object) -> bool:
+        # Overridden so membership checks don't import anything.
+        return name in self._name_to_module
@@ -0,0 +1,143 @@
+import collections
+import contextlib
+import functools
+import re
+import time
+import typing as t
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Replace:
+    '''Replaces every occurrence of a plain substring.'''
+    name: str
+    old: str
+    new: str
+
+
+@dataclass(frozen=True)
+class Substitute:
+    '''
+    Replaces every match of a regex. If `trigger` is given, the regex only
+    runs on text which contains it, which is much cheaper to check for.
+    '''
+    name: str
+    pattern: str
+    replacement: str
+    trigger: str | None = None
+    flags: int = 0
+
+
+@dataclass(frozen=True)
+class Transform:
+    '''Runs an arbitrary function over the text.'''
+    name: str
+    function: t.Callable[[str], str]
+
+
+@dataclass(frozen=True)
+class Fused:
+    '''
+    Applies several `Replace` and `Substitute` rules in a single pass over the
+    text. `pattern` finds every stretch of text the rules could change, and
+    each stretch gets replaced with whatever applying all of the rules to it
+    in order results in. That's looked up in a table, which fills up as new
+    stretches come up, so the rules themselves rarely run at all.
+
+    Only valid if every possible match of every rule (even after the ones
+    before it have been applied) falls within a single stretch, and the rules
+    never change anything outside of it. The character right before and after
+    a stretch get taken into account, so rules can still look at those, e.g.
+    with `\b`.
+    '''
+    name: str
+    pattern: str
+    rules: list[Replace | Substitute]
+
+
+Rule = Replace | Substitute | Transform | Fused
+
+# How many distinct stretches each `Fused` rule remembers the result for.
+FUSED_CACHE_SIZE = 65536
+
+
+class CleaningPipeline:
+    '''
+    A list of text cleaning rules, compiled once and then applied in order.
+
+    Keeps track of how long each rule takes while inside `profile()`, which is
+    useful for finding out which ones are worth optimizing.
+    '''
+
+    def __init__(self, rules: list[Rule]) -> None:
+        self.rules = rules
+        self._steps = [(rule.name, _compile(rule)) for rule in rules]
+        self._timings: collections.Counter[str] | None = None
+
+    def __call__(self, text: str) -> str:
+        if self._timings is None:
+            for _, step in self._steps:
+                text = step(text)
+            return text
+
+        for name, step in self._steps:
+            start = time.perf_counter()
+            text = step(text)
+            self._timings[name] += time.perf_counter() - start
+        return text
+
+    @contextlib.contextmanager
+    def profile(self) -> t.Generator[collections.Counter[str], None, None]:
+        '''
+        Records how many seconds were spent on each rule (by name) while
+        inside this context.
+        '''
+        self._timings = collections.Counter()
+        try:
+            yield self._timings
+        finally:
+            self._timings = None
+
+
+#
+# Private helpers.
+#
+
+
+def _compile(rule: Rule) -> t.Callable[[str], str]:
+    if isinstance(rule, Replace):
+        old, new = rule.old, rule.new
+        return lambda text: text.replace(old, new)
+
+    if isinstance(rule, Substitute):
+        regex = re.compile(rule.pattern, flags=rule.flags)
+        replacement, trigger = rule.replacement, rule.trigger
+        if trigger is None:
+            return lambda text: regex.sub(replacement, text)
+        return lambda text: regex.sub(replacement, text) \
+            if trigger in text else text
+
+    if isinstance(rule, Transform):
+        return rule.function
+
+    if isinstance(rule, Fused):
+        regex = re.compile(rule.pattern)
+        steps = [_compile(x) for x in rule.rules]
+
+        @functools.lru_cache(maxsize=FUSED_CACHE_SIZE)
+        def clean(before: str, stretch: str, after: str) -> str:
+            text = before + stretch + after
+            for step in steps:
+                text = step(text)
+            assert text.startswith(before) and text.endswith(after), \
+                f"{rule.name} changed text outside of {stretch!r}"
+            return text[len(before):len(text) - len(after)]
+
+        def replacement_for(match: re.Match[str]) -> str:
+            start, end = match.span()
+            return clean(match.string[start - 1:start], match.group(),
+                         match.string[end:end + 1])
+
+        return lambda text: regex.sub(replacement_for, text)
+
+    raise TypeError(f"Unknown cleaning rule: {rule!r}")
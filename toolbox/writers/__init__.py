@@ -0,0 +1,73 @@
+from toolbox.core.token_counter import build_token_counter
+from toolbox.writers.example_writer import ExampleWriter
+from toolbox.writers.jsonl_writer import JsonlWriter
+from toolbox.writers.packing_writer import (
+    DEFAULT_WINDOW as DEFAULT_PACK_WINDOW,
+    PackingWriter
+)
+from toolbox.writers.shuffling_writer import (
+    DEFAULT_MEMORY_BYTES as DEFAULT_SHUFFLE_MEMORY_BYTES,
+    ShufflingWriter
+)
+
+OUTPUT_FORMATS = ["jsonl", "parquet", "arrow"]
+
+
+def build_writer_for(
+    output_format: str,
+    path: str,
+    serializer: str = "json",
+    max_shard_bytes: int | None = None,
+    shuffle_seed: int | None = None,
+    shuffle_memory_bytes: int = DEFAULT_SHUFFLE_MEMORY_BYTES,
+    shuffle_tmp_dir: str | None = None,
+    pack_max_tokens: int | None = None,
+    pack_tokenizer: str = "estimate",
+    pack_window: int = DEFAULT_PACK_WINDOW,
+    episode_records: bool = False,
+) -> ExampleWriter:
+    '''
+    Builds the writer for the given output format, for records that are
+    either training examples or, if `episode_records` is set, episode records
+    (see `EpisodeRecord`). If `shuffle_seed` is given,
+    records get shuffled before being written (see `ShufflingWriter`), and if
+    `pack_max_tokens` is given, they get packed together first (see
+    `PackingWriter`).
+    '''
+    assert output_format in OUTPUT_FORMATS, f"Invalid output format specified! Valid options: {', '.join(OUTPUT_FORMATS)}"
+
+    writer: ExampleWriter
+    if output_format == "jsonl":
+        writer = JsonlWriter(path,
+                             serializer=serializer,
+                             max_shard_bytes=max_shard_bytes)
+    else:
+        # Imported here so JSONL builds don't pay for loading pyarrow.
+        from toolbox.writers.arrow_writer import (
+            EPISODE_RECORD_SCHEMA,
+            PACKED_RECORD_SCHEMA,
+            TRAINING_EXAMPLE_SCHEMA,
+            ArrowWriter
+        )
+        if pack_max_tokens is not None:
+            schema = PACKED_RECORD_SCHEMA
+        elif episode_records:
+            schema = EPISODE_RECORD_SCHEMA
+        else:
+            schema = TRAINING_EXAMPLE_SCHEMA
+        writer = ArrowWriter(path,
+                             format=output_format,
+                             schema=schema,
+                             max_shard_bytes=max_shard_bytes)
+
+    if shuffle_seed is not None:
+        writer = ShufflingWriter(writer,
+                                 seed=shuffle_seed,
+                                 memory_bytes=shuffle_memory_bytes,
+                                 tmp_dir=shuffle_tmp_dir)
+    if pack_max_tokens is not None:
+        writer = PackingWriter(writer,
+                               token_counter=build_token_counter(pack_tokenizer),
+                               max_tokens=pack_max_tokens,
+                               window=pack_window)
+    return writer
@@ -0,0 +1,131 @@
+import logging
+import typing as t
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from toolbox.writers.example_writer import ExampleWriter
+from toolbox.writers.jsonl_writer import shard_path_for
+
+LOG = logging.getLogger(__name__)
+
+ARROW_FORMATS = ["parquet", "arrow"]
+
+# Rows buffered before being flushed out as a single row group (for Parquet) or
+# record batch (for Arrow IPC). This is what bounds our memory usage.
+DEFAULT_ROWS_PER_GROUP = 8192
+
+# What each kind of record build_data.py writes looks like. Spelled out rather
+# than inferred, since a batch where e.g. every list happens to be empty would
+# otherwise end up with columns of nulls that nothing else fits into.
+TRAINING_EXAMPLE_SCHEMA = pa.schema([
+    ("prompt", pa.string()),
+    ("generation", pa.string()),
+    ("identifier", pa.string()),
+])
+
+# See `EpisodeRecord`.
+EPISODE_RECORD_SCHEMA = pa.schema([
+    ("text", pa.string()),
+    ("spans", pa.list_(pa.list_(pa.int64(), 2))),
+    ("identifier", pa.string()),
+])
+
+# See `PackingWriter`.
+PACKED_RECORD_SCHEMA = pa.schema([
+    ("text", pa.string()),
+    ("boundaries", pa.list_(pa.list_(pa.int64(), 2))),
+    ("spans", pa.list_(pa.list_(pa.int64(), 2))),
+    ("identifiers", pa.list_(pa.string())),
+])
+
+
+class ArrowWriter(ExampleWriter):
+    '''
+    Writes records out column-wise, either as Parquet or as an Arrow IPC file.
+    The latter is uncompressed on purpose, so readers can memory-map it with
+    `pyarrow.memory_map` and access the columns without copying.
+
+    Every record must fit `schema`. If `max_shard_bytes` is given, output rolls
+    over into a new file (named like `out-00001.parquet`) once the current one
+    holds that many bytes of Arrow data.
+    '''
+
+    def __init__(
+        self,
+        path: str,
+        format: str = "parquet",
+        schema: pa.Schema = TRAINING_EXAMPLE_SCHEMA,
+        max_shard_bytes: int | None = None,
+        rows_per_group: int = DEFAULT_ROWS_PER_GROUP,
+    ) -> None:
+        assert format in ARROW_FORMATS, f"Invalid format specified! Valid options: {', '.join(ARROW_FORMATS)}"
+
+        self.path = path
+        self.format = format
+        self.schema = schema
+        self.max_shard_bytes = max_shard_bytes
+        self.rows_per_group = rows_per_group
+
+        self.paths_written: list[str] = []
+
+        self._writer: pq.ParquetWriter | pa.ipc.RecordBatchFileWriter | None = None
+        self._shard_bytes = 0
+        self._pending: list[dict[str, t.Any]] = []
+
+    def write(self, record: dict[str, t.Any]) -> None:
+        self._pending.append(record)
+        if len(self._pending) >= self.rows_per_group:
+            self._flush()
+
+    def close(self) -> None:
+        if not self.paths_written and not self._pending:
+            # Nothing got written, but an empty output is still an output.
+            self._open_next_shard()
+
+        self._flush()
+        self._close_current_shard()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+
+        batch = pa.RecordBatch.from_pylist(self._pending, schema=self.schema)
+        self._pending = []
+
+        if self._writer is None:
+            self._open_next_shard()
+        elif self.max_shard_bytes is not None \
+                and self._shard_bytes + batch.nbytes > self.max_shard_bytes:
+            self._close_current_shard()
+            self._open_next_shard()
+
+        assert self._writer is not None
+        if isinstance(self._writer, pq.ParquetWriter):
+            self._writer.write_batch(batch, row_group_size=batch.num_rows)
+        else:
+            self._writer.write_batch(batch)
+        self._shard_bytes += batch.nbytes
+        self.bytes_written += batch.nbytes
+
+    def _open_next_shard(self) -> None:
+        if self.max_shard_bytes is None:
+            path = self.path
+        else:
+            path = shard_path_for(self.path, len(self.paths_written))
+
+        LOG.debug("Writing to %s", path)
+        if self.format == "parquet":
+            self._writer = pq.ParquetWriter(path,
+                                            self.schema,
+                                            compression="zstd")
+        else:
+            self._writer = pa.ipc.new_file(path, self.schema)
+
+        self._shard_bytes = 0
+        self.paths_written.append(path)
+
+    def _close_current_shard(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
@@ -0,0 +1,46 @@
+import typing as t
+from abc import ABC, abstractmethod
+
+
+class ExampleWriter(ABC):
+    '''Writer implementations should inherit from this base class.'''
+
+    # How many bytes of records (as serialized by the writer, before any
+    # compression) have been written so far. Used for progress reporting.
+    bytes_written: int = 0
+
+    # Whether `checkpoint` and `restore` are implemented.
+    supports_checkpoints: bool = False
+
+    def __enter__(self) -> "ExampleWriter":
+        return self
+
+    def __exit__(self, *_args: t.Any) -> None:
+        self.close()
+
+    @abstractmethod
+    def write(self, record: dict[str, t.Any]) -> None:
+        '''Writes out a single record (usually a serialized training example).'''
+        raise NotImplementedError
+
+    @abstractmethod
+    def close(self) -> None:
+        '''Flushes any pending records and closes all underlying files.'''
+        raise NotImplementedError
+
+    def checkpoint(self) -> dict[str, t.Any]:
+        '''
+        Makes sure every record written so far is safely on disk, and returns
+        the writer's position in the output, which `restore` can later go
+        back to. Must be JSON serializable.
+        '''
+        raise NotImplementedError(
+            f"{type(self).__name__} doesn't support checkpoints")
+
+    def restore(self, position: dict[str, t.Any]) -> None:
+        '''
+        Goes back to a position returned by `checkpoint`, throwing away
+        anything written after it. Must be called before writing anything.
+        '''
+        raise NotImplementedError(
+            f"{type(self).__name__} doesn't support checkpoints")
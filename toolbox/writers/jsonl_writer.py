@@ -0,0 +1,249 @@
+import gzip
+import json
+import logging
+import os
+import typing as t
+
+from toolbox.writers.example_writer import ExampleWriter
+
+LOG = logging.getLogger(__name__)
+
+# How many bytes of serialized records we hold in memory before handing them
+# over to the (possibly compressed) file in a single write.
+DEFAULT_BATCH_BYTES = 1024 * 1024
+
+COMPRESSED_EXTENSIONS = {
+    ".gz": "gzip",
+    ".zst": "zstd",
+    ".zstd": "zstd",
+}
+
+Serializer = t.Callable[[dict[str, t.Any]], bytes]
+
+
+class JsonlWriter(ExampleWriter):
+    '''
+    Writes records out as JSON lines, optionally compressed (picked according
+    to the file extension: `.gz` or `.zst`) and optionally split up into
+    several shards of at most `max_shard_bytes` uncompressed bytes each, named
+    after the given path (e.g.: `out.jsonl.zst` becomes `out-00000.jsonl.zst`,
+    `out-00001.jsonl.zst`, ...).
+
+    Supports checkpoints: compressed output gets split into separate gzip
+    members or zstd frames at each one, which decompress as a single stream,
+    so the file can be cut off right after any of them.
+    '''
+
+    supports_checkpoints = True
+
+    def __init__(
+        self,
+        path: str,
+        serializer: str = "json",
+        max_shard_bytes: int | None = None,
+        batch_bytes: int = DEFAULT_BATCH_BYTES,
+    ) -> None:
+        self.path = path
+        self.serialize = json_serializer_for(serializer)
+        self.max_shard_bytes = max_shard_bytes
+        self.batch_bytes = batch_bytes
+
+        self.paths_written: list[str] = []
+
+        self._file: t.BinaryIO | None = None
+        self._raw_file: t.BinaryIO | None = None
+        self._shard_bytes = 0
+        self._pending: list[bytes] = []
+        self._pending_bytes = 0
+
+    def write(self, record: dict[str, t.Any]) -> None:
+        line = self.serialize(record)
+
+        if self._file is None:
+            self._open_next_shard()
+        elif self.max_shard_bytes is not None and self._shard_bytes > 0 \
+                and self._shard_bytes + len(line) > self.max_shard_bytes:
+            # Rolling over is done on record boundaries, so a record larger
+            # than the cap still gets a shard of its own rather than being
+            # split up.
+            self._flush()
+            self._close_current_shard()
+            self._open_next_shard()
+
+        self._pending.append(line)
+        self._pending_bytes += len(line)
+        self._shard_bytes += len(line)
+        self.bytes_written += len(line)
+
+        if self._pending_bytes >= self.batch_bytes:
+            self._flush()
+
+    def close(self) -> None:
+        if not self.paths_written:
+            # Nothing got written, but an empty output is still an output.
+            self._open_next_shard()
+
+        self._flush()
+        self._close_current_shard()
+
+    def checkpoint(self) -> dict[str, t.Any]:
+        self._flush()
+
+        if self._file is None:
+            return {
+                "shard_count": len(self.paths_written),
+                "offset": 0,
+                "shard_bytes": 0,
+                "bytes_written": self.bytes_written,
+            }
+
+        raw_file = t.cast(t.BinaryIO, self._raw_file)
+        compressed = self._file is not raw_file
+        if compressed:
+            # Ends the current gzip member/zstd frame. Doesn't close the file
+            # it wraps.
+            self._file.close()
+        raw_file.flush()
+        os.fsync(raw_file.fileno())
+        offset = raw_file.tell()
+        if compressed:
+            # Taken after the offset, since gzip writes out the new member's
+            # header right away.
+            self._file = _compressed_stream_for(self.paths_written[-1],
+                                                raw_file)
+
+        return {
+            "shard_count": len(self.paths_written),
+            "offset": offset,
+            "shard_bytes": self._shard_bytes,
+            "bytes_written": self.bytes_written,
+        }
+
+    def restore(self, position: dict[str, t.Any]) -> None:
+        assert self._file is None, "Can't restore after writing"
+
+        shard_count = position["shard_count"]
+        self._remove_shards_from(shard_count)
+        self.bytes_written = position["bytes_written"]
+        if shard_count == 0:
+            return
+
+        self.paths_written = [
+            self._path_for_shard(idx) for idx in range(shard_count)
+        ]
+        path = self.paths_written[-1]
+        self._raw_file = open(path, "r+b")
+        self._raw_file.truncate(position["offset"])
+        self._raw_file.seek(0, os.SEEK_END)
+        self._file = _compressed_stream_for(path, self._raw_file)
+        self._shard_bytes = position["shard_bytes"]
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+
+        assert self._file is not None
+        self._file.write(b"".join(self._pending))
+        self._pending = []
+        self._pending_bytes = 0
+
+    def _path_for_shard(self, shard_idx: int) -> str:
+        if self.max_shard_bytes is None:
+            return self.path
+        return shard_path_for(self.path, shard_idx)
+
+    def _remove_shards_from(self, shard_idx: int) -> None:
+        '''Removes the given shard and every one after it, if they exist.'''
+        if self.max_shard_bytes is None:
+            if shard_idx == 0 and os.path.exists(self.path):
+                os.remove(self.path)
+            return
+
+        while os.path.exists(path := shard_path_for(self.path, shard_idx)):
+            os.remove(path)
+            shard_idx += 1
+
+    def _open_next_shard(self) -> None:
+        path = self._path_for_shard(len(self.paths_written))
+
+        LOG.debug("Writing to %s", path)
+        self._raw_file = open(path, "wb")
+        self._file = _compressed_stream_for(path, self._raw_file)
+        self._shard_bytes = 0
+        self.paths_written.append(path)
+
+    def _close_current_shard(self) -> None:
+        if self._file is not None:
+            # Compressed streams don't necessarily close the file they wrap.
+            self._file.close()
+            t.cast(t.BinaryIO, self._raw_file).close()
+            self._file = None
+            self._raw_file = None
+
+
+def json_serializer_for(name: str) -> Serializer:
+    '''
+    Returns a function which serializes a record into a single JSON line.
+    `orjson` is a lot faster than the standard library, but it's opt-in: the
+    two don't produce the exact same bytes (the standard library escapes
+    non-ASCII characters and adds spaces after separators), and output
+    shouldn't depend on what happens to be installed.
+    '''
+    if name == "orjson":
+        import orjson
+
+        def _orjson_serializer(record: dict[str, t.Any]) -> bytes:
+            return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+
+        return _orjson_serializer
+
+    if name == "json":
+
+        def _json_serializer(record: dict[str, t.Any]) -> bytes:
+            return (json.dumps(record) + "\n").encode("utf-8")
+
+        return _json_serializer
+
+    raise ValueError(f"Unknown serializer: {name}")
+
+
+def shard_path_for(path: str, shard_idx: int) -> str:
+    '''
+    Inserts a shard number in between the file's name and its extension(s),
+    e.g.: `data/out.jsonl.zst` -> `data/out-00003.jsonl.zst`.
+    '''
+    directory, filename = os.path.split(path)
+    stem, dot, extensions = filename.partition(".")
+    return os.path.join(directory, f"{stem}-{shard_idx:05d}{dot}{extensions}")
+
+
+def compression_for(path: str) -> str | None:
+    '''Figures out which compression to use from the file's extension.'''
+    for extension, compression in COMPRESSED_EXTENSIONS.items():
+        if path.endswith(extension):
+            return compression
+    return None
+
+
+def _compressed_stream_for(path: str, raw_file: t.BinaryIO) -> t.BinaryIO:
+    '''Wraps `raw_file` in whichever compression `path` asks for, if any.'''
+    compression = compression_for(path)
+
+    if compression == "gzip":
+        # Zeroing out the timestamp (and leaving out the file name) keeps the
+        # output reproducible.
+        return t.cast(
+            t.BinaryIO,
+            gzip.GzipFile(filename="", mode="wb", fileobj=raw_file, mtime=0))
+    elif compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as ex:
+            raise ImportError(
+                "Writing .zst files requires the `zstandard` package") from ex
+
+        return t.cast(
+            t.BinaryIO,
+            zstandard.ZstdCompressor().stream_writer(raw_file, closefd=False))
+
+    return raw_file
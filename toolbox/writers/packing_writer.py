@@ -0,0 +1,170 @@
+import bisect
+import logging
+import typing as t
+from dataclasses import dataclass, field
+
+from toolbox.core.token_counter import TokenCounter
+from toolbox.writers.example_writer import ExampleWriter
+
+LOG = logging.getLogger(__name__)
+
+# How many examples get packed at once.
+DEFAULT_WINDOW = 1000
+
+
+class PackingWriter(ExampleWriter):
+    '''
+    Packs short examples together into records of up to `max_tokens` tokens
+    each before handing them over to another writer, so trainers don't waste
+    most of every sequence on padding. Each packed record looks like:
+
+        {"text": "...", "boundaries": [[start, end], ...],
+         "spans": [[start, end], ...], "identifiers": [...]}
+
+    where `text` is every example's text (its prompt followed by its
+    generation, or an episode record's text) back to back, `boundaries` are
+    the character offsets of each example within it and `spans` those of
+    every generation to train on, same as with `EpisodeRecord`. Offsets are
+    in characters rather than tokens so they don't depend on how the trainer
+    tokenizes things: tokenizing each example on its own (adding whatever
+    special tokens it needs around it) gives it exactly the tokens to keep
+    from attending to the other examples'.
+
+    How many tokens each example takes up is counted with `token_counter`
+    over its text, so with an estimating counter packed records are only
+    roughly `max_tokens` long, and special tokens added by the trainer aren't
+    accounted for.
+
+    Examples get buffered up `window` at a time and packed best-fit
+    decreasing: largest first, each into whichever record it leaves the least
+    room in. Best-fit never leaves more than one record under half full, and
+    that one's examples get carried over into the next window instead of being
+    written out. Examples over `max_tokens` get a record to themselves.
+    '''
+
+    def __init__(self,
+                 writer: ExampleWriter,
+                 token_counter: TokenCounter,
+                 max_tokens: int,
+                 window: int = DEFAULT_WINDOW) -> None:
+        self.writer = writer
+        self.token_counter = token_counter
+        self.max_tokens = max_tokens
+        self.window = window
+
+        self._pending: list[tuple[int, dict[str, t.Any]]] = []
+        self._examples_packed = 0
+        self._tokens_packed = 0
+        self._records_written = 0
+
+    def write(self, record: dict[str, t.Any]) -> None:
+        tokens = self.token_counter.count_batch([_text_for(record)])[0]
+        self._pending.append((tokens, record))
+        if len(self._pending) >= self.window:
+            self._pack(final=False)
+
+    def close(self) -> None:
+        try:
+            self._pack(final=True)
+        finally:
+            self.writer.close()
+        self.bytes_written = self.writer.bytes_written
+
+        if self._records_written:
+            LOG.info(
+                "Packed %s examples into %s records, filling %.1f%% of their %s tokens",
+                self._examples_packed, self._records_written,
+                100 * self._tokens_packed /
+                (self._records_written * self.max_tokens), self.max_tokens)
+
+    def _pack(self, final: bool) -> None:
+        # Stable, so examples of the same size stay in the order they came in.
+        items = sorted(self._pending, key=lambda item: -item[0])
+        self._pending = []
+
+        bins: list[_Bin] = []
+        # Room left in each bin, as `(free_tokens, bin_idx)`, kept sorted so
+        # the best fit is a binary search away.
+        free: list[tuple[int, int]] = []
+        for tokens, record in items:
+            pos = bisect.bisect_left(free, (tokens, -1))
+            if pos < len(free):
+                _, bin_idx = free.pop(pos)
+            else:
+                bin_idx = len(bins)
+                bins.append(_Bin())
+            packed_bin = bins[bin_idx]
+            packed_bin.add(tokens, record)
+            bisect.insort(free,
+                          (self.max_tokens - packed_bin.tokens, bin_idx))
+
+        if not final and bins and free[-1][0] > self.max_tokens // 2 \
+                and len(bins[free[-1][1]].records) < self.window // 2:
+            # Might still fill up with whatever comes in next. Only if it
+            # leaves room for plenty of new examples in the window, though.
+            _, bin_idx = free[-1]
+            self._pending = list(
+                zip(bins[bin_idx].token_counts, bins[bin_idx].records))
+            del bins[bin_idx]
+
+        for packed_bin in bins:
+            self._write_bin(packed_bin)
+
+    def _write_bin(self, packed_bin: "_Bin") -> None:
+        texts: list[str] = []
+        boundaries: list[list[int]] = []
+        spans: list[list[int]] = []
+        offset = 0
+        for record in packed_bin.records:
+            text = _text_for(record)
+            texts.append(text)
+            boundaries.append([offset, offset + len(text)])
+            for start, end in _spans_for(record):
+                spans.append([offset + start, offset + end])
+            offset += len(text)
+
+        self.writer.write({
+            "text": "".join(texts),
+            "boundaries": boundaries,
+            "spans": spans,
+            "identifiers": [
+                record["identifier"] for record in packed_bin.records
+            ],
+        })
+        self.bytes_written = self.writer.bytes_written
+
+        self._examples_packed += len(packed_bin.records)
+        self._tokens_packed += packed_bin.tokens
+        self._records_written += 1
+
+
+#
+# Private helpers.
+#
+
+
+def _text_for(record: dict[str, t.Any]) -> str:
+    # Episode records (see `EpisodeRecord`) are already a single text.
+    if "text" in record:
+        return t.cast(str, record["text"])
+    return t.cast(str, record["prompt"] + record["generation"])
+
+
+def _spans_for(record: dict[str, t.Any]) -> list[tuple[int, int]]:
+    '''Character offsets of what gets trained on, within `_text_for`.'''
+    if "text" in record:
+        return [(start, end) for start, end in record["spans"]]
+    prompt_len = len(record["prompt"])
+    return [(prompt_len, prompt_len + len(record["generation"]))]
+
+
+@dataclass
+class _Bin:
+    records: list[dict[str, t.Any]] = field(default_factory=list)
+    token_counts: list[int] = field(default_factory=list)
+    tokens: int = 0
+
+    def add(self, tokens: int, record: dict[str, t.Any]) -> None:
+        self.records.append(record)
+        self.token_counts.append(tokens)
+        self.tokens += tokens
@@ -0,0 +1,161 @@
+import logging
+import math
+import os
+import pickle
+import random
+import shutil
+import struct
+import tempfile
+import typing as t
+from dataclasses import dataclass
+
+from toolbox.writers.example_writer import ExampleWriter
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_BYTES = 1024**3
+
+# How many temporary files records get scattered across. Output up to this many
+# times the memory limit gets shuffled in two passes.
+DEFAULT_BUCKET_COUNT = 256
+
+# Records are stored in buckets as their sort key and pickled size, followed by
+# the pickle itself, so buckets can be sorted without unpickling anything.
+_RECORD_HEADER = struct.Struct("<QQ")
+
+_KEY_SPACE = 2**64
+
+
+class ShufflingWriter(ExampleWriter):
+    '''
+    Shuffles records before handing them over to another writer, without
+    holding more than (roughly) `memory_bytes` worth of them in memory.
+
+    Every record gets a random 64-bit key as it comes in, and goes into one of
+    `bucket_count` temporary files depending on which range its key falls in.
+    Once closed, each of those gets read back, sorted by key in memory and
+    written out in turn. Buckets larger than `memory_bytes` get split up by
+    key again first, so output far larger than memory only needs an extra pass
+    over those. Either way, records come out in order of their keys, so the
+    order only depends on `seed` and the order records were written in.
+
+    Temporary files go into a folder within `tmp_dir` (the system's default if
+    not given), which is removed once done.
+    '''
+
+    def __init__(self,
+                 writer: ExampleWriter,
+                 seed: int,
+                 memory_bytes: int = DEFAULT_MEMORY_BYTES,
+                 tmp_dir: str | None = None,
+                 bucket_count: int = DEFAULT_BUCKET_COUNT) -> None:
+        self.writer = writer
+        self.memory_bytes = memory_bytes
+        self.bucket_count = bucket_count
+
+        self._rng = random.Random(f"{seed}-shuffle")
+        self._tmp_dir = tempfile.mkdtemp(prefix="shuffle-", dir=tmp_dir)
+        self._buckets = _Buckets(self._tmp_dir,
+                                 name="bucket",
+                                 count=bucket_count,
+                                 key_range=(0, _KEY_SPACE))
+
+    def write(self, record: dict[str, t.Any]) -> None:
+        self._buckets.write(
+            self._rng.getrandbits(64),
+            pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def close(self) -> None:
+        try:
+            buckets = self._buckets.close()
+            LOG.info("Shuffling %s records from %s temporary files",
+                     sum(bucket.count for bucket in buckets), len(buckets))
+            for bucket in buckets:
+                self._write_sorted(bucket)
+        finally:
+            self.writer.close()
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+        self.bytes_written = self.writer.bytes_written
+
+    def _write_sorted(self, bucket: "_Bucket") -> None:
+        '''Writes out the records in the given bucket, sorted by key.'''
+        size = os.path.getsize(bucket.path)
+        if size > self.memory_bytes and bucket.count > 1 \
+                and bucket.key_range[1] - bucket.key_range[0] > 1:
+            LOG.debug("%s is too large to sort in memory, splitting it up",
+                      bucket.path)
+            sub_buckets = _Buckets(self._tmp_dir,
+                                   name=os.path.basename(bucket.path),
+                                   count=min(
+                                       math.ceil(size / self.memory_bytes) * 2,
+                                       self.bucket_count),
+                                   key_range=bucket.key_range)
+            for key, blob in _read_from(bucket.path):
+                sub_buckets.write(key, blob)
+            os.remove(bucket.path)
+
+            for sub_bucket in sub_buckets.close():
+                self._write_sorted(sub_bucket)
+            return
+
+        records = list(_read_from(bucket.path))
+        os.remove(bucket.path)
+        # Stable, so records with the same key stay in the order they came in.
+        records.sort(key=lambda record: record[0])
+        for _, blob in records:
+            self.writer.write(pickle.loads(blob))
+
+
+#
+# Private helpers.
+#
+
+
+@dataclass
+class _Bucket:
+    path: str
+    # Keys within `[start, end)` go into this bucket.
+    key_range: tuple[int, int]
+    count: int = 0
+
+
+class _Buckets:
+    '''
+    A set of temporary files, each of which gets an equal share of
+    `key_range`, in order.
+    '''
+
+    def __init__(self, tmp_dir: str, name: str, count: int,
+                 key_range: tuple[int, int]) -> None:
+        start, end = key_range
+        count = min(count, end - start)
+        self.start = start
+        self.width = end - start
+        # Rounded up, to match which keys `write` puts into each bucket.
+        self.buckets = [
+            _Bucket(path=os.path.join(tmp_dir, f"{name}-{idx}"),
+                    key_range=(start - (-self.width * idx // count),
+                               start - (-self.width * (idx + 1) // count)))
+            for idx in range(count)
+        ]
+
+        self._files = [open(bucket.path, "wb") for bucket in self.buckets]
+
+    def write(self, key: int, blob: bytes) -> None:
+        idx = (key - self.start) * len(self.buckets) // self.width
+        self._files[idx].write(_RECORD_HEADER.pack(key, len(blob)))
+        self._files[idx].write(blob)
+        self.buckets[idx].count += 1
+
+    def close(self) -> list[_Bucket]:
+        for file in self._files:
+            file.close()
+        return self.buckets
+
+
+def _read_from(path: str) -> t.Generator[tuple[int, bytes], None, None]:
+    '''Yields the key and pickled record of everything in the bucket.'''
+    with open(path, "rb") as file:
+        while header := file.read(_RECORD_HEADER.size):
+            key, size = _RECORD_HEADER.unpack(header)
+            yield key, file.read(size)